@@ -0,0 +1,148 @@
+# aggregates.py
+import sys
+from sidecar import SidecarStore
+from row_decoder import parse_date
+
+
+def _number(convert, raw: bytes, default):
+    """Convert raw bytes the way RowDecoder converts the decoded text (e.g. non-ASCII digits)."""
+    try:
+        return convert(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return default
+
+
+class AggregateStore(SidecarStore):
+    """Per-month and overall lesson totals persisted next to the CSV file."""
+
+    SUFFIX = '.agg.json'
+    VERSION = 2
+    # 汇总只用到这几列；date 仅在 month 为空时用于推导月份
+    PROJECTION = ('date', 'month', 'duration_minutes', 'total_income')
+
+    def _clear(self):
+        # month -> [lessons, minutes, income]
+        self.months = {}
+        self.lessons = 0
+        self.minutes = 0
+        self.income = 0.0
+
+    def _fold_projected(self, rows) -> int:
+        # 与 RowDecoder 相同的转换规则：month 列为空时由日期推导，数值无效时取 0
+        months = self.months
+        month_names = {}  # 原始 month 字节 -> 字符串
+        derived = {}  # 原始 date 字节 -> 推导出的月份
+        lessons, minutes_total, income_total = self.lessons, self.minutes, self.income
+        count = 0
+        for date_raw, month_raw, minutes_raw, income_raw in rows:
+            count += 1
+            try:
+                minutes = int(minutes_raw)
+            except ValueError:
+                minutes = _number(int, minutes_raw, 0)
+            try:
+                income = float(income_raw)
+            except ValueError:
+                income = _number(float, income_raw, 0.0)
+            lessons += 1
+            minutes_total += minutes
+            income_total += income
+            if month_raw:
+                month_str = month_names.get(month_raw)
+                if month_str is None:
+                    month_str = month_names[month_raw] = month_raw.decode('utf-8')
+            else:
+                month_str = derived.get(date_raw)
+                if month_str is None:
+                    month_str = derived[date_raw] = parse_date(date_raw.decode('utf-8'))[1]
+            if month_str:
+                stats = months.get(month_str)
+                if stats is None:
+                    stats = months[month_str] = [0, 0, 0.0]
+                stats[0] += 1
+                stats[1] += minutes
+                stats[2] += income
+        self.lessons, self.minutes, self.income = lessons, minutes_total, income_total
+        return count
+
+    def _state(self) -> dict:
+        return {'totals': [self.lessons, self.minutes, self.income], 'months': self.months}
+
+    def _restore(self, state: dict):
+        self.lessons, self.minutes, self.income = state['totals']
+        self.months = {m: list(v) for m, v in state['months'].items()}
+
+    def merge(self, other):
+        """Add the totals of another store (e.g. another month partition) to this one."""
+        self.lessons += other.lessons
+        self.minutes += other.minutes
+        self.income += other.income
+        for m, stats in other.months.items():
+            mine = self.months.setdefault(m, [0, 0, 0.0])
+            for i in range(3):
+                mine[i] += stats[i]
+
+    def financial_summary(self) -> dict:
+        return {
+            'total_income': round(self.income, 2),
+            'total_hours': round(self.minutes / 60, 2),
+            'total_lessons': self.lessons
+        }
+
+    def monthly_summary(self) -> dict:
+        summary = {}
+        for m, (lessons, minutes, income) in sorted(self.months.items()):
+            summary[m] = {
+                'lessons': lessons,
+                'hours': round(minutes / 60, 2),
+                'income': round(income, 2)
+            }
+        return summary
+
+    def verify(self, rebuild=False):
+        """Recompute all totals from the CSV and report where the stored values drifted.
+
+        Returns a list of (key, field, stored, actual) tuples; with rebuild=True
+        the recomputed totals replace the stored ones.
+        """
+        self.refresh()
+        fresh = self.recomputed()
+
+        drift = []
+        for field, stored, actual in (('lessons', self.lessons, fresh.lessons),
+                                      ('minutes', self.minutes, fresh.minutes),
+                                      ('income', self.income, fresh.income)):
+            if round(stored, 2) != round(actual, 2):
+                drift.append(('TOTAL', field, stored, actual))
+        for m in sorted(set(self.months) | set(fresh.months)):
+            stored = self.months.get(m, [0, 0, 0.0])
+            actual = fresh.months.get(m, [0, 0, 0.0])
+            for i, field in enumerate(('lessons', 'minutes', 'income')):
+                if round(stored[i], 2) != round(actual[i], 2):
+                    drift.append((m, field, stored[i], actual[i]))
+
+        if rebuild:
+            self.rebuild(fresh)
+        return drift
+
+
+if __name__ == '__main__':
+    # 用法: python aggregates.py verify [--rebuild]
+    from database_manager import DatabaseManager
+
+    if len(sys.argv) >= 2 and sys.argv[1] == 'verify':
+        rebuild = '--rebuild' in sys.argv[2:]
+        drift = DatabaseManager().verify_aggregates(rebuild=rebuild)
+        if not drift:
+            print("Aggregates match the CSV file.")
+        else:
+            print(f"Found {len(drift)} difference(s) between stored aggregates and the CSV file:")
+            for key, field, stored, actual in drift:
+                print(f"  {key} {field}: stored {stored}, actual {actual}")
+            if rebuild:
+                print("Aggregates rebuilt from the CSV file.")
+            else:
+                print("Run 'python aggregates.py verify --rebuild' to repair them.")
+        sys.exit(1 if drift and not rebuild else 0)
+    else:
+        print("Usage: python aggregates.py verify [--rebuild]")
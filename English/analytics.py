@@ -0,0 +1,124 @@
+# analytics.py
+from models import RecordBatch
+
+# NumPy 为可选依赖；未安装时使用纯 Python 实现，返回结构完全相同
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+def _stats(lessons, minutes, income) -> dict:
+    return {
+        'lessons': int(lessons),
+        'hours': round(float(minutes) / 60, 2),
+        'income': round(float(income), 2)
+    }
+
+
+def _columns(batch: RecordBatch):
+    """Zero-copy NumPy views of the numeric columns of a batch."""
+    n = len(batch)
+    return {
+        'minutes': np.frombuffer(batch.duration_minutes, dtype=np.intc, count=n),
+        'income': np.frombuffer(batch.total_incomes, dtype=np.float64, count=n),
+        'performance': np.frombuffer(batch.performances, dtype=np.intc, count=n),
+        'month': np.frombuffer(batch.months.codes, dtype=np.intc, count=n),
+        'student': np.frombuffer(batch.student_names.codes, dtype=np.intc, count=n),
+    }
+
+
+def _student_groups(batch: RecordBatch):
+    """Map each student_name code to a group of names equal after strip().
+
+    Returns (group_of_code, names); rows with an empty name get group -1.
+    """
+    names = []
+    index = {}
+    group_of_code = []
+    for value in batch.student_names.values:
+        name = value.strip()
+        if not name:
+            group_of_code.append(-1)
+            continue
+        if name not in index:
+            index[name] = len(names)
+            names.append(name)
+        group_of_code.append(index[name])
+    return group_of_code, names
+
+
+def financial_summary(batch: RecordBatch) -> dict:
+    """Total income, total hours and total lessons of a batch."""
+    if NUMPY_AVAILABLE and len(batch):
+        cols = _columns(batch)
+        lessons, minutes, income = len(batch), int(cols['minutes'].sum(dtype=np.int64)), cols['income'].sum()
+    else:
+        lessons, minutes, income = len(batch), sum(batch.duration_minutes), sum(batch.total_incomes)
+    stats = _stats(lessons, minutes, income)
+    return {
+        'total_income': stats['income'],
+        'total_hours': stats['hours'],
+        'total_lessons': stats['lessons']
+    }
+
+
+def monthly_summary(batch: RecordBatch) -> dict:
+    """Lessons, hours and income per month (YYYY-MM), sorted by month; rows without a month are left out."""
+    months = batch.months.values
+    if NUMPY_AVAILABLE and len(batch):
+        cols = _columns(batch)
+        size = len(months)
+        lessons = np.bincount(cols['month'], minlength=size)
+        minutes = np.bincount(cols['month'], weights=cols['minutes'], minlength=size)
+        income = np.bincount(cols['month'], weights=cols['income'], minlength=size)
+    else:
+        lessons = [0] * len(months)
+        minutes = [0] * len(months)
+        income = [0.0] * len(months)
+        for code, m, inc in zip(batch.months.codes, batch.duration_minutes, batch.total_incomes):
+            lessons[code] += 1
+            minutes[code] += m
+            income[code] += inc
+    summary = {}
+    for code in sorted(range(len(months)), key=months.__getitem__):
+        if months[code] and lessons[code]:
+            summary[months[code]] = _stats(lessons[code], minutes[code], income[code])
+    return summary
+
+
+def student_monthly_summary(batch: RecordBatch) -> dict:
+    """Lessons, hours and income per student and month: {name: {month: stats}}, months sorted."""
+    group_of_code, names = _student_groups(batch)
+    months = batch.months.values
+    totals = {}
+    if NUMPY_AVAILABLE and len(batch) and names:
+        cols = _columns(batch)
+        groups = np.asarray(group_of_code, dtype=np.int64)[cols['student']]
+        keep = groups >= 0
+        # 学生组与月份编码合成一个键，再用 unique + bincount 分组求和
+        keys = groups[keep] * len(months) + cols['month'][keep]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        lessons = np.bincount(inverse)
+        minutes = np.bincount(inverse, weights=cols['minutes'][keep])
+        income = np.bincount(inverse, weights=cols['income'][keep])
+        for i, key in enumerate(unique_keys.tolist()):
+            totals[divmod(key, len(months))] = (lessons[i], minutes[i], income[i])
+    else:
+        for code, month_code, m, inc in zip(batch.student_names.codes, batch.months.codes,
+                                            batch.duration_minutes, batch.total_incomes):
+            group = group_of_code[code]
+            if group < 0:
+                continue
+            key = (group, month_code)
+            lessons, minutes, income = totals.get(key, (0, 0, 0.0))
+            totals[key] = (lessons + 1, minutes + m, income + inc)
+
+    summary = {name: {} for name in names}
+    for (group, month_code), (lessons, minutes, income) in sorted(
+            totals.items(), key=lambda item: (item[0][0], months[item[0][1]])):
+        if months[month_code]:
+            summary[names[group]][months[month_code]] = _stats(lessons, minutes, income)
+    return summary
@@ -0,0 +1,148 @@
+# async_manager.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from database_manager import open_database
+
+# 读取线程数上限；解析与扫描主要受 GIL 限制，更多线程只会增加内存占用
+DEFAULT_WORKERS = 4
+
+
+class AsyncDatabaseManager:
+    """Awaitable wrapper around a DatabaseManager for use inside an asyncio service.
+
+    Every call runs on a bounded thread pool, so file I/O and CSV parsing never
+    block the event loop. Identical reads that overlap share one scan: later
+    callers wait for the call already in flight. Writes go through a single
+    writer task, in the order they were submitted; a read submitted after a
+    write is never answered from a scan that started before it.
+
+        async with AsyncDatabaseManager() as db:
+            await db.add_record(record)
+            records = await db.query_records(month='2025-01')
+    """
+
+    def __init__(self, db=None, max_workers=DEFAULT_WORKERS):
+        self.db = db if db is not None else open_database()
+        if not getattr(self.db, 'thread_safe', True):
+            max_workers = 1
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tutor-db')
+        self._inflight = {}  # (方法名, 参数, 写入代数) -> 正在执行的 Future
+        self._generation = 0  # 每完成一次写入加一，写入前开始的读取不会被之后的调用复用
+        self._queue = None  # 写入队列和写入任务在第一次写入时创建（需要运行中的事件循环）
+        self._writer = None
+        self.reads_started = 0
+        self.reads_coalesced = 0
+
+    async def _read(self, method: str, *args, **kwargs):
+        key = (method, args, tuple(sorted(kwargs.items())), self._generation)
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, partial(getattr(self.db, method), *args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._inflight.pop(key, None) if self._inflight.get(key) is f else None)
+            self.reads_started += 1
+        else:
+            self.reads_coalesced += 1
+        # shield: 一个调用方被取消时，共享同一次扫描的其他调用方不受影响
+        result = await asyncio.shield(future)
+        # 共享结果时每个调用方拿到自己的列表/字典，修改不会影响其他调用方
+        if isinstance(result, (list, dict)):
+            return result.copy()
+        return result
+
+    async def _write(self, method: str, *args):
+        if self._writer is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((future, method, args))
+        return await future
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            future, method, args = item
+            try:
+                result = await loop.run_in_executor(self._executor, partial(getattr(self.db, method), *args))
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._generation += 1
+
+    async def add_record(self, record):
+        """Add a new record; returns once it has been written."""
+        return await self._write('add_record', record)
+
+    async def add_records(self, records) -> int:
+        """Validate and append many records in one write. Returns the number of records added."""
+        return await self._write('add_records', list(records))
+
+    async def query_records(self, student_name=None, student_id=None, topic=None, month=None, text=None,
+                            order_by=None, descending=False, limit=None, offset=0, date_from=None, date_to=None):
+        """Query records with the same filters, sorting and paging as DatabaseManager.query_records."""
+        return await self._read('query_records', student_name=student_name, student_id=student_id,
+                                topic=topic, month=month, text=text, order_by=order_by,
+                                descending=descending, limit=limit, offset=offset,
+                                date_from=date_from, date_to=date_to)
+
+    async def search_text(self, text: str, fields=None) -> list:
+        """Positions of the records matching a text search."""
+        return await self._read('search_text', text, tuple(fields) if fields else None)
+
+    async def get_all_students(self):
+        """Get all unique students (name and ID)."""
+        return await self._read('get_all_students')
+
+    async def get_financial_summary(self):
+        """Get financial summary: total income, total hours, total lessons."""
+        return await self._read('get_financial_summary')
+
+    async def get_monthly_summary(self):
+        """Summarize by month (YYYY-MM): lessons, total hours, total income."""
+        return await self._read('get_monthly_summary')
+
+    async def get_student_summary(self):
+        """Per-student totals keyed by name."""
+        return await self._read('get_student_summary')
+
+    async def get_student_monthly_summary(self):
+        """Per-student, per-month lessons, hours and income."""
+        return await self._read('get_student_monthly_summary')
+
+    async def get_student_id_by_name(self, student_name: str) -> str:
+        """Find an existing student ID by student name."""
+        return await self._read('get_student_id_by_name', student_name)
+
+    async def get_student_name_by_id(self, student_id: str) -> str:
+        """Find the name a student ID was first recorded with."""
+        return await self._read('get_student_name_by_id', student_id)
+
+    async def get_all_student_names_ids(self):
+        """Get a mapping of all student names to IDs."""
+        return await self._read('get_all_student_names_ids')
+
+    async def close(self):
+        """Finish the queued writes, then release the worker threads."""
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        # 在线程中等待仍在进行的读取结束，再关闭底层连接
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        if hasattr(self.db, 'close'):
+            self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
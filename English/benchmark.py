@@ -0,0 +1,663 @@
+# benchmark.py
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from database_manager import DatabaseManager, open_database, FIELDNAMES
+from models import TeachingRecord
+from locking import group_commit
+from async_manager import AsyncDatabaseManager
+import parallel_scan
+import main as cli
+import snapshot_cache
+
+# 默认的数据规模（课时条数）；1M 需要几分钟，用 --sizes 显式指定
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_SEED = 20240901
+# 比较基准时，耗时超过基准的这个倍数即视为退步
+DEFAULT_THRESHOLD = 1.2
+
+_GIVEN_NAMES = ['Alice', 'Ben', 'Chloe', 'Daniel', 'Emma', 'Felix', 'Grace', 'Henry', 'Iris', 'Jack',
+                'Karen', 'Leo', 'Mia', 'Noah', 'Olivia', 'Peter', 'Quinn', 'Ruby', 'Sam', 'Tina']
+_FAMILY_NAMES = ['Smith', 'Chen', 'Garcia', 'Müller', 'Wang', 'Brown', 'Kim', 'Lopez', 'Li', 'Taylor']
+_CHINESE_NAMES = ['张伟', '王芳', '李娜', '刘洋', '陈静', '杨磊', '赵敏', '黄婷', '周杰', '吴昊']
+_TOPICS = ['Quadratic equations', 'Linear functions', 'Fractions and decimals', 'Triangles and angles',
+           'Trigonometry basics', 'Probability', 'Essay structure', 'Reading comprehension',
+           'Past tense verbs', 'Chemical equations', '二次方程', '三角函数']
+_HOMEWORK = ['Worksheet 3, questions 1-10', 'Textbook p.42 exercises', 'Write a 300-word essay', '',
+             'Review notes', 'Practice test A']
+_NOTES = ['', 'Good progress', 'Struggled with factoring, "needs review"', 'Missed part of the lesson',
+          'Very engaged, asked great questions', 'Homework incomplete\nfollow up with parents', '进步明显']
+_PLANS = ['Continue current chapter', 'Review mistakes from homework', 'Start new unit', 'Mock exam',
+          'Revise fractions', '']
+
+
+def student_count(lessons: int) -> int:
+    """Realistic number of students for a ledger of this size (a tutor or a small centre)."""
+    return max(5, min(500, round(lessons ** 0.5 / 2)))
+
+
+def _roster(rng, students):
+    roster = []
+    for i in range(students):
+        if i % 4 == 3:
+            name = _CHINESE_NAMES[i // 4 % len(_CHINESE_NAMES)] + ('' if i < 40 else str(i))
+        else:
+            name = f"{_GIVEN_NAMES[i % len(_GIVEN_NAMES)]} {_FAMILY_NAMES[i // len(_GIVEN_NAMES) % len(_FAMILY_NAMES)]}"
+            if i >= len(_GIVEN_NAMES) * len(_FAMILY_NAMES):
+                name += f" {i}"
+        rate = rng.choice([30.0, 35.0, 40.0, 45.5, 50.0, 60.0])
+        roster.append((name, f"S{i + 1:04d}", rate))
+    return roster
+
+
+def generate(path, lessons, students=None, seed=DEFAULT_SEED, with_month=True):
+    """Write a deterministic synthetic ledger of `lessons` rows to path, in date order.
+
+    with_month=False writes the legacy header without the 'month' column, as
+    produced by versions before the monthly summary existed.
+    """
+    rng = random.Random(seed)
+    roster = _roster(rng, students or student_count(lessons))
+    fieldnames = FIELDNAMES if with_month else [name for name in FIELDNAMES if name != 'month']
+    start = date(2015, 1, 1)
+    span_days = 10 * 365
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        for i in range(lessons):
+            name, sid, rate = roster[int(rng.paretovariate(1.2) * 3) % len(roster)]
+            day = start + timedelta(days=i * span_days // lessons)
+            minutes = rng.choice([45, 60, 60, 90, 120])
+            row = {
+                'student_name': name,
+                'student_id': sid,
+                'date': day.isoformat(),
+                'month': day.strftime('%Y-%m'),
+                'duration_minutes': minutes,
+                'hourly_rate': rate,
+                'total_income': round(minutes / 60 * rate, 2),
+                'topic_covered': rng.choice(_TOPICS),
+                'homework_assigned': rng.choice(_HOMEWORK),
+                'student_performance': rng.randint(3, 10),
+                'notes': rng.choice(_NOTES),
+                'next_plan': rng.choice(_PLANS),
+            }
+            writer.writerow([row[name] for name in fieldnames])
+    return roster
+
+
+def _best(fn, repeat):
+    """Smallest wall time of `repeat` calls to fn."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _once(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _run_cli(script: str):
+    """Run one main.py session with `script` as keyboard input, discarding its output."""
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(script)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cli.main()
+    except EOFError:
+        pass  # 脚本输入用完
+    finally:
+        sys.stdin = stdin
+
+
+class _Workspace:
+    """A scratch directory holding the generated source files and a run directory the app works in."""
+
+    def __init__(self, root, lessons, seed):
+        self.root = root
+        self.run_dir = os.path.join(root, 'run')
+        self.source = os.path.join(root, f'lessons-{lessons}.csv')
+        self.legacy = os.path.join(root, f'lessons-{lessons}-legacy.csv')
+        self.roster = generate(self.source, lessons, seed=seed)
+        generate(self.legacy, lessons, seed=seed, with_month=False)
+
+    def fresh(self, legacy=False):
+        """Reset the run directory to just the generated CSV and make it the working directory.
+
+        The app uses relative paths (CSV_FILE, sidecars, databases, partitions),
+        so every scenario runs inside the run directory.
+        """
+        os.chdir(self.root)  # Windows 不能删除当前工作目录
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+        os.makedirs(self.run_dir)
+        shutil.copyfile(self.legacy if legacy else self.source,
+                        os.path.join(self.run_dir, 'teaching_records.csv'))
+        os.chdir(self.run_dir)
+
+
+def run_size(workspace, backend, repeat) -> dict:
+    """Time every scenario on one generated ledger; returns {scenario: seconds}."""
+    results = {}
+    name, sid, _ = workspace.roster[0]
+    month = '2020-06'
+    queries = {
+        'query_all': {},
+        'query_student_name': {'student_name': name.split()[0].lower()},
+        'query_student_id': {'student_id': sid},
+        'query_topic': {'topic': 'equations'},
+        'query_month': {'month': month},
+        'query_text': {'text': 'fractions OR trig*'},
+        'query_latest_20': {'order_by': 'date', 'descending': True, 'limit': 20},
+    }
+
+    # 冷启动：打开数据（包含表头检查、SQLite 导入或分区转换）
+    workspace.fresh()
+    results['open_cold'] = _once(lambda: open_database(backend))
+    if backend == 'csv':
+        workspace.fresh(legacy=True)
+        results['ensure_schema_migration'] = _once(lambda: DatabaseManager())
+
+    # 汇总：冷（无辅助文件）与热（辅助文件已是最新）
+    for scenario, method in (('financial_summary', 'get_financial_summary'),
+                             ('monthly_summary', 'get_monthly_summary'),
+                             ('student_names_ids', 'get_all_student_names_ids')):
+        workspace.fresh()
+        db = open_database(backend)
+        results[scenario + '_cold'] = _once(getattr(db, method))
+        results[scenario + '_warm'] = _best(getattr(db, method), repeat)
+
+    # 查询：首次查询包含解码整个文件，之后各类筛选条件在已缓存的数据上计时
+    workspace.fresh()
+    db = open_database(backend)
+    results['query_cold'] = _once(lambda: db.query_records(month=month))
+    for scenario, filters in queries.items():
+        results[scenario] = _best(lambda: db.query_records(**filters), repeat)
+
+    # 日期范围：首次查询包含建立日期索引；之后新打开的实例只读取命中的行
+    week = {'date_from': date(2020, 6, 1), 'date_to': date(2020, 6, 7)}
+    quarter = {'date_from': date(2020, 4, 1), 'date_to': date(2020, 6, 30)}
+    workspace.fresh()
+    results['query_week_cold'] = _once(lambda: open_database(backend).query_records(**week))
+    results['query_week_reopened'] = _best(lambda: open_database(backend).query_records(**week), repeat)
+    results['query_quarter_reopened'] = _best(lambda: open_database(backend).query_records(**quarter), repeat)
+
+    # 追加一条记录（包含更新辅助文件）
+    record = TeachingRecord(name, sid, date(2025, 1, 15), 60, 40.0, 0.0, 'Benchmark topic', '', 8, '', '')
+    db.get_financial_summary()
+    db.get_all_student_names_ids()
+    results['add_record'] = _best(lambda: db.add_record(record), repeat)
+
+    # 完整的命令行菜单操作（每次都是新进程式的启动：重新打开数据）
+    scripts = {
+        'cli_show_students': '3\n6\n',
+        'cli_financial_summary': '4\n6\n',
+        'cli_monthly_summary': '5\n6\n',
+        'cli_query_student': '2\n1\n\n\n\n\nq\n6\n',
+        'cli_query_student_all': '2\n1\n\n\n\n\na\n6\n',  # 第一位学生的全部课程（约 10%）
+        'cli_add_record': f'1\n{name}\n\n2025-01-15\n60\n40\nBenchmark topic\n\n8\n\n\n6\n',
+    }
+    workspace.fresh()
+    previous_backend = os.environ.get('TUTOR_DB_BACKEND')
+    os.environ['TUTOR_DB_BACKEND'] = backend
+    try:
+        _run_cli('6\n')  # 预先生成辅助文件，计时的是日常启动后的操作
+        for scenario, script in scripts.items():
+            results[scenario] = _best(lambda: _run_cli(script), repeat)
+    finally:
+        if previous_backend is None:
+            os.environ.pop('TUTOR_DB_BACKEND', None)
+        else:
+            os.environ['TUTOR_DB_BACKEND'] = previous_backend
+    return results
+
+
+def run(sizes, backend='csv', repeat=3, seed=DEFAULT_SEED) -> dict:
+    """Run all scenarios for each ledger size in a temporary directory; returns the report dict."""
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': backend,
+            'repeat': repeat,
+            'seed': seed,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'results': {},
+    }
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix='tutor-bench-')
+    try:
+        for lessons in sizes:
+            print(f"Benchmarking {lessons} lessons ({student_count(lessons)} students, backend {backend})...")
+            workspace = _Workspace(root, lessons, seed)
+            try:
+                # 应用本身的提示信息（导入、添加成功等）不输出
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = run_size(workspace, backend, repeat)
+            finally:
+                os.chdir(cwd)
+            report['results'][str(lessons)] = results
+            for scenario, seconds in results.items():
+                print(f"  {scenario:<28}{seconds * 1000:>12.2f} ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+    return report
+
+
+def compare(baseline: dict, current: dict, threshold=DEFAULT_THRESHOLD) -> list:
+    """Print current/baseline time ratios per scenario; return the (size, scenario, ratio) regressions."""
+    regressions = []
+    print(f"{'lessons':>9}  {'scenario':<28}{'baseline ms':>13}{'current ms':>13}{'ratio':>8}")
+    for size, results in current['results'].items():
+        base = baseline.get('results', {}).get(size, {})
+        for scenario, seconds in results.items():
+            if scenario not in base:
+                continue
+            ratio = seconds / base[scenario] if base[scenario] else float('inf')
+            flag = '  <-- slower' if ratio > threshold else ''
+            print(f"{size:>9}  {scenario:<28}{base[scenario] * 1000:>13.2f}{seconds * 1000:>13.2f}{ratio:>8.2f}{flag}")
+            if ratio > threshold:
+                regressions.append((size, scenario, ratio))
+    return regressions
+
+
+def _writer_process(work_dir, process_index, threads, records):
+    """Body of one writer process: `threads` threads each add `records` lessons."""
+    os.chdir(work_dir)
+    db = DatabaseManager()
+
+    def write(thread_index):
+        for i in range(records):
+            db.add_record(TeachingRecord(f"Writer {process_index}", f"W{process_index}", date(2025, 1, 1),
+                                         60, 40.0, 0.0, 'Concurrency', '', 8,
+                                         f"p{process_index}-t{thread_index}-{i}", ''))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        workers = [threading.Thread(target=write, args=(t,)) for t in range(threads)]
+        # 用墙钟时间，父进程可以跨进程合并起止时间（不含进程启动与打开数据的时间）
+        start = time.time()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        end = time.time()
+    committer = group_commit(db.csv_file)
+    return committer.appends, committer.batches, start, end
+
+
+def run_writers(processes=4, threads=4, records=100, lessons=10_000, seed=DEFAULT_SEED) -> dict:
+    """Append from `processes` x `threads` concurrent writers to one ledger, then check its integrity.
+
+    Returns throughput and the checks: every appended lesson present exactly
+    once, every row complete, and the persisted aggregates matching the file.
+    """
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix='tutor-writers-')
+    try:
+        generate(os.path.join(root, 'teaching_records.csv'), lessons, seed=seed)
+        os.chdir(root)
+        with contextlib.redirect_stdout(io.StringIO()):
+            DatabaseManager().get_financial_summary()  # 预先建立辅助文件
+        with multiprocessing.Pool(processes) as pool:
+            counts = pool.starmap(_writer_process, [(root, p, threads, records) for p in range(processes)])
+        elapsed = max(c[3] for c in counts) - min(c[2] for c in counts)
+
+        expected = processes * threads * records
+        with open('teaching_records.csv', 'r', newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))[1:]
+        markers = [row[10] for row in rows if len(row) == len(FIELDNAMES) and row[7] == 'Concurrency']
+        with contextlib.redirect_stdout(io.StringIO()):
+            drift = DatabaseManager().verify_aggregates()
+        batches = sum(c[1] for c in counts)
+        return {
+            'writers': processes * threads,
+            'processes': processes,
+            'threads_per_process': threads,
+            'records': expected,
+            'seconds': elapsed,
+            'records_per_second': expected / elapsed if elapsed else 0.0,
+            'write_batches': batches,
+            'records_per_batch': expected / batches if batches else 0.0,
+            'rows_complete': all(len(row) == len(FIELDNAMES) for row in rows),
+            'all_records_once': len(markers) == expected and len(set(markers)) == expected,
+            'row_count_ok': len(rows) == lessons + expected,
+            'aggregates_ok': not drift,
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+async def _measure_lag(work, interval=0.001):
+    """Run the coroutine `work` while a ticker task measures how late the event loop wakes it.
+
+    Returns (result of work, list of lags in seconds).
+    """
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lags.append(loop.time() - start - interval)
+
+    task = asyncio.create_task(ticker())
+    try:
+        result = await work
+    finally:
+        stop.set()
+        await task
+    return result, lags
+
+
+def _lag_stats(lags) -> dict:
+    lags = sorted(lags) or [0.0]
+    return {'max_ms': lags[-1] * 1000, 'p99_ms': lags[int(len(lags) * 0.99)] * 1000,
+            'mean_ms': sum(lags) / len(lags) * 1000, 'samples': len(lags)}
+
+
+def run_latency(lessons=100_000, clients=8, seed=DEFAULT_SEED) -> dict:
+    """Event-loop lag while `clients` coroutines run the same full query at once.
+
+    Compares an idle loop, the blocking DatabaseManager called directly from a
+    coroutine, and AsyncDatabaseManager (which also coalesces the identical
+    queries into one scan).
+    """
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix='tutor-latency-')
+    try:
+        generate(os.path.join(root, 'teaching_records.csv'), lessons, seed=seed)
+        os.chdir(root)
+
+        async def idle():
+            await asyncio.sleep(0.2)
+
+        async def blocking():
+            db = DatabaseManager()
+
+            async def client():
+                await asyncio.sleep(0)
+                return len(db.query_records())
+            return await asyncio.gather(*(client() for _ in range(clients)))
+
+        async def offloaded():
+            async with AsyncDatabaseManager(DatabaseManager()) as db:
+                results = await asyncio.gather(*(db.query_records() for _ in range(clients)))
+                return [len(records) for records in results], db.reads_started, db.reads_coalesced
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, idle_lags = asyncio.run(_measure_lag(idle()))
+            start = time.perf_counter()
+            _, blocking_lags = asyncio.run(_measure_lag(blocking()))
+            blocking_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            (counts, started, coalesced), async_lags = asyncio.run(_measure_lag(offloaded()))
+            async_seconds = time.perf_counter() - start
+        return {
+            'lessons': lessons,
+            'clients': clients,
+            'idle': _lag_stats(idle_lags),
+            'blocking': dict(_lag_stats(blocking_lags), seconds=blocking_seconds),
+            'async': dict(_lag_stats(async_lags), seconds=async_seconds,
+                          reads_started=started, reads_coalesced=coalesced),
+            'results_ok': counts == [lessons] * clients,
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run_scan(lessons=1_000_000, workers=(1, 2, 4), seed=DEFAULT_SEED) -> dict:
+    """Cold full-file scans with different numbers of worker processes.
+
+    Times the first financial summary (aggregate rebuild), the first query
+    (snapshot load) and a filtered query without the record cache, each on a
+    fresh copy with no sidecar files. Returns {workers: {scenario: seconds}}
+    plus whether every worker count produced the same results.
+    """
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix='tutor-scan-')
+    saved = {name: os.environ.get(name) for name in (parallel_scan.WORKERS_ENV, parallel_scan.MIN_BYTES_ENV)}
+    try:
+        source = os.path.join(root, 'source.csv')
+        roster = generate(source, lessons, seed=seed)
+        run_dir = os.path.join(root, 'run')
+        name = roster[0][0].split()[0].lower()
+        results = {}
+        answers = []
+        # 阈值设为 1 字节，使每个工作进程数都真正走并行路径（1 个进程时为顺序读取）
+        os.environ[parallel_scan.MIN_BYTES_ENV] = '1'
+        for count in workers:
+            os.environ[parallel_scan.WORKERS_ENV] = str(count)
+            timings = {}
+            with contextlib.redirect_stdout(io.StringIO()):
+                for scenario in ('summary_cold', 'query_cold', 'query_streaming'):
+                    os.chdir(root)
+                    shutil.rmtree(run_dir, ignore_errors=True)
+                    os.makedirs(run_dir)
+                    shutil.copyfile(source, os.path.join(run_dir, 'teaching_records.csv'))
+                    os.chdir(run_dir)
+                    db = DatabaseManager(cache_records=scenario != 'query_streaming')
+                    if scenario == 'summary_cold':
+                        timings[scenario] = _once(lambda: answers.append((count, db.get_financial_summary())))
+                    else:
+                        timings[scenario] = _once(lambda: answers.append(
+                            (count, len(db.query_records(student_name=name)))))
+            results[count] = timings
+        by_workers = {}
+        for count, answer in answers:
+            by_workers.setdefault(count, []).append(answer)
+        return {'lessons': lessons, 'cpus': os.cpu_count(), 'timings': results,
+                'results_match': len({json.dumps(a, sort_keys=True) for a in by_workers.values()}) == 1}
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+# 启动计时的会话：(命令行参数, 键盘输入, 表示该步骤完成的输出)
+STARTUP_SESSIONS = {
+    'first_menu': ((), '6\n', 'Please choose an option:'),
+    'first_summary': ((), '4\n6\n', 'Total Income:'),
+    'first_query': ((), '2\n1\n\n\n\n\nq\n6\n', 'Matching records'),
+    'cli_summary_json': (('summary', '--format', 'json'), '', '"total_lessons"'),
+    'cli_query_week_ndjson': (('query', '--from', '2020-06-01', '--to', '2020-06-07', '--format', 'ndjson'), '',
+                              '{"student_name"'),
+}
+
+
+def _time_session(script: str, marker: str, args=()):
+    """Run main.py (with command-line args, if any) in a new interpreter with `script` as input;
+    seconds until `marker` is printed.
+
+    Returns None if the marker never appears.
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, MAIN_SCRIPT, *args], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True, encoding='utf-8', env=env)
+    elapsed = None
+    with proc:
+        proc.stdin.write(script)
+        proc.stdin.close()
+        for line in proc.stdout:
+            if elapsed is None and marker in line:
+                elapsed = time.perf_counter() - start
+    return elapsed
+
+
+def run_startup(lessons=100_000, repeat=3, seed=DEFAULT_SEED) -> dict:
+    """Time-to-first-menu, -summary and -query of fresh main.py processes, and of command-line calls.
+
+    Each session is timed in three states: 'cold' (only the CSV), 'warm'
+    (summary files and snapshot cache left by an earlier session) and
+    'warm_no_snapshot' (the same without the snapshot cache). Returns
+    {'lessons': n, 'timings': {state: {session: seconds}}}.
+    """
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix='tutor-startup-')
+    timings = {'cold': {}, 'warm': {}, 'warm_no_snapshot': {}}
+    try:
+        workspace = _Workspace(root, lessons, seed)
+        snapshot_file = snapshot_cache.cache_path('teaching_records.csv')
+        for session, (args, script, marker) in STARTUP_SESSIONS.items():
+            workspace.fresh()
+            timings['cold'][session] = _time_session(script, marker, args)
+            # 先运行一次完整会话，生成汇总文件与快照缓存
+            _time_session('2\n1\n\n\n\n\nq\n4\n3\n6\n', 'Goodbye')
+            timings['warm'][session] = min(_time_session(script, marker, args) or float('inf') for _ in range(repeat))
+            best = float('inf')
+            for _ in range(repeat):
+                if os.path.exists(snapshot_file):
+                    os.remove(snapshot_file)
+                best = min(best, _time_session(script, marker, args) or float('inf'))
+            timings['warm_no_snapshot'][session] = best
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+    return {'lessons': lessons, 'timings': timings}
+
+
+def _load_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the lesson records system on synthetic data.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='time every scenario and write a JSON report')
+    run_parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                            help='comma-separated ledger sizes, e.g. 10000,100000,1000000')
+    run_parser.add_argument('--backend', default='csv', choices=['csv', 'sqlite', 'partitioned', 'columnar'])
+    run_parser.add_argument('--repeat', type=int, default=3, help='repetitions per warm scenario (best is kept)')
+    run_parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    run_parser.add_argument('--output', default='benchmark.json', help='where to write the JSON report')
+    run_parser.add_argument('--baseline', help='JSON report to compare the new results against')
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = commands.add_parser('compare', help='compare two JSON reports')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    writers_parser = commands.add_parser('writers', help='measure throughput of concurrent add_record writers')
+    writers_parser.add_argument('--processes', type=int, default=4)
+    writers_parser.add_argument('--threads', type=int, default=4, help='writer threads per process')
+    writers_parser.add_argument('--records', type=int, default=100, help='lessons added by each writer')
+    writers_parser.add_argument('--output', help='also write the result as JSON')
+
+    latency_parser = commands.add_parser('latency', help='measure event-loop lag during concurrent async queries')
+    latency_parser.add_argument('--lessons', type=int, default=100_000)
+    latency_parser.add_argument('--clients', type=int, default=8, help='concurrent identical queries')
+    latency_parser.add_argument('--output', help='also write the result as JSON')
+
+    scan_parser = commands.add_parser('scan', help='time cold full-file scans with 1..N worker processes')
+    scan_parser.add_argument('--lessons', type=int, default=1_000_000)
+    scan_parser.add_argument('--workers', default='1,2,4', help='comma-separated worker process counts')
+    scan_parser.add_argument('--output', help='also write the result as JSON')
+
+    startup_parser = commands.add_parser('startup', help='time the first menu, summary and query of new processes')
+    startup_parser.add_argument('--lessons', type=int, default=100_000)
+    startup_parser.add_argument('--repeat', type=int, default=3, help='repetitions per warm session (best is kept)')
+    startup_parser.add_argument('--output', help='also write the result as JSON')
+
+    generate_parser = commands.add_parser('generate', help='write a synthetic teaching_records.csv')
+    generate_parser.add_argument('lessons', type=int)
+    generate_parser.add_argument('--output', default='teaching_records.csv')
+    generate_parser.add_argument('--students', type=int)
+    generate_parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    generate_parser.add_argument('--legacy', action='store_true', help="omit the 'month' column")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    # 用法: python benchmark.py run|compare|writers|latency|scan|startup|generate ...（-h 查看参数）
+    args = _parse_args(sys.argv[1:])
+    if args.command == 'generate':
+        generate(args.output, args.lessons, args.students, args.seed, with_month=not args.legacy)
+        print(f"Wrote {args.lessons} lesson(s) to {args.output}.")
+    elif args.command == 'writers':
+        result = run_writers(args.processes, args.threads, args.records)
+        for key, value in result.items():
+            print(f"  {key:<22}{value:.2f}" if isinstance(value, float) else f"  {key:<22}{value}")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+        ok = result['rows_complete'] and result['all_records_once'] and result['row_count_ok'] and result['aggregates_ok']
+        sys.exit(0 if ok else 1)
+    elif args.command == 'latency':
+        result = run_latency(args.lessons, args.clients)
+        for key, value in result.items():
+            if isinstance(value, dict):
+                print(f"  {key:<12}" + ', '.join(f"{k} {v:.2f}" if isinstance(v, float) else f"{k} {v}"
+                                                for k, v in value.items()))
+            else:
+                print(f"  {key:<12}{value}")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+        sys.exit(0 if result['results_ok'] else 1)
+    elif args.command == 'scan':
+        counts = [int(count) for count in args.workers.split(',') if count.strip()]
+        result = run_scan(args.lessons, counts)
+        print(f"  {result['lessons']} lessons, {result['cpus']} CPU(s)")
+        base = result['timings'][counts[0]]
+        for count, timings in result['timings'].items():
+            print(f"  {count:>3} worker(s): " + ', '.join(
+                f"{scenario} {seconds:.2f}s (x{base[scenario] / seconds:.2f})" for scenario, seconds in timings.items()))
+        print(f"  results_match {result['results_match']}")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+        sys.exit(0 if result['results_match'] else 1)
+    elif args.command == 'startup':
+        result = run_startup(args.lessons, args.repeat)
+        print(f"  {result['lessons']} lessons")
+        for state, sessions in result['timings'].items():
+            print(f"  {state:<18}" + ', '.join(f"{session} {seconds * 1000:.0f} ms"
+                                                 for session, seconds in sessions.items()))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+    elif args.command == 'compare':
+        regressions = compare(_load_report(args.baseline), _load_report(args.current), args.threshold)
+        sys.exit(1 if regressions else 0)
+    else:
+        sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+        report = run(sizes, args.backend, args.repeat, args.seed)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}.")
+        if args.baseline:
+            regressions = compare(_load_report(args.baseline), report, args.threshold)
+            sys.exit(1 if regressions else 0)
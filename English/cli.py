@@ -0,0 +1,240 @@
+# cli.py
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+from operator import attrgetter
+from database_manager import open_database, FIELDNAMES, ORDER_BY, date_bound, is_valid_rate
+from importer import import_lessons
+from models import TeachingRecord
+from render import format_table, write_lines
+
+FORMATS = ('table', 'json', 'ndjson', 'csv')
+# table 格式的查询结果只显示这些列（笔记等长文本列放不下）；其他格式输出全部 FIELDNAMES
+QUERY_TABLE_COLUMNS = ('date', 'student_name', 'student_id', 'duration_minutes', 'total_income',
+                       'student_performance', 'topic_covered')
+STUDENT_COLUMNS = ('student_name', 'student_id', 'lessons', 'hours', 'income', 'avg_performance',
+                   'first_lesson', 'last_lesson')
+MONTHLY_COLUMNS = ('month', 'lessons', 'hours', 'income')
+SUMMARY_COLUMNS = ('total_lessons', 'total_hours', 'total_income')
+
+_record_values = attrgetter(*FIELDNAMES)
+# 共用一个编码器：json.dumps 带非默认参数时每次调用都会新建一个
+_encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+
+
+class CommandError(Exception):
+    """A command that cannot be carried out as given (reported without a traceback, exit code 2)."""
+
+
+def record_row(record: TeachingRecord) -> dict:
+    """A record as a dict with FIELDNAMES keys in file order, the date as YYYY-MM-DD."""
+    row = dict(zip(FIELDNAMES, _record_values(record)))
+    row['date'] = record.date.isoformat()
+    return row
+
+
+def _json_array(rows):
+    # 逐个编码，流式写出一个 JSON 数组（每个元素一行）
+    encoded = map(_encode, rows)
+    yield '['
+    previous = next(encoded, None)
+    for item in encoded:
+        yield '  ' + previous + ','
+        previous = item
+    if previous is not None:
+        yield '  ' + previous
+    yield ']'
+
+
+def _cell(value) -> str:
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def write_rows(columns, rows, fmt: str, out):
+    """Write dict rows with the given columns in one of FORMATS.
+
+    rows can be a generator: json, ndjson and csv output is written as the
+    rows are produced, so large query results are never held in memory.
+    table needs every row to size its columns.
+    """
+    if fmt == 'ndjson':
+        write_lines(map(_encode, rows), out)
+    elif fmt == 'json':
+        write_lines(_json_array(rows), out)
+    elif fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=columns, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+        out.flush()
+    else:
+        write_lines(format_table(columns, ([_cell(row[name]) for name in columns] for row in rows), min_rule=0), out)
+
+
+def write_object(columns, row: dict, fmt: str, out):
+    """Write a single result: a JSON object for json, otherwise like a one-row write_rows."""
+    if fmt == 'json':
+        write_lines([json.dumps(row, ensure_ascii=False, indent=2, default=str)], out)
+    else:
+        write_rows(columns, [row], fmt, out)
+
+
+def _date_arg(value):
+    try:
+        return date_bound(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _rate_arg(value):
+    # float() 接受 'nan' 与 'inf'；在解析参数时拒绝，退出码为 2
+    try:
+        rate = float(value)
+    except ValueError:
+        rate = None
+    if not is_valid_rate(rate):
+        raise argparse.ArgumentTypeError(f"invalid rate '{value}' (expected a number greater than 0)")
+    return rate
+
+
+def cmd_add(db, args, out) -> int:
+    student_id = args.student_id or db.get_student_id_by_name(args.student)
+    if not student_id:
+        raise CommandError(f"'{args.student}' is a new student; give their ID with --student-id")
+    record = TeachingRecord(
+        student_name=args.student,
+        student_id=student_id,
+        date=args.date or datetime.now().date(),
+        duration_minutes=args.minutes,
+        hourly_rate=args.rate,
+        total_income=0.0,
+        topic_covered=args.topic,
+        homework_assigned=args.homework,
+        student_performance=args.performance,
+        notes=args.notes,
+        next_plan=args.plan
+    )
+    # add_records 校验记录（与批量导入相同），total_income 在写入时计算
+    if not db.add_records([record]):
+        return 1
+    write_object(FIELDNAMES, record_row(record), args.format, out)
+    return 0
+
+
+def cmd_import(db, args, out) -> int:
+    added = import_lessons(db, args.file, args.input_format)
+    write_object(('added',), {'added': added}, args.format, out)
+    return 0 if added else 1
+
+
+def cmd_query(db, args, out) -> int:
+    filters = dict(student_name=args.student, student_id=args.student_id, topic=args.topic, month=args.month,
+                   text=args.text, date_from=args.date_from, date_to=args.date_to)
+    if args.sort or args.desc or args.limit is not None or args.offset:
+        records = db.query_records(order_by=args.sort, descending=args.desc, limit=args.limit,
+                                   offset=args.offset, **filters)
+    else:
+        # 不排序、不分页时边读边输出
+        records = db.iter_records(**filters)
+    columns = QUERY_TABLE_COLUMNS if args.format == 'table' else FIELDNAMES
+    write_rows(columns, map(record_row, records), args.format, out)
+    return 0
+
+
+def cmd_students(db, args, out) -> int:
+    summary = db.get_student_summary()
+    rows = ({'student_name': name, 'student_id': sid, **summary.get(name, {})}
+            for name, sid in db.get_all_student_names_ids().items())
+    write_rows(STUDENT_COLUMNS, rows, args.format, out)
+    return 0
+
+
+def cmd_summary(db, args, out) -> int:
+    write_object(SUMMARY_COLUMNS, db.get_financial_summary(), args.format, out)
+    return 0
+
+
+def cmd_monthly(db, args, out) -> int:
+    rows = ({'month': month, **stats} for month, stats in db.get_monthly_summary().items())
+    write_rows(MONTHLY_COLUMNS, rows, args.format, out)
+    return 0
+
+
+COMMANDS = {
+    'add': cmd_add,
+    'import': cmd_import,
+    'query': cmd_query,
+    'students': cmd_students,
+    'summary': cmd_summary,
+    'monthly': cmd_monthly,
+}
+
+
+def _parse_args(argv):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--format', default='table', choices=FORMATS,
+                        help='output format (default: table; json, ndjson and csv are streamed)')
+
+    parser = argparse.ArgumentParser(description='Tutor lesson records without the interactive menu. '
+                                     'The storage backend is chosen with TUTOR_DB_BACKEND, as for the menu.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = commands.add_parser('add', parents=[common], help='add one lesson and print it as stored')
+    add_parser.add_argument('--student', required=True, help='student name')
+    add_parser.add_argument('--student-id', help="student ID (default: the existing student's ID)")
+    add_parser.add_argument('--date', type=_date_arg, help='YYYY-MM-DD (default: today)')
+    add_parser.add_argument('--minutes', type=int, required=True, help='lesson duration in minutes')
+    add_parser.add_argument('--rate', type=_rate_arg, required=True, help='hourly rate (greater than 0)')
+    add_parser.add_argument('--topic', default='')
+    add_parser.add_argument('--homework', default='')
+    add_parser.add_argument('--performance', type=int, default=5, help='1-10 (default: 5)')
+    add_parser.add_argument('--notes', default='')
+    add_parser.add_argument('--plan', default='', help='next plan')
+
+    import_parser = commands.add_parser('import', parents=[common], help='bulk-import lessons from a CSV or NDJSON file')
+    import_parser.add_argument('file')
+    import_parser.add_argument('--input-format', choices=['csv', 'ndjson'], help='default: from the file extension')
+
+    query_parser = commands.add_parser('query', parents=[common], help='print matching lessons')
+    query_parser.add_argument('--student', help='student name (case-insensitive)')
+    query_parser.add_argument('--student-id')
+    query_parser.add_argument('--topic', help='part of the lesson topic')
+    query_parser.add_argument('--month', help='YYYY-MM')
+    query_parser.add_argument('--from', dest='date_from', type=_date_arg, help='first date, YYYY-MM-DD')
+    query_parser.add_argument('--to', dest='date_to', type=_date_arg, help='last date, YYYY-MM-DD')
+    query_parser.add_argument('--text', help='search topic/homework/notes/plan (words, OR, prefix*)')
+    query_parser.add_argument('--sort', choices=list(ORDER_BY), help='sort key (default: entry order)')
+    query_parser.add_argument('--desc', action='store_true', help='reverse the order')
+    query_parser.add_argument('--limit', type=int)
+    query_parser.add_argument('--offset', type=int, default=0)
+
+    commands.add_parser('students', parents=[common], help='per-student lessons, hours and income')
+    commands.add_parser('summary', parents=[common], help='total lessons, hours and income')
+    commands.add_parser('monthly', parents=[common], help='lessons, hours and income per month')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Run one command; returns the exit code."""
+    args = _parse_args(argv)
+    out = sys.stdout
+    try:
+        # 数据层的提示与警告（print）改写到 stderr，stdout 只有所选格式的输出
+        with contextlib.redirect_stdout(sys.stderr):
+            return COMMANDS[args.command](open_database(), args, out)
+    except (CommandError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    except BrokenPipeError:
+        # 输出被提前关闭（例如 | head）；避免解释器退出时再次写入报错
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, out.fileno())
+        return 1
+
+
+if __name__ == '__main__':
+    # 用法: python cli.py add|import|query|students|summary|monthly ...（-h 查看参数）
+    sys.exit(main())
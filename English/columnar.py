@@ -0,0 +1,562 @@
+# columnar.py
+import csv
+import os
+import struct
+import sys
+import threading
+from array import array
+from datetime import datetime, date
+from itertools import accumulate
+from database_manager import DatabaseManager, _LedgerSnapshot, CSV_FILE, FIELDNAMES
+from models import TeachingRecord, RecordBatch
+from csv_scan import LogCursor, sync_cursor, iter_rows
+from row_decoder import RowDecoder
+from student_registry import StudentRegistry
+import analytics
+import instrumentation
+from locking import FileLock, atomic_write
+
+COLUMNAR_FILE = 'teaching_records.tcol'
+
+# 文件格式（所有整数均为小端序）:
+#   文件头   magic 'TCOL' | u16 版本 | u16 保留 | u64 行数
+#   若干段   u64 段内行数 n | u64 段数据字节数 | 各列数据
+# 每段的列依次为:
+#   数值列   int32 日期序数（0 表示日期无效）/ int32 分钟 / float64 课时费 / float64 收入 / int32 表现分，各 n 个
+#   字典列   学生姓名、学生ID、课题、月份: u32 不同取值数 k | k 个字符串 | n 个 int32 编码
+#   文本列   作业、备注、下次计划: n 个字符串
+# 一组字符串的存储方式: 每个字符串一个 u32 长度（字符数）| u64 数据字节数 | 拼接后的 UTF-8 数据
+# 追加时写入新的一段再更新文件头的行数，文件头之后不完整的段在下次追加时截掉。
+MAGIC = b'TCOL'
+SCHEMA_VERSION = 1
+_HEADER = struct.Struct('<4sHHQ')
+_SEGMENT = struct.Struct('<QQ')
+_COUNT = struct.Struct('<I')
+_BLOB = struct.Struct('<Q')
+
+# RecordBatch 的列，按在段中的顺序；'i' 与 'd' 在所有常见平台上分别为 4 和 8 字节
+NUMERIC_COLUMNS = (('date_ordinals', 'i'), ('duration_minutes', 'i'), ('hourly_rates', 'd'),
+                   ('total_incomes', 'd'), ('performances', 'i'))
+DICTIONARY_COLUMNS = ('student_names', 'student_ids', 'topics', 'months')
+TEXT_COLUMNS = ('homework', 'notes', 'next_plans')
+
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+
+def _little_endian(column: array) -> bytes:
+    if _BIG_ENDIAN:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _encode_strings(values) -> list:
+    """Character lengths, then the byte size and UTF-8 text of all values joined together."""
+    blob = ''.join(values).encode('utf-8')
+    return [_little_endian(array('I', map(len, values))), _BLOB.pack(len(blob)), blob]
+
+
+def encode_segment(batch: RecordBatch) -> bytes:
+    """One segment (row count, payload size, payload) holding every row of batch."""
+    parts = [_little_endian(getattr(batch, name)) for name, _ in NUMERIC_COLUMNS]
+    for name in DICTIONARY_COLUMNS:
+        column = getattr(batch, name)
+        parts.append(_COUNT.pack(len(column.values)))
+        parts.extend(_encode_strings(column.values))
+        parts.append(_little_endian(column.codes))
+    for name in TEXT_COLUMNS:
+        parts.extend(_encode_strings(getattr(batch, name)))
+    payload = b''.join(parts)
+    return _SEGMENT.pack(len(batch), len(payload)) + payload
+
+
+def decode_segment(data, pos: int = 0) -> tuple:
+    """Decode the segment starting at data[pos] (a memoryview); returns (RecordBatch, offset after it).
+
+    Raises ValueError if data ends inside the segment.
+    """
+    if pos + _SEGMENT.size > len(data):
+        raise ValueError("file ends before the row count in its header")
+    count, size = _SEGMENT.unpack_from(data, pos)
+    pos += _SEGMENT.size
+    if pos + size > len(data):
+        raise ValueError("file ends before the row count in its header")
+    return _decode_segment(data[pos:pos + size], count), pos + size
+
+
+def _take_array(data, pos, typecode, count):
+    column = array(typecode)
+    end = pos + count * column.itemsize
+    if end > len(data):
+        raise ValueError("segment is truncated")
+    column.frombytes(data[pos:end])
+    if _BIG_ENDIAN:
+        column.byteswap()
+    return column, end
+
+
+def _take_strings(data, pos, count):
+    lengths, pos = _take_array(data, pos, 'I', count)
+    if pos + _BLOB.size > len(data):
+        raise ValueError("segment is truncated")
+    (size,) = _BLOB.unpack_from(data, pos)
+    pos += _BLOB.size
+    end = pos + size
+    if end > len(data):
+        raise ValueError("segment is truncated")
+    # 长度按字符计：整组只解码一次，再按字符位置切片
+    text = str(data[pos:end], 'utf-8')
+    offsets = list(accumulate(lengths, initial=0))
+    if offsets[-1] != len(text):
+        raise ValueError("string lengths do not match their data")
+    values = list(map(text.__getitem__, map(slice, offsets, offsets[1:])))
+    return values, end
+
+
+def _decode_segment(data, rows) -> RecordBatch:
+    """Decode one segment payload (a memoryview) into a new RecordBatch with `rows` rows."""
+    batch = RecordBatch()
+    pos = 0
+    for name, typecode in NUMERIC_COLUMNS:
+        column, pos = _take_array(data, pos, typecode, rows)
+        setattr(batch, name, column)
+    for name in DICTIONARY_COLUMNS:
+        if pos + _COUNT.size > len(data):
+            raise ValueError("segment is truncated")
+        (size,) = _COUNT.unpack_from(data, pos)
+        values, pos = _take_strings(data, pos + _COUNT.size, size)
+        codes, pos = _take_array(data, pos, 'i', rows)
+        if codes and (min(codes) < 0 or max(codes) >= size):
+            raise ValueError(f"invalid dictionary code in column {name}")
+        getattr(batch, name).extend_encoded(values, codes)
+    for name in TEXT_COLUMNS:
+        values, pos = _take_strings(data, pos, rows)
+        setattr(batch, name, values)
+    if pos != len(data):
+        raise ValueError("segment size does not match its columns")
+    return batch
+
+
+def _read_header(f) -> int:
+    """Check the file header of open file f and return its row count."""
+    f.seek(0)
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError("file is too short to be a columnar ledger")
+    magic, version, _, rows = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("not a columnar ledger file")
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"unsupported columnar schema version {version} (expected {SCHEMA_VERSION})")
+    return rows
+
+
+def read_segments(f, batch: RecordBatch, offset=0, today=None, missing_dates=None) -> int:
+    """Append the rows of binary file f that are not in batch yet; return the offset after them.
+
+    offset is the value returned by the previous call for the same file and
+    batch (0 to start from the beginning). Only rows counted in the file
+    header are read, so a segment being written is never seen half-done.
+    Rows stored without a valid date get `today` (default: the current date),
+    as when the CSV is decoded; their positions are added to missing_dates.
+    """
+    today = (today or datetime.now().date()).toordinal()
+    rows = _read_header(f)
+    offset = max(offset, _HEADER.size)
+    if len(batch) >= rows:
+        return offset
+    f.seek(offset)
+    data = memoryview(f.read())
+    if instrumentation.active:
+        instrumentation.count('bytes_read', len(data))
+    pos = 0
+    while len(batch) < rows:
+        segment, end = decode_segment(data, pos)
+        ordinals = segment.date_ordinals
+        if 0 in ordinals:
+            start = len(batch)
+            for i, ordinal in enumerate(ordinals):
+                if not ordinal:
+                    ordinals[i] = today
+                    if missing_dates is not None:
+                        missing_dates.append(start + i)
+        # 每段完整解码后才并入 batch，出错时 batch 的各列长度仍然一致
+        batch.extend(segment)
+        pos = end
+    return offset + pos
+
+
+def read_file(path, missing_dates=None) -> RecordBatch:
+    """All rows of a columnar ledger file (see read_segments for missing_dates)."""
+    batch = RecordBatch()
+    with FileLock(path, shared=True), open(path, 'rb') as f:
+        read_segments(f, batch, missing_dates=missing_dates)
+    return batch
+
+
+def _segments_end(f, rows) -> int:
+    """Offset just after the segments that hold the first `rows` rows of f."""
+    pos = _HEADER.size
+    seen = 0
+    while seen < rows:
+        f.seek(pos)
+        header = f.read(_SEGMENT.size)
+        if len(header) < _SEGMENT.size:
+            raise ValueError("file ends before the row count in its header")
+        count, size = _SEGMENT.unpack(header)
+        pos += _SEGMENT.size + size
+        seen += count
+    return pos
+
+
+def write_file(path, batch: RecordBatch, missing_dates=()):
+    """Write batch as a new columnar ledger with a single segment, replacing path atomically.
+
+    Rows listed in missing_dates are stored without a date. The caller holds
+    the file's FileLock.
+    """
+    for i in missing_dates:
+        batch.date_ordinals[i] = 0
+    with atomic_write(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, SCHEMA_VERSION, 0, len(batch)))
+        if len(batch):
+            f.write(encode_segment(batch))
+
+
+def append_batch(path, batch: RecordBatch):
+    """Append the rows of batch to a columnar ledger as one new segment, creating the file if needed."""
+    if not len(batch):
+        return
+    with FileLock(path):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            write_file(path, batch)
+            return
+        with open(path, 'r+b') as f:
+            rows = _read_header(f)
+            # 上次追加在更新文件头之前中断时留下的不完整段，在这里截掉
+            f.seek(_segments_end(f, rows))
+            f.truncate()
+            f.write(encode_segment(batch))
+            f.flush()
+            os.fsync(f.fileno())
+            # 段写入磁盘之后再更新行数，读取方不会看到只写了一半的段
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, SCHEMA_VERSION, 0, rows + len(batch)))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def convert_csv(csv_file=CSV_FILE, path=COLUMNAR_FILE) -> int:
+    """Decode a lesson CSV into a new columnar ledger; return the number of rows written.
+
+    Rows are decoded exactly as the CSV backend decodes them (same defaults
+    for invalid values); rows whose numbers do not fit the columns are skipped.
+    """
+    batch = RecordBatch()
+    missing_dates = []
+    skipped = 0
+    try:
+        with FileLock(csv_file, shared=True), open(csv_file, 'rb') as f:
+            cursor = LogCursor()
+            sync_cursor(f, cursor, 0)
+            decoder = RowDecoder(cursor.fieldnames)
+            decode = decoder.decode
+            append = batch.append_values
+            for values in iter_rows(f, cursor):
+                row = decode(values)
+                try:
+                    append(row)
+                except (TypeError, OverflowError, AttributeError):
+                    skipped += 1
+                    continue
+                # 无效日期被解码为 decoder.today 本身；文件中记为“无日期”，读取时再取当天
+                if row[2] is decoder.today:
+                    missing_dates.append(len(batch) - 1)
+        with FileLock(path):
+            write_file(path, batch, missing_dates)
+    except Exception as e:
+        print(f"Error converting {csv_file} to columnar format: {e}")
+        return 0
+    if skipped:
+        print(f"Warning: skipped {skipped} invalid record row(s) in {csv_file}.")
+    return len(batch)
+
+
+def export_csv(path=COLUMNAR_FILE, csv_file=CSV_FILE) -> int:
+    """Write every row of a columnar ledger to a FIELDNAMES CSV file; return the number of rows.
+
+    Reading the exported CSV back gives the same values the columnar file
+    holds (floats are written with repr, so they round-trip exactly).
+    """
+    try:
+        missing_dates = []
+        batch = read_file(path, missing_dates)
+        # 日期无效的行导出为空日期，重新读入时与原 CSV 一样解码为当天
+        dates = [date.fromordinal(ordinal).isoformat() for ordinal in batch.date_ordinals]
+        for i in missing_dates:
+            dates[i] = ''
+        names, ids, topics, months = (getattr(batch, name) for name in DICTIONARY_COLUMNS)
+        rows = zip(
+            map(names.values.__getitem__, names.codes),
+            map(ids.values.__getitem__, ids.codes),
+            dates,
+            map(months.values.__getitem__, months.codes),
+            batch.duration_minutes,
+            batch.hourly_rates,
+            batch.total_incomes,
+            map(topics.values.__getitem__, topics.codes),
+            batch.homework,
+            batch.performances,
+            batch.notes,
+            batch.next_plans,
+        )
+        with FileLock(csv_file), atomic_write(csv_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDNAMES)
+            writer.writerows(rows)
+    except Exception as e:
+        print(f"Error exporting {path} to CSV: {e}")
+        return 0
+    return len(batch)
+
+
+class _ColumnarSnapshot(_LedgerSnapshot):
+    def __init__(self, key):
+        super().__init__(key)
+        self.missing_dates = []  # 文件中没有有效日期的行（已按当天解码）
+        # 学生索引在首次学生查询时由列数据折叠得到，之后随追加的行增量扩展
+        self.students = None
+        self.students_rows = 0
+
+
+class ColumnarDatabaseManager(DatabaseManager):
+    """DatabaseManager variant that stores lessons in a binary columnar file.
+
+    Loading copies the numeric and dictionary-code columns straight into
+    typed arrays (no per-row parsing); summaries are computed from those
+    columns. New lessons are appended as a new segment. A missing file is
+    filled from CSV_FILE once, and export_csv writes the ledger back out as
+    a regular CSV.
+    """
+
+    def __init__(self, columnar_file=COLUMNAR_FILE, csv_file=CSV_FILE):
+        self.columnar_file = columnar_file
+        self.csv_file = csv_file
+        self.cache_records = True
+        self._cache = None
+        self._dates = None  # 数据常驻内存，日期范围直接在日期列上筛选
+        self._lock = threading.RLock()
+        is_new = not os.path.exists(columnar_file) or os.path.getsize(columnar_file) == 0
+        if is_new and os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
+            converted = convert_csv(csv_file, columnar_file)
+            print(f"Converted {converted} record(s) from {csv_file} into {columnar_file}.")
+
+    def _file_key(self):
+        """(inode, mtime_ns, size) of the columnar file, or None if it is missing."""
+        try:
+            st = os.stat(self.columnar_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _snapshot(self):
+        """Return the loaded columns, reading only new segments when the file has grown."""
+        key = self._file_key()
+        if key is None:
+            self._cache = None
+            return None
+        if self._cache is None or self._cache.key != key:
+            with self._lock:
+                with FileLock(self.columnar_file, shared=True):
+                    key = self._file_key()
+                    if key is None:
+                        self._cache = None
+                    elif self._cache is None or self._cache.key != key:
+                        self._cache = self._load_snapshot(key, self._cache)
+        return self._cache
+
+    def _load_snapshot(self, key, previous=None):
+        snapshot = _ColumnarSnapshot(key)
+        try:
+            with open(self.columnar_file, 'rb') as f:
+                # 同一文件只会在末尾追加新段；被替换（转换、压缩）时 inode 改变，整体重新读取
+                if previous is not None and previous.key is not None and previous.key[0] == key[0]:
+                    snapshot = previous
+                    snapshot.key = key
+                before = len(snapshot.records)
+                missing = len(snapshot.missing_dates)
+                snapshot.cursor.offset = read_segments(f, snapshot.records, snapshot.cursor.offset,
+                                                       missing_dates=snapshot.missing_dates)
+                rows = len(snapshot.records) - before
+                snapshot.count_decoded(rows, 0, {'date': len(snapshot.missing_dates) - missing})
+                if instrumentation.active:
+                    instrumentation.count('rows_read', rows)
+                    instrumentation.count('rows_decoded', rows)
+        except Exception as e:
+            print(f"Error reading data file: {e}")
+            snapshot.key = None
+        return snapshot
+
+    def _append(self, batch: RecordBatch):
+        append_batch(self.columnar_file, batch)
+
+    def _record_values(self, record: TeachingRecord) -> tuple:
+        """RECORD_FIELDS values of a record whose total_income is already computed."""
+        return (record.student_name, record.student_id, record.date, record.duration_minutes,
+                float(record.hourly_rate), float(record.total_income), record.topic_covered,
+                record.homework_assigned, record.student_performance, record.notes, record.next_plan,
+                self._derive_month_str(record.date))
+
+    def add_record(self, record: TeachingRecord):
+        """Add a new record to the columnar file."""
+        try:
+            record.total_income = self.calculate_income(record.duration_minutes, record.hourly_rate)
+            batch = RecordBatch()
+            batch.append_values(self._record_values(record))
+            self._append(batch)
+            print(f"Record added successfully! Session income: ${record.total_income}")
+        except Exception as e:
+            print(f"Error adding record: {e}")
+
+    def add_records(self, records) -> int:
+        """Validate many records and append them as a single segment. Returns the number added."""
+        batch = RecordBatch()
+        skipped = 0
+        for i, record in enumerate(records, 1):
+            error = self._validate_record(record)
+            if error:
+                print(f"Warning: skipping record #{i}: {error}")
+                skipped += 1
+                continue
+            record.total_income = self.calculate_income(record.duration_minutes, record.hourly_rate)
+            batch.append_values(self._record_values(record))
+        try:
+            self._append(batch)
+        except Exception as e:
+            print(f"Error adding records: {e}")
+            return 0
+        message = f"Added {len(batch)} record(s)"
+        if skipped:
+            message += f", skipped {skipped} invalid record(s)"
+        print(message + ".")
+        return len(batch)
+
+    def compact(self):
+        """Rewrite the file as a single segment (appends add one segment each)."""
+        with self._lock:
+            with FileLock(self.columnar_file):
+                batch = RecordBatch()
+                missing_dates = []
+                with open(self.columnar_file, 'rb') as f:
+                    read_segments(f, batch, missing_dates=missing_dates)
+                write_file(self.columnar_file, batch, missing_dates)
+
+    def export_csv(self, csv_file=CSV_FILE) -> int:
+        """Write all lessons to a FIELDNAMES CSV file; return the number of rows written."""
+        return export_csv(self.columnar_file, csv_file)
+
+    def _student_index(self) -> StudentRegistry:
+        """Student index over the current rows, folded from the columns and extended after appends."""
+        with self._lock:
+            snapshot = self._snapshot()
+            if snapshot is None:
+                return StudentRegistry(self.columnar_file)
+            if snapshot.students is None:
+                snapshot.students = StudentRegistry(self.columnar_file)
+                snapshot.students_rows = 0
+            batch = snapshot.records
+            start = snapshot.students_rows
+            if start < len(batch):
+                decoder = RowDecoder(FIELDNAMES)
+                dates = list(map(date.fromordinal, batch.date_ordinals[start:]))
+                # 与 CSV 版本一致，无效日期（解码为 decoder.today 本身）不计入首末上课日期
+                for i in snapshot.missing_dates:
+                    if i >= start:
+                        dates[i - start] = decoder.today
+                names, ids, topics, months = (getattr(batch, name) for name in DICTIONARY_COLUMNS)
+                rows = zip(
+                    map(names.values.__getitem__, names.codes[start:]),
+                    map(ids.values.__getitem__, ids.codes[start:]),
+                    dates,
+                    batch.duration_minutes[start:],
+                    batch.hourly_rates[start:],
+                    batch.total_incomes[start:],
+                    map(topics.values.__getitem__, topics.codes[start:]),
+                    batch.homework[start:],
+                    batch.performances[start:],
+                    batch.notes[start:],
+                    batch.next_plans[start:],
+                    map(months.values.__getitem__, months.codes[start:]),
+                )
+                fold = snapshot.students._fold
+                for row in rows:
+                    fold(row, decoder)
+                snapshot.students_rows = len(batch)
+            return snapshot.students
+
+    def get_all_students(self):
+        """Get all unique students (name and ID)."""
+        return sorted(self._student_index().pairs)
+
+    def get_financial_summary(self):
+        """Get financial summary: total income, total hours, total lessons."""
+        # NumPy 视图存在期间快照的数组不能扩容，与快照更新互斥
+        with self._lock:
+            return analytics.financial_summary(self._record_batch())
+
+    def get_monthly_summary(self):
+        """Summarize by month (YYYY-MM): lessons, total hours, total income."""
+        with self._lock:
+            return analytics.monthly_summary(self._record_batch())
+
+    def verify_aggregates(self, rebuild=False):
+        """Summaries are computed from the columns on every call, so there is nothing to drift."""
+        return []
+
+    def get_student_summary(self):
+        """Per-student totals keyed by name: lessons, hours, income, average performance, first/last lesson."""
+        return self._student_index().summary()
+
+    def get_student_id_by_name(self, student_name: str) -> str:
+        """Find an existing student ID by student name."""
+        return self._student_index().id_by_name(student_name)
+
+    def get_student_name_by_id(self, student_id: str) -> str:
+        """Find the name a student ID was first recorded with."""
+        return self._student_index().name_by_id(student_id)
+
+    def get_all_student_names_ids(self):
+        """Get a mapping of all student names to IDs."""
+        return self._student_index().name_id_map()
+
+    def rebuild_student_registry(self):
+        """The student index is kept in memory only; drop it so the next query rebuilds it."""
+        with self._lock:
+            if self._cache is not None:
+                self._cache.students = None
+
+
+if __name__ == '__main__':
+    # 用法: python columnar.py convert [csv文件] [列式文件] | export [列式文件] [csv文件] | compact [列式文件]
+    command = sys.argv[1] if len(sys.argv) >= 2 else ''
+    if command == 'convert':
+        source = sys.argv[2] if len(sys.argv) > 2 else CSV_FILE
+        target = sys.argv[3] if len(sys.argv) > 3 else COLUMNAR_FILE
+        count = convert_csv(source, target)
+        print(f"Converted {count} record(s) from {source} into {target}.")
+    elif command == 'export':
+        source = sys.argv[2] if len(sys.argv) > 2 else COLUMNAR_FILE
+        target = sys.argv[3] if len(sys.argv) > 3 else CSV_FILE
+        if os.path.exists(target):
+            print(f"Error: {target} already exists; not exporting.")
+            sys.exit(1)
+        count = export_csv(source, target)
+        print(f"Exported {count} record(s) from {source} into {target}.")
+    elif command == 'compact':
+        target = sys.argv[2] if len(sys.argv) > 2 else COLUMNAR_FILE
+        ColumnarDatabaseManager(target, csv_file=os.devnull).compact()
+        print(f"Compacted {target}.")
+    else:
+        print("Usage: python columnar.py convert [csv_file] [columnar_file]\n"
+              "       python columnar.py export [columnar_file] [csv_file]\n"
+              "       python columnar.py compact [columnar_file]")
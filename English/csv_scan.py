@@ -0,0 +1,319 @@
+# csv_scan.py
+import csv
+import io
+import mmap
+import operator
+import instrumentation
+
+# 增量读取时每次从磁盘读取的字节数
+CHUNK_SIZE = 1 << 20
+
+
+def record_boundary(buf: bytes) -> int:
+    """Return the end of the last complete CSV record in buf, or 0 if there is none.
+
+    A newline ends a record only when it is outside quotes, i.e. when the number
+    of quote characters before it is even (escaped quotes come in pairs).
+    """
+    pos = buf.rfind(b'\n')
+    while pos != -1:
+        if buf.count(b'"', 0, pos) % 2 == 0:
+            return pos + 1
+        pos = buf.rfind(b'\n', 0, pos)
+    return 0
+
+
+def iter_csv_chunks(f, offset, end=None, chunk_size=CHUNK_SIZE):
+    """Parse a binary CSV stream from a record-aligned offset up to `end` (default EOF).
+
+    Yields (rows, end_offset) for each run of complete records; end_offset is
+    the byte position just past the last record in rows. A trailing record
+    without a newline is yielded last.
+    """
+    f.seek(offset)
+    pending = b''
+    while True:
+        size = chunk_size if end is None else min(chunk_size, end - offset - len(pending))
+        data = f.read(size) if size > 0 else b''
+        if not data:
+            break
+        if instrumentation.active:
+            instrumentation.count('bytes_read', len(data))
+        buf = pending + data
+        cut = record_boundary(buf)
+        if cut == 0:
+            pending = buf
+            continue
+        pending = buf[cut:]
+        offset += cut
+        yield csv.reader(io.StringIO(buf[:cut].decode('utf-8'), newline='')), offset
+    if pending:
+        yield csv.reader(io.StringIO(pending.decode('utf-8'), newline='')), offset + len(pending)
+
+
+def _csv_records(data: bytes, positions):
+    """Projected values of the records in data, parsed with the csv module (fallback path)."""
+    for values in csv.reader(io.StringIO(data.decode('utf-8'), newline='')):
+        if values:  # 与 iter_rows 一致，跳过空行
+            n = len(values)
+            yield tuple(values[i].encode('utf-8') if i is not None and i < n else b'' for i in positions)
+
+
+def _with_offsets(records, offsets, at):
+    """Pass records through, appending `at` to offsets (if not None) before each one."""
+    if offsets is None:
+        return records
+    return _appending(records, offsets, at)
+
+
+def _appending(records, offsets, at):
+    for values in records:
+        offsets.append(at)
+        yield values
+
+
+def record_end(buf, start: int, end: int) -> int:
+    """End (just past the newline) of the CSV record starting at `start` in buf, at most `end`."""
+    quotes = 0
+    pos = start
+    while True:
+        nl = buf.find(b'\n', pos, end)
+        if nl == -1:
+            return end
+        quotes += buf[pos:nl].count(b'"')  # mmap 没有 count
+        if quotes % 2 == 0:
+            return nl + 1
+        pos = nl + 1
+
+
+def iter_rows_at(f, offsets, end):
+    """Yield positional rows of the records starting at each of `offsets` (ascending) in binary file f.
+
+    Only the bytes of those records are read (the file is memory-mapped up to
+    `end`). A record that csv splits at a bare CR yields all of its rows.
+    """
+    if not offsets:
+        return
+    try:
+        buf = mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        f.seek(0)
+        buf = f.read(end)
+    read = 0
+    try:
+        for start in offsets:
+            stop = record_end(buf, start, end)
+            read += stop - start
+            for values in csv.reader(io.StringIO(buf[start:stop].decode('utf-8'), newline='')):
+                if values:  # 与 iter_rows 一致，跳过空行
+                    yield values
+    finally:
+        if instrumentation.active:
+            instrumentation.count('bytes_read', read)
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+
+
+def iter_projected(f, fieldnames, columns, start, end, chunk_size=CHUNK_SIZE, offsets=None):
+    """Yield, for each record of binary file f in [start, end), the raw bytes of `columns` only.
+
+    The file is memory-mapped and split into lines; a line without quotes or
+    stray carriage returns in its leading fields is cut with a single
+    bytes.split that stops after the last projected column, so the unused
+    columns are never turned into separate objects. Records spanning lines
+    (quoted newlines in `notes`) are followed by quote parity. Anything else
+    (quoted or short leading fields, bare CRs) is parsed with the csv module,
+    so the values are always the ones csv would give. Columns missing from the
+    header come back as b''. start must be a record boundary.
+
+    If offsets is a list, the byte offset where each yielded record starts is
+    appended to it just before the record is yielded. (A line that csv splits
+    at a bare CR yields several records with the same offset.)
+    """
+    if end <= start:
+        return
+    position = {name: i for i, name in enumerate(fieldnames)}  # 重名列以最后一个为准，与 RowDecoder 一致
+    positions = [position.get(name) for name in columns]
+    width = max((i for i in positions if i is not None), default=-1) + 1  # 需要拆出的前导字段数
+    if None not in positions and len(positions) > 1:
+        project = operator.itemgetter(*positions)
+    else:
+        def project(parts):
+            return tuple(parts[i] if i is not None else b'' for i in positions)
+    try:
+        buf = mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ)
+        base = 0
+    except (OSError, ValueError):
+        # 无法映射时（如某些网络文件系统）把这一段读入内存
+        f.seek(start)
+        buf = f.read(end - start)
+        base = start
+    if instrumentation.active:
+        instrumentation.count('bytes_read', end - start)
+
+    pending = None  # 跨行记录（引号内有换行）已读到的行
+    pending_at = 0  # pending 记录的起始字节位置
+    quotes = 0      # pending 中的引号数；为奇数时记录尚未结束
+    clean = False   # pending 记录的投影列是否已经可以直接取值
+    values = None
+    try:
+        pos, stop = start - base, end - base
+        while pos < stop:
+            if pos + chunk_size >= stop:
+                cut = stop
+            else:
+                cut = buf.rfind(b'\n', pos, pos + chunk_size)
+                if cut == -1:  # 一行比分块还长
+                    cut = buf.find(b'\n', pos + chunk_size, stop)
+                cut = stop if cut == -1 else cut + 1
+            data = buf[pos:cut]
+            # 分块中的 \r 都紧跟着 \n 时（通常如此），不必逐行查找字段中间的裸 \r
+            bare_cr = data.count(b'\r') != data.count(b'\r\n')
+            lines = data.split(b'\n')
+            del data
+            if cut != stop or lines[-1] == b'':
+                lines.pop()  # 分块以换行结尾，split 多出的空串不是空行
+            at = pos + base  # 下一行的起始字节位置
+            pos = cut
+            for line in lines:
+                line_at = at
+                at += len(line) + 1
+                if pending is not None:
+                    pending.append(line)
+                    quotes += line.count(b'"')
+                    if clean and bare_cr and b'\r' in line[:-1]:
+                        clean = False
+                    if quotes % 2:
+                        continue
+                    if clean:
+                        if offsets is not None:
+                            offsets.append(pending_at)
+                        yield values
+                    else:
+                        yield from _with_offsets(_csv_records(b'\n'.join(pending), positions), offsets, pending_at)
+                    pending = None
+                    continue
+                if not line or line == b'\r':
+                    continue  # 空行
+                if bare_cr and b'\r' in line[:-1]:
+                    # 字段中间的裸 \r，csv 会把它当作换行
+                    yield from _with_offsets(_csv_records(line, positions), offsets, line_at)
+                    continue
+                if b'"' not in line:
+                    parts = line.split(b',', width)
+                    if len(parts) < width:
+                        yield from _with_offsets(_csv_records(line, positions), offsets, line_at)  # 字段数不足
+                        continue
+                    if len(parts) == width and line[-1:] == b'\r':
+                        parts[-1] = parts[-1][:-1]  # 最后一个投影列恰好是行尾字段：去掉 CRLF 的 \r
+                    if offsets is not None:
+                        offsets.append(line_at)
+                    yield project(parts)
+                    continue
+                q = line.find(b'"')
+                parts = line.split(b',', width)
+                # 第一个引号出现在最后一个投影列之后时，投影列的值可以直接使用
+                clean = len(parts) > width and q >= len(line) - len(parts[-1])
+                if clean:
+                    values = project(parts)
+                quotes = line.count(b'"', q)
+                if quotes % 2:
+                    pending = [line]
+                    pending_at = line_at
+                elif clean:
+                    if offsets is not None:
+                        offsets.append(line_at)
+                    yield values
+                else:
+                    yield from _with_offsets(_csv_records(line, positions), offsets, line_at)
+        if pending is not None:
+            # 文件末尾引号未闭合：交给 csv 模块，与整块解析时的行为一致
+            yield from _with_offsets(_csv_records(b'\n'.join(pending), positions), offsets, pending_at)
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+
+
+class LogCursor:
+    """How far an append-only CSV file has been consumed.
+
+    Besides the byte offset it keeps the header line and the last few consumed
+    bytes, so a later reader can tell "rows were appended" apart from "the
+    file was rewritten" and only parse the new tail in the first case.
+    """
+
+    # 用于校验已读取部分未被改写的尾部字节数
+    TAIL_CHECK_BYTES = 64
+
+    def __init__(self):
+        self.header_line = b''
+        self.fieldnames = []
+        self.offset = 0  # 已解析到的字节位置（总是位于记录边界）
+        self.tail = b''
+
+    def reset(self, header_line: bytes):
+        """Start over from the first data row after header_line."""
+        self.header_line = header_line
+        self.fieldnames = next(csv.reader([header_line.decode('utf-8')]), [])
+        self.offset = len(header_line)
+        self.tail = b''
+
+    def can_extend(self, f, size: int, header_line: bytes) -> bool:
+        """Whether f (now `size` bytes) is the consumed file with rows appended."""
+        if not self.header_line or size <= self.offset:
+            return False
+        if header_line != self.header_line:
+            return False
+        if not self.tail.endswith(b'\n'):
+            return False
+        f.seek(self.offset - len(self.tail))
+        return f.read(len(self.tail)) == self.tail
+
+    def remember_tail(self, f):
+        """Record the last consumed bytes so a later append can be verified."""
+        start = max(0, self.offset - self.TAIL_CHECK_BYTES)
+        f.seek(start)
+        self.tail = f.read(self.offset - start)
+
+    def to_dict(self) -> dict:
+        return {
+            'header': self.header_line.decode('utf-8'),
+            'offset': self.offset,
+            'tail': self.tail.hex(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        cursor = cls()
+        cursor.reset(data['header'].encode('utf-8'))
+        cursor.offset = int(data['offset'])
+        cursor.tail = bytes.fromhex(data['tail'])
+        return cursor
+
+
+def sync_cursor(f, cursor: LogCursor, size: int) -> bool:
+    """Prepare cursor to read f; return True if it continues where it left off.
+
+    On False the cursor was reset to the first data row and the caller must
+    discard everything it derived from earlier rows.
+    """
+    f.seek(0)
+    header_line = f.readline()
+    if cursor.can_extend(f, size, header_line):
+        return True
+    cursor.reset(header_line)
+    return False
+
+
+def iter_rows(f, cursor: LogCursor, end=None):
+    """Yield positional rows (lists of strings) from cursor.offset up to `end`.
+
+    Columns follow cursor.fieldnames. The cursor advances as each chunk is
+    consumed, so callers must read the generator to the end.
+    """
+    for rows, end_offset in iter_csv_chunks(f, cursor.offset, end):
+        for values in rows:
+            if values:  # 与 DictReader 一致，跳过空行
+                yield values
+        cursor.offset = end_offset
+    cursor.remember_tail(f)
@@ -1,24 +1,136 @@
 # database_manager.py
 import csv
+import heapq
+import io
+import math
 import os
+import threading
+from collections import deque
+from itertools import islice
+from operator import attrgetter
 from datetime import datetime, date
-from models import TeachingRecord
+from models import TeachingRecord, RecordBatch
+from csv_scan import LogCursor, sync_cursor, iter_rows, iter_rows_at
+from aggregates import AggregateStore
+from student_registry import StudentRegistry
+from date_index import DateIndex
+import analytics
+from row_decoder import RowDecoder, DEFAULTED_FIELDS, row_filter
+from text_index import TextIndex, TextQuery
+from sidecar import SidecarStore
+import instrumentation
+import parallel_scan
+from locking import FileLock, atomic_write, group_commit
 
 CSV_FILE = 'teaching_records.csv'
 # 新增 'month' 字段用于按月统计与查询（格式: YYYY-MM）
 FIELDNAMES = ['student_name', 'student_id', 'date', 'month', 'duration_minutes', 
               'hourly_rate', 'total_income', 'topic_covered', 
               'homework_assigned', 'student_performance', 'notes', 'next_plan']
+# CSV 表结构版本，由表头判断: 1 = 没有 'month' 列的最初格式，2 = FIELDNAMES
+SCHEMA_VERSION = 2
+
+
+def schema_version(fieldnames) -> int:
+    """Schema version of a CSV file with the given header."""
+    return SCHEMA_VERSION if 'month' in fieldnames else 1
+
+
+# query_records 的排序键（order_by 取值 -> 记录的排序值）
+ORDER_BY = {
+    'date': attrgetter('date'),
+    'income': attrgetter('total_income'),
+    'performance': attrgetter('student_performance'),
+    'student': lambda record: record.student_name.lower(),
+}
+
+
+def select_page(items, key=None, descending=False, limit=None, offset=0) -> list:
+    """Items [offset, offset + limit) of items ordered by key (None: iteration order).
+
+    With a limit at most offset + limit items are held at any time (heapq
+    top-k selection); equal keys keep their iteration order.
+    """
+    stop = None if limit is None else offset + limit
+    if key is None:
+        if not descending:
+            return list(islice(items, offset, stop))
+        # 倒序时只保留最后 stop 个
+        items = deque(items, maxlen=stop)
+        items.reverse()
+        return list(islice(items, offset, None))
+    if stop is None:
+        return sorted(items, key=key, reverse=descending)[offset:]
+    select = heapq.nlargest if descending else heapq.nsmallest
+    return select(stop, items, key=key)[offset:]
+
+
+def date_bound(value):
+    """A date_from/date_to argument as a datetime.date (None if not given); accepts dates and 'YYYY-MM-DD'."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}' (expected YYYY-MM-DD)") from None
+
+
+def is_valid_rate(value) -> bool:
+    """Whether value can be stored as an hourly rate: a finite number greater than 0."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value > 0
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _ordinal_range(date_from, date_to) -> tuple:
+    """Inclusive date ordinals of an optional date range."""
+    return (date_from.toordinal() if date_from else 1,
+            date_to.toordinal() if date_to else date.max.toordinal())
+
+
+def _column_key(batch: RecordBatch, order_by):
+    """ORDER_BY[order_by] computed from batch's columns, as a function of the row position."""
+    if order_by == 'date':
+        return batch.date_ordinals.__getitem__
+    if order_by == 'income':
+        return batch.total_incomes.__getitem__
+    if order_by == 'performance':
+        return batch.performances.__getitem__
+    names = [value.lower() for value in batch.student_names.values]
+    codes = batch.student_names.codes
+    return lambda i: names[codes[i]]
+
 
 class DatabaseManager:
-    def __init__(self):
+    # 同一实例能否被多个线程同时读取（AsyncDatabaseManager 据此决定读线程数）
+    thread_safe = True
+    # query_records 能否直接在快照的列上筛选与排序；没有 RecordBatch 快照的后端设为 False
+    column_queries = True
+
+    def __init__(self, cache_records=True, csv_file=CSV_FILE, persist_snapshot=True):
+        self.csv_file = csv_file
+        # 解码后的CSV快照，所有读取方法共用；文件在磁盘上变化时才重新加载
+        self._cache = None
+        # 为 False 时不缓存记录，iter_records 每次直接流式读取文件，内存占用与文件大小无关
+        self.cache_records = cache_records
+        # 快照同时保存到 CSV 旁的缓存文件，下次启动时载入而不必重新解析（见 snapshot_cache）
+        self.persist_snapshot = persist_snapshot
+        # 按月及总计的汇总数据，持久化在CSV旁边，写入时增量维护
+        self._aggregates = AggregateStore(self.csv_file)
+        # 学生索引（姓名/ID 对照、上课统计），同样持久化并在写入时增量维护
+        self._students = StudentRegistry(self.csv_file)
+        # 按日期排序的 (日期, 字节偏移) 索引，日期范围查询时才更新
+        self._dates = DateIndex(self.csv_file)
+        # 同一进程内多个线程共用一个实例时，串行化快照的加载与更新
+        self._lock = threading.RLock()
         # 如果CSV文件不存在，则创建它并写入表头；如果存在则确保表头包含 'month'
-        if not os.path.exists(CSV_FILE):
-            with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
-                writer.writeheader()
-        else:
-            self._ensure_schema()
+        self._ensure_schema()
 
     def _derive_month_str(self, date_value) -> str:
         """Derive YYYY-MM string from a date value."""
@@ -39,47 +151,63 @@ class DatabaseManager:
             return ''
 
     def _ensure_schema(self):
-        """Ensure CSV contains the latest fields; migrate once if 'month' is missing."""
-        try:
-            if os.path.getsize(CSV_FILE) == 0:
-                # 空文件，写入表头
-                with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
-                    writer.writeheader()
-                return
-
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                existing_fieldnames = reader.fieldnames or []
-                rows = list(reader)
+        """Ensure the CSV has the current schema; migrate it once if it is older.
 
-            if 'month' in existing_fieldnames:
-                # 无需迁移
-                return
+        Only the header line is read, so startup does not depend on the file
+        size. A migration runs under the file's exclusive lock and streams the
+        rows into a replacement file that is renamed over the CSV at the end,
+        so a crash mid-migration leaves the original untouched.
+        """
+        try:
+            with FileLock(self.csv_file):
+                self._check_schema_locked()
+        except Exception as e:
+            print(f"Error during CSV schema migration/initialization: {e}")
 
-            # 执行迁移：为每一行补充 'month' 字段
-            with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
+    def _check_schema_locked(self):
+        if not os.path.exists(self.csv_file) or os.path.getsize(self.csv_file) == 0:
+            # 文件不存在或为空，写入表头
+            with atomic_write(self.csv_file, newline='', encoding='utf-8') as f:
                 writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
                 writer.writeheader()
-                for row in rows:
-                    date_raw = row.get('date', '')
-                    month_str = self._derive_month_str(date_raw)
-                    writer.writerow({
-                        'student_name': row.get('student_name', ''),
-                        'student_id': row.get('student_id', ''),
-                        'date': row.get('date', ''),
-                        'month': month_str,
-                        'duration_minutes': row.get('duration_minutes', ''),
-                        'hourly_rate': row.get('hourly_rate', ''),
-                        'total_income': row.get('total_income', ''),
-                        'topic_covered': row.get('topic_covered', ''),
-                        'homework_assigned': row.get('homework_assigned', ''),
-                        'student_performance': row.get('student_performance', ''),
-                        'notes': row.get('notes', ''),
-                        'next_plan': row.get('next_plan', '')
-                    })
-        except Exception as e:
-            print(f"Error during CSV schema migration/initialization: {e}")
+            return
+
+        with open(self.csv_file, 'r', newline='', encoding='utf-8') as f:
+            existing_fieldnames = next(csv.reader(f), [])
+            if instrumentation.active:
+                instrumentation.count('bytes_read', f.tell())
+
+        version = schema_version(existing_fieldnames)
+        if version == SCHEMA_VERSION:
+            # 无需迁移
+            return
+        self._migrate_locked(version)
+
+    def _add_month(self, row: dict) -> dict:
+        """Version 1 -> 2: add 'month' derived from 'date'."""
+        row['month'] = self._derive_month_str(row.get('date', ''))
+        return row
+
+    # 表结构版本 -> 把该版本的一行升级到下一版本的方法
+    _MIGRATIONS = {1: _add_month}
+
+    def _migrate_locked(self, version: int):
+        """Rewrite the CSV from schema `version` to SCHEMA_VERSION one row at a time."""
+        steps = [self._MIGRATIONS[v] for v in range(version, SCHEMA_VERSION)]
+        size = os.path.getsize(self.csv_file)
+        rows = 0
+        with open(self.csv_file, 'r', newline='', encoding='utf-8') as src, \
+                atomic_write(self.csv_file, newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            for row in csv.DictReader(src):
+                for step in steps:
+                    row = step(self, row)
+                writer.writerow({name: row.get(name, '') for name in FIELDNAMES})
+                rows += 1
+        if instrumentation.active:
+            instrumentation.count('rows_read', rows)
+            instrumentation.count('bytes_read', size)
 
     def calculate_income(self, duration_minutes: int, hourly_rate: float) -> float:
         """Calculate total income based on duration and hourly rate."""
@@ -87,30 +215,97 @@ class DatabaseManager:
         total_income = hours * hourly_rate
         return round(total_income, 2)
 
+    def _record_row(self, record: TeachingRecord) -> dict:
+        """Build the CSV row for a record whose total_income is already computed."""
+        return {
+            'student_name': record.student_name,
+            'student_id': record.student_id,
+            'date': record.date.isoformat(),
+            'month': self._derive_month_str(record.date),
+            'duration_minutes': record.duration_minutes,
+            'hourly_rate': record.hourly_rate,
+            'total_income': record.total_income,
+            'topic_covered': record.topic_covered,
+            'homework_assigned': record.homework_assigned,
+            'student_performance': record.student_performance,
+            'notes': record.notes,
+            'next_plan': record.next_plan
+        }
+
+    def _validate_record(self, record: TeachingRecord) -> str:
+        """Return why a record cannot be stored, or an empty string if it is valid."""
+        if not str(record.student_name).strip():
+            return "missing student name"
+        # datetime 是 date 的子类，写入后日期列会带上时间；bool 是 int 的子类
+        if not isinstance(record.date, date) or isinstance(record.date, datetime):
+            return f"invalid date {record.date!r}"
+        if not _is_int(record.duration_minutes) or record.duration_minutes <= 0:
+            return f"duration must be a positive integer, got {record.duration_minutes!r}"
+        # NaN 与任何值比较都为假，inf 大于 0，需单独排除
+        if not is_valid_rate(record.hourly_rate):
+            return f"hourly rate must be a finite number greater than 0, got {record.hourly_rate!r}"
+        if not _is_int(record.student_performance) or not 1 <= record.student_performance <= 10:
+            return f"performance must be an integer from 1 to 10, got {record.student_performance!r}"
+        return ''
+
     def add_record(self, record: TeachingRecord):
         """Add a new record to the CSV file."""
         try:
             record.total_income = self.calculate_income(record.duration_minutes, record.hourly_rate)
             
-            with open(CSV_FILE, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
-                writer.writerow({
-                    'student_name': record.student_name,
-                    'student_id': record.student_id,
-                    'date': record.date.isoformat(),
-                    'month': self._derive_month_str(record.date),
-                    'duration_minutes': record.duration_minutes,
-                    'hourly_rate': record.hourly_rate,
-                    'total_income': record.total_income,
-                    'topic_covered': record.topic_covered,
-                    'homework_assigned': record.homework_assigned,
-                    'student_performance': record.student_performance,
-                    'notes': record.notes,
-                    'next_plan': record.next_plan
-                })
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES)
+            writer.writerow(self._record_row(record))
+            # 加锁追加并 fsync；同时提交的多个线程合并为一次写入
+            group_commit(self.csv_file).append(buffer.getvalue())
             print(f"Record added successfully! Session income: ${record.total_income}")
         except Exception as e:
             print(f"Error adding record: {e}")
+            return
+        # 追加后立即把新行计入汇总文件
+        self._refresh_sidecars()
+
+    def add_records(self, records) -> int:
+        """Validate many records and append them to the CSV file in a single write.
+
+        Invalid records are reported and skipped. Returns the number of records added.
+        """
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES)
+        added = 0
+        skipped = 0
+        for i, record in enumerate(records, 1):
+            error = self._validate_record(record)
+            if error:
+                print(f"Warning: skipping record #{i}: {error}")
+                skipped += 1
+                continue
+            record.total_income = self.calculate_income(record.duration_minutes, record.hourly_rate)
+            writer.writerow(self._record_row(record))
+            added += 1
+
+        if added and not self._append_text(buffer.getvalue()):
+            return 0
+        message = f"Added {added} record(s)"
+        if skipped:
+            message += f", skipped {skipped} invalid record(s)"
+        print(message + ".")
+        return added
+
+    def _append_text(self, text: str) -> bool:
+        """Append already formatted CSV rows in a single locked write and update the sidecars."""
+        try:
+            group_commit(self.csv_file).append(text)
+        except Exception as e:
+            print(f"Error adding records: {e}")
+            return False
+        self._refresh_sidecars()
+        return True
+
+    def _refresh_sidecars(self):
+        """Fold newly appended rows into the persisted aggregates and student registry."""
+        self._aggregates.refresh()
+        self._students.refresh()
 
     def safe_convert(self, value, target_type, default):
         """Safe data type conversion."""
@@ -126,189 +321,442 @@ class DatabaseManager:
         except (ValueError, TypeError):
             return default
 
-    def query_records(self, student_name=None, student_id=None, topic=None, month=None):
-        """Query records. Filter by student name, ID, topic, and month (YYYY-MM)."""
-        records = []
-        
-        # 检查文件是否为空或不存在
-        if not os.path.exists(CSV_FILE) or os.path.getsize(CSV_FILE) == 0:
-            return records
-            
+    def _snapshot(self):
+        """Return the decoded snapshot of the CSV file, reloading it only when the file changed on disk."""
+        key = self._file_key()
+        if key is None:
+            self._cache = None
+            return None
+        if self._cache is None or self._cache.key != key:
+            with self._lock:
+                # 持有共享锁时重新取文件状态并读取，只会读到完整写入的行
+                with FileLock(self.csv_file, shared=True):
+                    key = self._file_key()
+                    if key is None:
+                        self._cache = None
+                    elif self._cache is None or self._cache.key != key:
+                        previous = self._cache
+                        if previous is None and self.persist_snapshot:
+                            previous = self._restore_snapshot()
+                        if previous is not None and previous.key == key:
+                            self._cache = previous
+                        else:
+                            self._cache = self._load_snapshot(key, previous)
+                if self.persist_snapshot and self._cache is not None:
+                    import snapshot_cache
+                    if snapshot_cache.needs_save(self._cache):
+                        snapshot_cache.save(self.csv_file, self._cache)
+        return self._cache
+
+    def _restore_snapshot(self):
+        """The snapshot saved in the cache file by an earlier run, or None if there is none."""
+        import snapshot_cache  # columnar 依赖本模块，在用到时才导入
+        snapshot = _LedgerSnapshot(None)
+        return snapshot if snapshot_cache.load(self.csv_file, snapshot) else None
+
+    def _file_key(self):
+        """(inode, mtime_ns, size) of the CSV file, or None if it is missing."""
         try:
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                
-                # 检查是否只有表头没有数据
-                rows = list(reader)
-                if not rows:
-                    return records
-                
-                for row in rows:
-                    try:
-                        # 安全的数据类型转换
-                        converted_row = {
-                            'student_name': str(row.get('student_name', '')),
-                            'student_id': str(row.get('student_id', '')),
-                            'date': self.safe_convert(row.get('date', ''), date, datetime.now().date()),
-                            'month': str(row.get('month', '') or self._derive_month_str(row.get('date', ''))),
-                            'duration_minutes': self.safe_convert(row.get('duration_minutes', 0), int, 0),
-                            'hourly_rate': self.safe_convert(row.get('hourly_rate', 0), float, 0.0),
-                            'total_income': self.safe_convert(row.get('total_income', 0), float, 0.0),
-                            'topic_covered': str(row.get('topic_covered', '')),
-                            'homework_assigned': str(row.get('homework_assigned', '')),
-                            'student_performance': self.safe_convert(row.get('student_performance', 5), int, 5),
-                            'notes': str(row.get('notes', '')),
-                            'next_plan': str(row.get('next_plan', ''))
-                        }
-                        
-                        record = TeachingRecord(**{k: v for k, v in converted_row.items() if k != 'month'})
-                        
-                        # 筛选逻辑
-                        match = True
-                        if student_name and student_name.lower() not in record.student_name.lower():
-                            match = False
-                        if student_id and student_id != record.student_id:
-                            match = False
-                        if topic and topic.lower() not in record.topic_covered.lower():
-                            match = False
-                        if month:
-                            month_str = converted_row['month']
-                            if not month_str or not month_str.startswith(str(month)):
-                                match = False
-
-                        if match:
-                            # 将月份附加到记录对象，便于上层使用
-                            try:
-                                record.month = converted_row['month']
-                            except Exception:
-                                pass
-                            records.append(record)
-                            
-                    except Exception as e:
-                        print(f"Warning: skipping invalid record row: {e}")
-                        continue
-                        
-        except Exception as e:
-            print(f"Error reading data file: {e}")
-            
-        return records
+            st = os.stat(self.csv_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
 
-    def get_all_students(self):
-        """Get all unique students (name and ID)."""
-        students = set()
-        
-        if not os.path.exists(CSV_FILE) or os.path.getsize(CSV_FILE) == 0:
-            return sorted(students)
-            
+    def _load_snapshot(self, key, previous=None):
+        """Bring the snapshot up to date with the file at version `key`.
+
+        When the file has only grown since `previous` was built (same inode,
+        same header, consumed bytes untouched), just the appended tail is
+        parsed and folded in; otherwise the whole file is reloaded.
+        """
+        snapshot = _LedgerSnapshot(key)
+        if key[2] == 0:
+            return snapshot
         try:
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    name = row.get('student_name', '').strip()
-                    sid = row.get('student_id', '').strip()
-                    if name and sid:  # 只添加非空的学生信息
-                        students.add((name, sid))
+            with open(self.csv_file, 'rb') as f:
+                same_file = previous is not None and previous.key is not None and previous.key[0] == key[0]
+                cursor = previous.cursor if same_file else snapshot.cursor
+                if sync_cursor(f, cursor, key[2]) and same_file:
+                    snapshot = previous
+                    snapshot.key = key
+                else:
+                    snapshot.cursor = cursor
+
+                rows = skipped = 0
+                ranges = parallel_scan.split_ranges(f, snapshot.cursor.offset, key[2])
+                results = None
+                if ranges:
+                    source = parallel_scan.source_of(f, snapshot.cursor.fieldnames)
+                    results = parallel_scan.decode_ranges(source, ranges)
+                if results is not None:
+                    # 各工作进程解码一段，按文件顺序拼接
+                    for batch, batch_rows, batch_skipped, defaulted in results:
+                        snapshot.records.extend(batch)
+                        snapshot.count_decoded(batch_rows, batch_skipped, defaulted)
+                        rows += batch_rows
+                        skipped += batch_skipped
+                    snapshot.cursor.offset = ranges[-1][1]
+                    snapshot.cursor.remember_tail(f)
+                    if instrumentation.active:
+                        instrumentation.count('bytes_read', ranges[-1][1] - ranges[0][0])
+                else:
+                    decoder = RowDecoder(snapshot.cursor.fieldnames)
+                    decode = decoder.decode
+                    append = snapshot.records.append_values
+                    for values in iter_rows(f, snapshot.cursor, key[2]):
+                        rows += 1
+                        try:
+                            append(decode(values))
+                        except (TypeError, OverflowError, AttributeError):
+                            skipped += 1
+                    snapshot.count_decoded(rows, skipped, decoder.defaulted)
+                if instrumentation.active:
+                    instrumentation.count('rows_read', rows)
+                    instrumentation.count('rows_decoded', rows - skipped)
+                    instrumentation.count('rows_skipped', skipped)
+                if skipped:
+                    print(f"Warning: skipped {skipped} invalid record row(s) in {self.csv_file}.")
         except Exception as e:
-            print(f"Error retrieving student list: {e}")
-            
-        return sorted(students)
+            print(f"Error reading data file: {e}")
+            # 状态可能只更新了一半，下次访问时完整重新加载
+            snapshot.key = None
+        return snapshot
 
-    def get_financial_summary(self):
-        """Get financial summary: total income, total hours, total lessons."""
-        total_income = 0.0
-        total_hours = 0.0
-        total_lessons = 0
-        
-        if not os.path.exists(CSV_FILE) or os.path.getsize(CSV_FILE) == 0:
-            return {
-                'total_income': 0.0,
-                'total_hours': 0.0,
-                'total_lessons': 0
-            }
-            
+    def _iter_file_records(self, filters=()):
+        """Decode records straight from the CSV file, one chunk in memory at a time.
+
+        filters are the query_records filters (row_decoder.row_filter arguments);
+        large files are decoded and filtered in worker processes.
+        """
         try:
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        total_income += self.safe_convert(row.get('total_income', 0), float, 0.0)
-                        total_hours += self.safe_convert(row.get('duration_minutes', 0), int, 0) / 60
-                        total_lessons += 1
-                    except:
-                        continue  # Skip problematic rows
+            # 只在打开文件时持有共享锁：之后追加的行不会读到，改写（重命名）也不影响已打开的文件
+            with FileLock(self.csv_file, shared=True):
+                f = open(self.csv_file, 'rb')
+                size = os.fstat(f.fileno()).st_size
+            with f:
+                cursor = LogCursor()
+                sync_cursor(f, cursor, 0)
+                ranges = parallel_scan.split_ranges(f, cursor.offset, size)
+                results = None
+                if ranges:
+                    source = parallel_scan.source_of(f, cursor.fieldnames)
+                    results = parallel_scan.filter_ranges(source, ranges, tuple(filters))
+                if results is not None:
+                    for matched, rows in results:
+                        if instrumentation.active:
+                            instrumentation.count('rows_read', rows)
+                            instrumentation.count('rows_decoded', rows)
+                        for row in matched:
+                            yield TeachingRecord(*row)
+                    return
+                decode = RowDecoder(cursor.fieldnames).decode
+                if instrumentation.active:
+                    decode = instrumentation.counted(decode, 'rows_read', 'rows_decoded')
+                keep = row_filter(*filters)
+                for values in iter_rows(f, cursor, size):
+                    row = decode(values)
+                    if keep is None or keep(row):
+                        yield TeachingRecord(*row)
         except Exception as e:
-            print(f"Error computing financial summary: {e}")
-        
+            print(f"Error reading data file: {e}")
+
+    def get_load_stats(self):
+        """Decode counters of the current snapshot: rows decoded, rows skipped, and defaulted fields."""
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return {'rows_decoded': 0, 'rows_skipped': 0, 'defaulted': dict.fromkeys(DEFAULTED_FIELDS, 0)}
         return {
-            'total_income': round(total_income, 2),
-            'total_hours': round(total_hours, 2),
-            'total_lessons': total_lessons
+            'rows_decoded': snapshot.rows_decoded,
+            'rows_skipped': snapshot.rows_skipped,
+            'defaulted': dict(snapshot.defaulted)
         }
 
+    def iter_records(self, student_name=None, student_id=None, topic=None, month=None, text=None,
+                     date_from=None, date_to=None):
+        """Yield matching records lazily in file order. Same filters as query_records."""
+        student_name = student_name.lower() if student_name else None
+        topic = topic.lower() if topic else None
+        month = str(month) if month else None
+        date_from, date_to = date_bound(date_from), date_bound(date_to)
+        query = TextQuery(text) if text else None
+        if text and not query:
+            return  # 查询串中没有可检索的词
+
+        if self._use_date_index(date_from, date_to):
+            found = self._lookup_dates(date_from, date_to)
+            if found is not None:
+                yield from self._iter_dated_records(found, (student_name, student_id, topic, month, text,
+                                                            date_from, date_to))
+                return
+
+        if not self.cache_records:
+            if not os.path.exists(self.csv_file):
+                return
+            # 筛选在解码后的行上进行，只为命中的行构造 TeachingRecord
+            yield from self._iter_file_records((student_name, student_id, topic, month, text, date_from, date_to))
+            return
+
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return
+        batch = snapshot.records
+        for i in self._iter_positions(snapshot, student_name, student_id, topic, month, query, date_from, date_to):
+            yield batch[i]
+
+    def _use_date_index(self, date_from, date_to) -> bool:
+        """Whether a date-range query should read through the date index instead of a full snapshot."""
+        if not (date_from or date_to) or self._dates is None:
+            return False
+        # 快照已是最新时直接在内存中的列上筛选
+        return not (self.cache_records and self._cache is not None and self._cache.key == self._file_key())
+
+    def _lookup_dates(self, date_from, date_to):
+        """Bring the date index up to date and find the rows in the range.
+
+        Returns (open CSV file, header field names, ascending row offsets, file
+        size the index describes), or None if the index cannot be used.
+        """
+        first, last = _ordinal_range(date_from, date_to)
+        dates = self._dates
+        # 更新索引与打开文件之间有写入方替换了文件时重试
+        for _ in range(3):
+            with dates.refreshed():
+                if dates.stamp is None:
+                    return None
+                with FileLock(self.csv_file, shared=True):
+                    if dates._stamp() != dates.stamp:
+                        continue
+                    f = open(self.csv_file, 'rb')
+                return (f, dates.cursor.fieldnames, dates.offsets_between(first, last, date.today().toordinal()),
+                        dates.stamp[0])
+        return None
+
+    def _iter_dated_records(self, found, filters):
+        """Decode only the rows at the offsets found by _lookup_dates; filters as in row_filter."""
+        f, fieldnames, offsets, end = found
+        with f:
+            decode = RowDecoder(fieldnames).decode
+            if instrumentation.active:
+                decode = instrumentation.counted(decode, 'rows_read', 'rows_decoded')
+            keep = row_filter(*filters)
+            for values in iter_rows_at(f, offsets, end):
+                row = decode(values)
+                # 同一物理行被 csv 拆成多条记录时，不在范围内的那些在这里排除
+                if keep(row):
+                    yield TeachingRecord(*row)
+
+    def _iter_positions(self, snapshot, student_name, student_id, topic, month, query,
+                        date_from=None, date_to=None):
+        """Positions in snapshot.records of the rows matching the (normalized) filters, in file order."""
+        # 筛选条件先在字典编码列的不同取值上求值，只为命中的行构造 TeachingRecord
+        batch = snapshot.records
+        count = len(batch)
+        conditions = []
+        if student_name:
+            conditions.append(batch.student_names.codes_where(lambda v: student_name in v.lower()))
+        if student_id:
+            conditions.append(batch.student_ids.codes_where(lambda v: v == student_id))
+        if topic:
+            conditions.append(batch.topics.codes_where(lambda v: topic in v.lower()))
+        if month:
+            conditions.append(batch.months.codes_where(lambda v: bool(v) and v.startswith(month)))
+        # 有全文检索条件时只检查倒排索引命中的行
+        positions = self._search_index(snapshot, query) if query else range(count)
+        if date_from or date_to:
+            first, last = _ordinal_range(date_from, date_to)
+            ordinals = batch.date_ordinals
+            positions = (i for i in positions if first <= ordinals[i] <= last)
+        for i in positions:
+            for codes, accepted in conditions:
+                if codes[i] not in accepted:
+                    break
+            else:
+                yield i
+
+    def query_records(self, student_name=None, student_id=None, topic=None, month=None, text=None,
+                      order_by=None, descending=False, limit=None, offset=0, date_from=None, date_to=None):
+        """Query records. Filter by student name, ID, topic, month (YYYY-MM), a date range
+        (date_from/date_to: dates or 'YYYY-MM-DD', inclusive), and a text search over topic,
+        homework, notes and next plan (see text_index.TextQuery for the syntax).
+
+        A date range on the CSV backend is answered from the persisted date index
+        (two binary searches, then only the matching rows are read) unless the
+        records are already cached in memory.
+
+        Results are in file order unless order_by is one of ORDER_BY ('date', 'income',
+        'performance', 'student'); descending reverses the order. limit and offset select
+        one page: only offset + limit matches are kept while scanning (top-k selection).
+        """
+        if order_by is not None and order_by not in ORDER_BY:
+            raise ValueError(f"Unknown sort key '{order_by}' (expected one of {', '.join(ORDER_BY)})")
+        if offset < 0 or (limit is not None and limit < 0):
+            raise ValueError("limit and offset must not be negative")
+        date_from, date_to = date_bound(date_from), date_bound(date_to)
+        if not (self.column_queries and self.cache_records) or self._use_date_index(date_from, date_to):
+            records = self.iter_records(student_name=student_name, student_id=student_id, topic=topic,
+                                        month=month, text=text, date_from=date_from, date_to=date_to)
+            return select_page(records, order_by and ORDER_BY[order_by], descending, limit, offset)
+
+        query = TextQuery(text) if text else None
+        if text and not query:
+            return []
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return []
+        # 在列上排序与选取，只为选中的行构造 TeachingRecord
+        batch = snapshot.records
+        positions = self._iter_positions(snapshot, student_name.lower() if student_name else None, student_id,
+                                         topic.lower() if topic else None, str(month) if month else None, query,
+                                         date_from, date_to)
+        key = _column_key(batch, order_by) if order_by else None
+        return [batch[i] for i in select_page(positions, key, descending, limit, offset)]
+
+    def _search_index(self, snapshot, query, fields=None) -> list:
+        """Search the snapshot's inverted text index, built on first use and extended with appended rows."""
+        with self._lock:
+            if snapshot.text_index is None:
+                snapshot.text_index = TextIndex()
+            snapshot.text_index.extend_from(snapshot.records)
+            return snapshot.text_index.search(query, fields)
+
+    def search_text(self, text: str, fields=None) -> list:
+        """Positions (file order) of the records matching a text search, optionally limited to some
+        of text_index.TEXT_FIELDS. Positions index into the cached snapshot; use query_records(text=...)
+        to get the records themselves."""
+        query = TextQuery(text)
+        snapshot = self._snapshot()
+        if snapshot is None or not query:
+            return []
+        return self._search_index(snapshot, query, fields)
+
+    def get_all_students(self):
+        """Get all unique students (name and ID)."""
+        with self._students.refreshed() as students:
+            return sorted(students.pairs)
+
+    def get_financial_summary(self):
+        """Get financial summary: total income, total hours, total lessons."""
+        with self._aggregates.refreshed() as aggregates:
+            return aggregates.financial_summary()
+
     def get_monthly_summary(self):
         """Summarize by month (YYYY-MM): lessons, total hours, total income."""
-        summary = {}
-        if not os.path.exists(CSV_FILE) or os.path.getsize(CSV_FILE) == 0:
-            return summary
-        try:
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        month_str = row.get('month') or self._derive_month_str(row.get('date', ''))
-                        if not month_str:
-                            continue
-                        minutes = self.safe_convert(row.get('duration_minutes', 0), int, 0)
-                        income = self.safe_convert(row.get('total_income', 0), float, 0.0)
-                        if month_str not in summary:
-                            summary[month_str] = {
-                                'lessons': 0,
-                                'hours': 0.0,
-                                'income': 0.0
-                            }
-                        summary[month_str]['lessons'] += 1
-                        summary[month_str]['hours'] += minutes / 60
-                        summary[month_str]['income'] += income
-                    except Exception:
-                        continue
-        except Exception as e:
-            print(f"Error computing monthly summary: {e}")
-        # 四舍五入
-        for m in list(summary.keys()):
-            summary[m]['hours'] = round(summary[m]['hours'], 2)
-            summary[m]['income'] = round(summary[m]['income'], 2)
-        return dict(sorted(summary.items()))
+        with self._aggregates.refreshed() as aggregates:
+            return aggregates.monthly_summary()
+
+    def verify_aggregates(self, rebuild=False):
+        """Recompute the stored aggregates from the CSV; return the differences found."""
+        return self._aggregates.verify(rebuild=rebuild)
+
+    def _record_batch(self) -> RecordBatch:
+        """All records as a RecordBatch: the cached snapshot, or a temporary batch streamed from disk."""
+        if self.cache_records:
+            snapshot = self._snapshot()
+            return snapshot.records if snapshot is not None else RecordBatch()
+        batch = RecordBatch()
+        for record in self._iter_file_records():
+            try:
+                batch.append(record)
+            except Exception as e:
+                print(f"Warning: skipping invalid record row: {e}")
+        return batch
+
+    def get_student_summary(self):
+        """Per-student totals keyed by name: lessons, hours, income, average performance, first/last lesson."""
+        with self._students.refreshed() as students:
+            return students.summary()
+
+    def get_student_monthly_summary(self):
+        """Per-student, per-month lessons, hours and income: {name: {month: stats}}."""
+        # NumPy 视图存在期间快照的数组不能扩容，与快照更新互斥
+        with self._lock:
+            return analytics.student_monthly_summary(self._record_batch())
 
     def get_student_id_by_name(self, student_name: str) -> str:
         """Find an existing student ID by student name."""
-        if not os.path.exists(CSV_FILE) or os.path.getsize(CSV_FILE) == 0:
-            return None
-        try:
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    existing_name = row.get('student_name', '').strip()
-                    existing_id = row.get('student_id', '').strip()
-                    if existing_name.lower() == student_name.lower():
-                        return existing_id
-        except Exception as e:
-            print(f"Error finding student ID: {e}")
-        return None
+        with self._students.refreshed() as students:
+            return students.id_by_name(student_name)
+
+    def get_student_name_by_id(self, student_id: str) -> str:
+        """Find the name a student ID was first recorded with."""
+        with self._students.refreshed() as students:
+            return students.name_by_id(student_id)
 
     def get_all_student_names_ids(self):
         """Get a mapping of all student names to IDs."""
-        name_id_map = {}
-        if not os.path.exists(CSV_FILE) or os.path.getsize(CSV_FILE) == 0:
-            return name_id_map
-        try:
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    name = row.get('student_name', '').strip()
-                    sid = row.get('student_id', '').strip()
-                    if name and sid:
-                        name_id_map[name] = sid
-        except Exception as e:
-            print(f"Error retrieving student list: {e}")
-        return name_id_map
- 
\ No newline at end of file
+        with self._students.refreshed() as students:
+            return students.name_id_map()
+
+    def rebuild_student_registry(self):
+        """Recompute the persisted student registry from the CSV."""
+        self._students.rebuild()
+
+
+class _LedgerSnapshot:
+    """Decoded contents of the CSV file at one (inode, mtime, size) version.
+
+    Records are shared between callers; treat them as read-only.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.cursor = LogCursor()
+        self.records = RecordBatch()
+        self.text_index = None  # 首次全文检索时建立，之后随追加的行增量扩展
+        self.saved_rows = 0  # 快照缓存文件中的行数
+        # 解码计数：读取的行数、跳过的行数、各字段回退为默认值的次数
+        self.rows_decoded = 0
+        self.rows_skipped = 0
+        self.defaulted = dict.fromkeys(DEFAULTED_FIELDS, 0)
+
+    def count_decoded(self, rows, skipped, defaulted):
+        self.rows_decoded += rows
+        self.rows_skipped += skipped
+        for field, count in defaulted.items():
+            self.defaulted[field] += count
+
+
+# 存储后端通过环境变量选择: csv（默认）、sqlite、partitioned（按月分文件）或 columnar（二进制列式文件）
+BACKEND_ENV = 'TUTOR_DB_BACKEND'
+SQLITE_FILE_ENV = 'TUTOR_DB_FILE'
+PARTITION_DIR_ENV = 'TUTOR_DB_DIR'
+COLUMNAR_FILE_ENV = 'TUTOR_COLUMNAR_FILE'
+
+
+def open_database(backend=None):
+    """Create the DatabaseManager for the configured storage backend."""
+    backend = (backend or os.environ.get(BACKEND_ENV) or 'csv').strip().lower()
+    if backend == 'csv':
+        cls, args = DatabaseManager, ()
+    elif backend == 'sqlite':
+        from sqlite_manager import SQLiteDatabaseManager, DB_FILE
+        cls, args = SQLiteDatabaseManager, (os.environ.get(SQLITE_FILE_ENV) or DB_FILE,)
+    elif backend == 'partitioned':
+        from partitioned_manager import PartitionedDatabaseManager, PARTITION_DIR
+        cls, args = PartitionedDatabaseManager, (os.environ.get(PARTITION_DIR_ENV) or PARTITION_DIR,)
+    elif backend == 'columnar':
+        from columnar import ColumnarDatabaseManager, COLUMNAR_FILE
+        cls, args = ColumnarDatabaseManager, (os.environ.get(COLUMNAR_FILE_ENV) or COLUMNAR_FILE,)
+    else:
+        raise ValueError(f"Unknown storage backend '{backend}' "
+                         "(expected 'csv', 'sqlite', 'partitioned' or 'columnar')")
+    if instrumentation.active:
+        # 在构造之前安装，启动时的表头检查/迁移也会被计时
+        instrument_database(cls)
+    return cls(*args)
+
+
+# 开启 instrumentation 时被计时的 DatabaseManager 方法（包括几个能看出耗时来源的内部步骤）
+TRACED_METHODS = (
+    'add_record', 'add_records', 'iter_records', 'query_records', 'search_text',
+    'get_all_students', 'get_financial_summary', 'get_monthly_summary', 'verify_aggregates',
+    'get_student_summary', 'get_student_monthly_summary', 'get_student_id_by_name',
+    'get_student_name_by_id', 'get_all_student_names_ids', 'rebuild_student_registry',
+    '_ensure_schema', '_load_snapshot', '_restore_snapshot', '_refresh_sidecars', '_lookup_dates',
+)
+
+
+def instrument_database(cls=DatabaseManager):
+    """Install timing wrappers on a DatabaseManager class (and its bases) and on sidecar refreshes."""
+    instrumentation.instrument(cls, TRACED_METHODS)
+    instrumentation.instrument(SidecarStore, ('refresh',))
@@ -0,0 +1,210 @@
+# date_index.py
+import json
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from csv_scan import LogCursor, iter_projected
+from row_decoder import parse_date
+from sidecar import SidecarStore
+from locking import FileLock, atomic_write
+
+# 文件格式: magic 'TDIX' | u16 版本 | u16 保留 | 若干块
+# 每块: u32 元数据字节数 | u32 条目数 | 元数据(JSON: stamp, cursor) | 日期序数 | 字节偏移（均为小端）
+# 第一块是重建时写入的全部条目；之后每次保存只追加一块，含新读取的行，元数据以最后一个完整块为准
+MAGIC = b'TDIX'
+_HEADER = struct.Struct('<4sHH')
+_BLOCK = struct.Struct('<II')
+# 追加的行中日期早于已有最大日期的条数不超过此值时逐条插入，否则整体重新排序
+INSERT_LIMIT = 64
+
+
+class DateIndex(SidecarStore):
+    """Sorted (date ordinal, byte offset) entries for every row of the CSV, persisted next to it.
+
+    A date-range query does two binary searches over the ordinals and then
+    reads only the rows at the selected offsets. Entries are kept sorted
+    when lessons are entered out of date order. Rows without a valid date
+    are stored with ordinal 0; they decode as today, so they match any
+    range that contains today.
+
+    Unlike the other sidecar files the index is stored in a binary format
+    and is brought up to date when a date range is queried, not on every
+    append. Saving appends a block with only the entries read since the
+    last save; the file is rewritten in full only after a rebuild.
+    """
+
+    SUFFIX = '.dates'
+    VERSION = 2
+    PROJECTION = ('date',)
+
+    def _clear(self):
+        self.ordinals = array('i')  # 升序；相同日期按字节偏移升序
+        self.offsets = array('q')
+        self._unsaved = []  # 上次读取或保存之后加入的 (序数, 偏移) 块，下次保存时追加到文件
+        self._saved = None  # 文件内容与 _unsaved 之外的状态一致时为文件的 _identity，否则整体重写
+
+    def _scan(self, f, fieldnames, start, end) -> int:
+        offsets = array('q')
+        ordinals = array('i')
+        parsed = {}  # 原始 date 字节 -> 日期序数
+        for (date_raw,) in iter_projected(f, fieldnames, self.PROJECTION, start, end, offsets=offsets):
+            ordinal = parsed.get(date_raw)
+            if ordinal is None:
+                try:
+                    day = parse_date(date_raw.decode('utf-8'))[0]
+                except UnicodeDecodeError:
+                    day = None
+                ordinal = parsed[date_raw] = day.toordinal() if day is not None else 0
+            ordinals.append(ordinal)
+        self._add(*_sort(ordinals, offsets))
+        return len(ordinals)
+
+    def _add(self, ordinals, offsets):
+        """Merge sorted entries of rows that come after every row already indexed."""
+        if not ordinals:
+            return
+        self._unsaved.append((ordinals, offsets))
+        mine = self.ordinals
+        if not mine or ordinals[0] >= mine[-1]:
+            mine.extend(ordinals)
+            self.offsets.extend(offsets)
+            return
+        early = bisect_left(ordinals, mine[-1])
+        if early <= INSERT_LIMIT:
+            # 少量补录的早期课程：逐条插入到相同日期的已有条目之后，其余直接追加
+            for ordinal, offset in zip(ordinals[:early], offsets[:early]):
+                i = bisect_right(mine, ordinal)
+                mine.insert(i, ordinal)
+                self.offsets.insert(i, offset)
+            mine.extend(ordinals[early:])
+            self.offsets.extend(offsets[early:])
+            return
+        # 已有条目在前，稳定排序后相同日期仍按字节偏移升序
+        mine.extend(ordinals)
+        self.offsets.extend(offsets)
+        self.ordinals, self.offsets = _sort(mine, self.offsets)
+
+    def _state(self) -> dict:
+        return {'ordinals': self.ordinals, 'offsets': self.offsets}
+
+    def _restore(self, state: dict):
+        self.ordinals = array('i', state['ordinals'])
+        self.offsets = array('q', state['offsets'])
+        self._unsaved = []
+        self._saved = None
+
+    def merge(self, other):
+        """Fold in the index of rows that come after this one's (e.g. a later range of the file)."""
+        self._add(other.ordinals, other.offsets)
+
+    def offsets_between(self, first: int, last: int, today: int) -> list:
+        """Ascending byte offsets of the rows dated first..last (inclusive date ordinals)."""
+        ordinals = self.ordinals
+        lo = bisect_left(ordinals, max(first, 1))
+        hi = bisect_right(ordinals, last)
+        selected = self.offsets[lo:hi]
+        if first <= today <= last:
+            selected.extend(self.offsets[:bisect_right(ordinals, 0)])
+        return sorted(selected)
+
+    def load(self):
+        """Read the index file if present; an unreadable file is treated as empty."""
+        self.loaded = True
+        try:
+            with open(self.path, 'rb') as f:
+                identity = _identity(os.fstat(f.fileno()))
+                data = f.read()
+            magic, version, _ = _HEADER.unpack_from(data)
+            if magic != MAGIC or version != self.VERSION:
+                return
+            pos = _HEADER.size
+            while pos < len(data):
+                if pos + _BLOCK.size > len(data):
+                    break
+                meta_size, count = _BLOCK.unpack_from(data, pos)
+                start = pos + _BLOCK.size + meta_size
+                middle = start + count * 4
+                end = middle + count * 8
+                if end > len(data):
+                    break
+                meta = json.loads(data[pos + _BLOCK.size:start].decode('utf-8'))
+                ordinals = array('i', data[start:middle])
+                offsets = array('q', data[middle:end])
+                if sys.byteorder != 'little':
+                    ordinals.byteswap()
+                    offsets.byteswap()
+                # 后面的块是之后追加的行，与增量刷新时一样合并
+                self._add(ordinals, offsets)
+                self.cursor = LogCursor.from_dict(meta['cursor'])
+                self.stamp = tuple(meta['stamp'])
+                pos = end
+            self._unsaved = []
+            # 末尾是追加中断留下的不完整块时忽略它，下次保存整体重写
+            self._saved = identity if pos == len(data) else None
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Warning: ignoring unreadable file {self.path}: {e}")
+            self._reset()
+
+    def save(self):
+        # 加锁后再比对文件：同时保存的两个进程不会各自追加同一批条目
+        with FileLock(self.path):
+            if self._saved is None or not self._append():
+                self._rewrite()
+
+    def _append(self) -> bool:
+        """Append the unsaved entries as one block, if the file is still the one last read or written."""
+        if len(self._unsaved) == 1:
+            ordinals, offsets = self._unsaved[0]
+        else:
+            ordinals = array('i')
+            offsets = array('q')
+            for chunk_ordinals, chunk_offsets in self._unsaved:
+                ordinals.extend(chunk_ordinals)
+                offsets.extend(chunk_offsets)
+            ordinals, offsets = _sort(ordinals, offsets)
+        try:
+            f = open(self.path, 'r+b')
+        except FileNotFoundError:
+            return False
+        with f:
+            # 其他进程替换或追加过文件时，文件内容不再是本进程的状态减去 _unsaved
+            if _identity(os.fstat(f.fileno())) != self._saved:
+                return False
+            f.seek(0, os.SEEK_END)
+            f.write(self._block(ordinals, offsets))
+            f.flush()
+            self._saved = _identity(os.fstat(f.fileno()))
+        self._unsaved = []
+        return True
+
+    def _rewrite(self):
+        # 与其他辅助文件一样原子替换，派生数据不需要 fsync
+        with atomic_write(self.path, 'wb', fsync=False) as f:
+            f.write(_HEADER.pack(MAGIC, self.VERSION, 0))
+            f.write(self._block(self.ordinals, self.offsets))
+        self._saved = _identity(os.stat(self.path))
+        self._unsaved = []
+
+    def _block(self, ordinals, offsets) -> bytes:
+        meta = json.dumps({'stamp': list(self.stamp), 'cursor': self.cursor.to_dict()}).encode('utf-8')
+        if sys.byteorder != 'little':
+            ordinals = array('i', ordinals)
+            offsets = array('q', offsets)
+            ordinals.byteswap()
+            offsets.byteswap()
+        return b''.join((_BLOCK.pack(len(meta), len(ordinals)), meta, ordinals.tobytes(), offsets.tobytes()))
+
+
+def _sort(ordinals, offsets):
+    """Entries stably sorted by date ordinal: rows with the same date keep their order."""
+    order = sorted(range(len(ordinals)), key=ordinals.__getitem__)
+    return array('i', map(ordinals.__getitem__, order)), array('q', map(offsets.__getitem__, order))
+
+
+def _identity(st):
+    # 原子替换会换 inode，追加会改变大小与 mtime
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
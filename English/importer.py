@@ -0,0 +1,109 @@
+# importer.py
+import csv
+import json
+import math
+import os
+import sys
+from datetime import datetime
+from models import TeachingRecord
+
+
+def _parse_lesson(data: dict) -> TeachingRecord:
+    """Build a TeachingRecord from a dict with FIELDNAMES keys; raise ValueError if unusable."""
+    def text(key):
+        value = data.get(key)
+        return '' if value is None else str(value).strip()
+
+    for key in ('student_name', 'student_id', 'date', 'duration_minutes', 'hourly_rate'):
+        if not text(key):
+            raise ValueError(f"missing '{key}'")
+    try:
+        lesson_date = datetime.strptime(text('date')[:10], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"invalid date '{text('date')}', expected YYYY-MM-DD")
+    try:
+        duration = float(text('duration_minutes'))
+        # "90.0" 按 90 分钟处理；"90.7" 保留原值，由 DatabaseManager 的校验报告并跳过，不截断
+        if duration.is_integer():
+            duration = int(duration)
+        hourly_rate = float(text('hourly_rate'))
+        performance = int(text('student_performance') or 5)
+    except ValueError as e:
+        raise ValueError(f"invalid number: {e}")
+    # float() 接受 'nan' 与 'inf'，写入后汇总会变成 nan
+    if not math.isfinite(hourly_rate):
+        raise ValueError(f"invalid hourly rate '{text('hourly_rate')}'")
+
+    # total_income 由 DatabaseManager 根据时长和费率重新计算
+    return TeachingRecord(
+        student_name=text('student_name'),
+        student_id=text('student_id'),
+        date=lesson_date,
+        duration_minutes=duration,
+        hourly_rate=hourly_rate,
+        total_income=0.0,
+        topic_covered=text('topic_covered'),
+        homework_assigned=text('homework_assigned'),
+        student_performance=performance,
+        notes=text('notes'),
+        next_plan=text('next_plan')
+    )
+
+
+def _iter_csv_rows(path):
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def _iter_ndjson_rows(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_num, e
+                continue
+            yield line_num, row
+
+
+def detect_format(path: str) -> str:
+    """Guess 'csv' or 'ndjson' from the file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    return 'ndjson' if ext in ('.ndjson', '.jsonl', '.json') else 'csv'
+
+
+def load_lessons(path: str, fmt: str = None):
+    """Yield TeachingRecords read from a CSV or NDJSON file, skipping unusable rows with a warning."""
+    fmt = fmt or detect_format(path)
+    rows = _iter_ndjson_rows(path) if fmt == 'ndjson' else _iter_csv_rows(path)
+    for line_num, row in rows:
+        if not isinstance(row, dict):
+            print(f"Warning: skipping line {line_num}: {row if isinstance(row, Exception) else 'not an object'}")
+            continue
+        try:
+            yield _parse_lesson(row)
+        except ValueError as e:
+            print(f"Warning: skipping line {line_num}: {e}")
+
+
+def import_lessons(db, path: str, fmt: str = None) -> int:
+    """Import lessons from a file into db with one bulk append. Returns the number added."""
+    if not os.path.exists(path):
+        print(f"File not found: {path}")
+        return 0
+    return db.add_records(load_lessons(path, fmt))
+
+
+if __name__ == '__main__':
+    # 用法: python importer.py 文件 [csv|ndjson]
+    from database_manager import open_database
+
+    if len(sys.argv) < 2:
+        print("Usage: python importer.py FILE [csv|ndjson]")
+        sys.exit(2)
+    import_lessons(open_database(), sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
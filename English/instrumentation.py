@@ -0,0 +1,203 @@
+# instrumentation.py
+import inspect
+import os
+import threading
+import time
+
+# 设置该环境变量（如 TUTOR_TRACE=1）后，main.py 在每个菜单操作结束时打印调用耗时与读取统计
+TRACE_ENV = 'TUTOR_TRACE'
+
+COUNTERS = ('rows_read', 'rows_decoded', 'rows_skipped', 'bytes_read')
+# 每次操作最多保留的调用记录数
+MAX_TRACE = 500
+
+# 为 False 时不安装任何计时包装，数据读取代码也只在块级别做一次布尔判断
+tracing = bool(os.environ.get(TRACE_ENV, '').strip())
+active = tracing
+
+counters = dict.fromkeys(COUNTERS, 0)
+trace = []   # 自上次 take_trace() 以来的 Call 记录，按开始顺序
+totals = {}  # 名称 -> [调用次数, 秒数, rows_read, rows_decoded, rows_skipped, bytes_read]
+# AsyncDatabaseManager 在线程池中执行被计时的读取：上面三个共享结构由 _lock 保护，
+# 嵌套深度与本线程的计数放在线程局部变量中，调用的计数增量只包含本线程完成的工作
+_lock = threading.Lock()
+_local = threading.local()
+_INDEX = {name: i for i, name in enumerate(COUNTERS)}
+
+
+def _thread_state():
+    state = getattr(_local, 'state', None)
+    if state is None:
+        state = _local.state = [0, [0] * len(COUNTERS)]  # [嵌套深度, 本线程各计数的累计值]
+    return state
+
+
+def enable():
+    """Start collecting counters and timings (wrappers still have to be installed with instrument)."""
+    global active
+    active = True
+
+
+def count(name: str, n: int = 1):
+    """Add n to a counter; callers check `instrumentation.active` first."""
+    _thread_state()[1][_INDEX[name]] += n
+    with _lock:
+        counters[name] += n
+
+
+def counted(func, *names):
+    """Wrap func so that each call adds one to the given counters."""
+    def wrapper(*args):
+        for name in names:
+            count(name)
+        return func(*args)
+    return wrapper
+
+
+class Call:
+    """One traced call: name, nesting depth, wall time and counter deltas (children included)."""
+
+    __slots__ = ('name', 'depth', 'seconds', 'deltas')
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.seconds = 0.0
+        self.deltas = [0] * len(COUNTERS)
+
+
+def _begin(name):
+    call = Call(name, _thread_state()[0])
+    with _lock:
+        if len(trace) < MAX_TRACE:
+            trace.append(call)
+        entry = totals.get(name)
+        if entry is None:
+            entry = totals[name] = [0, 0.0] + [0] * len(COUNTERS)
+        entry[0] += 1
+    return call
+
+
+def _run(call, func, args, kwargs):
+    """Run func inside call, adding its wall time and counter changes to the call and the totals."""
+    state = _thread_state()
+    counts = state[1]
+    before = counts[:]
+    start = time.perf_counter()
+    state[0] += 1
+    try:
+        return func(*args, **kwargs)
+    finally:
+        state[0] -= 1
+        elapsed = time.perf_counter() - start
+        with _lock:
+            entry = totals[call.name]
+            call.seconds += elapsed
+            entry[1] += elapsed
+            for i, value in enumerate(counts):
+                delta = value - before[i]
+                call.deltas[i] += delta
+                entry[2 + i] += delta
+
+
+def traced(func, method=False):
+    """Timing wrapper for func. Methods are named after the instance's class at call time.
+
+    For generator functions only the time spent producing items is counted,
+    not the time the consumer spends between them.
+    """
+    def name_of(args):
+        return f"{type(args[0]).__name__}.{func.__name__}" if method and args else func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        def wrapper(*args, **kwargs):
+            call = _begin(name_of(args))
+            gen = func(*args, **kwargs)
+            try:
+                while True:
+                    try:
+                        item = _run(call, next, (gen,), {})
+                    except StopIteration:
+                        return
+                    yield item
+            finally:
+                gen.close()
+    else:
+        def wrapper(*args, **kwargs):
+            return _run(_begin(name_of(args)), func, args, kwargs)
+
+    wrapper.__name__ = func.__name__
+    wrapper.__qualname__ = func.__qualname__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__wrapped__ = func
+    wrapper._traced = True
+    return wrapper
+
+
+def instrument(cls, names):
+    """Replace the named methods on cls and its base classes with timing wrappers (idempotent)."""
+    for klass in cls.__mro__:
+        for name in names:
+            func = klass.__dict__.get(name)
+            if callable(func) and not getattr(func, '_traced', False):
+                setattr(klass, name, traced(func, method=True))
+
+
+def instrument_functions(namespace: dict, names):
+    """Replace module-level functions in namespace (e.g. globals()) with timing wrappers."""
+    for name in names:
+        func = namespace.get(name)
+        if callable(func) and not getattr(func, '_traced', False):
+            namespace[name] = traced(func)
+
+
+def take_trace() -> list:
+    """Return the calls recorded since the last call and start a new trace."""
+    with _lock:
+        calls = trace[:]
+        del trace[:]
+    return calls
+
+
+def _describe(seconds, deltas):
+    rows_read, rows_decoded, rows_skipped, bytes_read = deltas
+    return (f"{seconds * 1000:10.2f} ms | rows read {rows_read}, decoded {rows_decoded}, "
+            f"skipped {rows_skipped} | {bytes_read:,} bytes")
+
+
+def format_trace(calls) -> list:
+    """Lines describing one action's calls, nested by depth."""
+    if not calls:
+        return []
+    lines = []
+    base = min(call.depth for call in calls)
+    width = max(len(call.name) + 2 * (call.depth - base) for call in calls) + 2
+    for call in calls:
+        label = '  ' * (call.depth - base) + call.name
+        lines.append(f"  {label:<{width}}{_describe(call.seconds, call.deltas)}")
+    top = [call for call in calls if call.depth == base]
+    if len(top) == 1:
+        inner = sum(call.seconds for call in calls if call.depth == base + 1)
+        lines.append(f"  {'(outside traced calls: input, rendering)':<{width}}"
+                     f"{(top[0].seconds - inner) * 1000:10.2f} ms")
+    return lines
+
+
+def format_totals() -> list:
+    """Lines with cumulative per-name statistics, slowest first."""
+    headers = ('Name', 'Calls', 'Total ms', 'Avg ms', 'Rows read', 'Decoded', 'Skipped', 'Bytes read')
+    with _lock:
+        entries = sorted(((name, tuple(entry)) for name, entry in totals.items()), key=lambda item: -item[1][1])
+        overall = dict(counters)
+    rows = []
+    for name, (calls, seconds, rows_read, rows_decoded, rows_skipped, bytes_read) in entries:
+        rows.append((name, str(calls), f"{seconds * 1000:.2f}", f"{seconds * 1000 / calls:.2f}",
+                     str(rows_read), str(rows_decoded), str(rows_skipped), f"{bytes_read:,}"))
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    lines = ["  ".join(h.ljust(widths[0]) if i == 0 else h.rjust(widths[i]) for i, h in enumerate(headers))]
+    lines.append("-" * len(lines[0]))
+    for row in rows:
+        lines.append("  ".join(c.ljust(widths[0]) if i == 0 else c.rjust(widths[i]) for i, c in enumerate(row)))
+    totals_line = ', '.join(f"{name.replace('_', ' ')} {value:,}" for name, value in overall.items())
+    lines.append(f"Overall: {totals_line}")
+    return lines
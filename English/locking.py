@@ -0,0 +1,193 @@
+# locking.py
+import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Windows 上加锁失败后重试的间隔（秒）
+_RETRY_INTERVAL = 0.01
+
+
+if fcntl is not None:
+    def _lock(fd, shared):
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+else:
+    def _lock(fd, shared):
+        # msvcrt 只有排他锁；LK_LOCK 只重试 10 次，这里自行循环等待
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                time.sleep(_RETRY_INTERVAL)
+
+    def _unlock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Advisory lock for a data file, held on a sibling `<path>.lock` file.
+
+    Writers take it exclusively; readers take it shared (exclusive on Windows)
+    for the moment they need a consistent view. It works between processes
+    and between threads, but is not reentrant: never nest two locks on the
+    same path in one thread. Because the lock lives in its own file, it stays
+    valid when the data file is replaced by a rename.
+    """
+
+    SUFFIX = '.lock'
+
+    def __init__(self, path, shared=False):
+        self.lock_path = path + self.SUFFIX
+        self.shared = shared
+        self._fd = None
+
+    def __enter__(self):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _lock(fd, self.shared)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fd, self._fd = self._fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+
+def _file_mode(path):
+    """Permission bits for a replacement of path: the current ones, or the umask default."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_write(path, mode='w', fsync=True, **open_kwargs):
+    """Write a replacement for path: yields a temp file in the same directory that is
+    renamed over path on success (after an fsync unless fsync=False) and removed on error."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class _Ticket:
+    __slots__ = ('text', 'done', 'error')
+
+    def __init__(self, text):
+        self.text = text
+        self.done = False
+        self.error = None
+
+
+class GroupCommit:
+    """Serializes appends to one file and batches concurrent ones into a single write + fsync.
+
+    The first thread to arrive becomes the leader: it takes every pending
+    append, writes them under the file's FileLock, fsyncs once and wakes the
+    waiting threads, repeating until nothing is pending. Other processes are
+    kept out by the lock; each process batches its own appenders.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._cond = threading.Condition()
+        self._pending = []
+        self._writing = False
+        self.batches = 0  # 已提交的写入次数（每次一次 fsync）
+        self.appends = 0  # 已提交的 append 调用次数
+
+    def append(self, text: str):
+        """Append text durably; returns once it is on disk. Raises the write's error (usually OSError)
+        if the batch holding this append could not be written."""
+        ticket = _Ticket(text)
+        with self._cond:
+            self._pending.append(ticket)
+            while self._writing and not ticket.done:
+                self._cond.wait()
+            if not ticket.done:
+                self._writing = True
+        if not ticket.done:
+            self._lead()
+        if ticket.error is not None:
+            raise ticket.error
+
+    def _lead(self):
+        try:
+            while True:
+                with self._cond:
+                    batch, self._pending = self._pending, []
+                    if not batch:
+                        return
+                error = None
+                try:
+                    self._write(''.join(ticket.text for ticket in batch))
+                except Exception as e:
+                    # 同一批的每个 append 都收到这个错误；只捕获 OSError 时，其他异常会让等待的线程误以为已写入
+                    error = e
+                with self._cond:
+                    self.batches += 1
+                    self.appends += len(batch)
+                    for ticket in batch:
+                        ticket.error = error
+                        ticket.done = True
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def _write(self, text):
+        with FileLock(self.path):
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+_committers = {}
+_committers_lock = threading.Lock()
+
+
+def group_commit(path) -> GroupCommit:
+    """The process-wide GroupCommit for path, so all managers of one file share a batch queue."""
+    key = os.path.abspath(path)
+    with _committers_lock:
+        committer = _committers.get(key)
+        if committer is None:
+            committer = _committers[key] = GroupCommit(path)
+        return committer
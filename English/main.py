@@ -1,77 +1,42 @@
 # main.py
+import sys
 from datetime import datetime
-from database_manager import DatabaseManager
+from itertools import islice
+from database_manager import (DatabaseManager, open_database, instrument_database, ORDER_BY, date_bound,
+                              is_valid_rate)
 from models import TeachingRecord
-import unicodedata
-
-try:
-    from rich.console import Console
-    from rich.table import Table
-    RICH_AVAILABLE = True
-except Exception:
-    RICH_AVAILABLE = False
-
-def _visual_len(s: str) -> int:
-    l = 0
-    for ch in str(s):
-        l += 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
-    return l
-
-def _pad_right(s: str, width: int) -> str:
-    s = str(s)
-    vlen = _visual_len(s)
-    return s + ' ' * max(0, width - vlen)
+from render import format_table, iter_record_blocks, write_lines, RULE
+import instrumentation
 
-def _print_students_plain_table(students_data: dict, student_lesson_count: dict):
-    rows = []
-    for i, (name, sid) in enumerate(students_data.items(), 1):
-        rows.append((str(i), name, sid, f"{student_lesson_count.get(name, 0)} lessons"))
+# rich 的导入占启动时间的很大一部分，只在第一次显示表格时导入
+_rich = None
+
+def _rich_classes():
+    """(Console, Table) from rich, imported on first use; None if rich is not installed."""
+    global _rich
+    if _rich is None:
+        try:
+            from rich.console import Console
+            from rich.table import Table
+            _rich = (Console, Table)
+        except Exception:
+            _rich = ()
+    return _rich or None
 
+# Number of records shown per page of query results
+PAGE_SIZE = 10
+
+def _print_students_plain_table(students_data: dict, student_lesson_count: dict):
+    rows = [(str(i), name, sid, f"{student_lesson_count.get(name, 0)} lessons")
+            for i, (name, sid) in enumerate(students_data.items(), 1)]
     headers = ("No.", "Student Name", "Student ID", "Lessons")
-    widths = [0, 0, 0, 0]
-    for idx, h in enumerate(headers):
-        widths[idx] = max(widths[idx], _visual_len(h))
-    for r in rows:
-        for idx, cell in enumerate(r):
-            widths[idx] = max(widths[idx], _visual_len(cell))
-
-    header_line = "  ".join(_pad_right(h, widths[i]) for i, h in enumerate(headers))
-    print("\n--- All Students ---")
-    print(header_line)
-    print("-" * max(45, len(header_line)))
-    for r in rows:
-        print("  ".join(_pad_right(r[i], widths[i]) for i in range(4)))
+    write_lines(["\n--- All Students ---"] + format_table(headers, rows))
 
 def _print_monthly_plain_table(summary: dict):
     headers = ("Month", "Lessons", "Total Hours", "Total Income ($)")
-    rows = []
-    for m, stats in summary.items():
-        rows.append((str(m), str(stats.get('lessons', 0)), f"{stats.get('hours', 0.0):.2f}", f"{stats.get('income', 0.0):.2f}"))
-
-    widths = [0, 0, 0, 0]
-    for idx, h in enumerate(headers):
-        widths[idx] = max(widths[idx], _visual_len(h))
-    for r in rows:
-        for idx, cell in enumerate(r):
-            widths[idx] = max(widths[idx], _visual_len(cell))
-
-    header_line = "  ".join(_pad_right(h, widths[i]) for i, h in enumerate(headers))
-    print("\n--- Monthly Summary ---")
-    print(header_line)
-    print("-" * max(45, len(header_line)))
-    for r in rows:
-        print("  ".join(_pad_right(r[i], widths[i]) for i in range(4)))
-
-def get_performance_emoji(score: int) -> str:
-    """Return an emoji representation for the given performance score."""
-    if score >= 9:
-        return "🌟"
-    elif score >= 7:
-        return "👍"
-    elif score >= 5:
-        return "😐"
-    else:
-        return "💪"
+    rows = [(str(m), str(stats.get('lessons', 0)), f"{stats.get('hours', 0.0):.2f}", f"{stats.get('income', 0.0):.2f}")
+            for m, stats in summary.items()]
+    write_lines(["\n--- Monthly Summary ---"] + format_table(headers, rows))
 
 def add_new_record(db: DatabaseManager):
     print("\n--- Add New Lesson Record ---")
@@ -128,10 +93,10 @@ def add_new_record(db: DatabaseManager):
     while True:
         try:
             hourly_rate = float(input("Hourly Rate ($): "))
-            if hourly_rate > 0:
+            if is_valid_rate(hourly_rate):
                 break
             else:
-                print("Rate must be greater than 0.")
+                print("Rate must be a number greater than 0.")
         except ValueError:
             print("Please enter a valid number.")
 
@@ -178,6 +143,8 @@ def query_records(db: DatabaseManager):
     selected_sid = None
     topic = None
     month = None
+    date_from = date_to = None
+    text = None
 
     if existing_students:
         print("\nStudents (select a number):")
@@ -200,56 +167,101 @@ def query_records(db: DatabaseManager):
             else:
                 print("Out of range, please try again.")
 
-        # 选择了具体学生后，仅再询问主题与月份
+        # 选择了具体学生后，仅再询问主题、月份与全文检索
         if selected_name:
             topic = input("Filter by lesson topic (Enter to skip): ") or None
-            month = input("Filter by month (YYYY-MM, Enter to skip): ") or None
+            month, date_from, date_to = _ask_month_or_dates()
+            text = input("Search topic/homework/notes/plan (Enter to skip): ") or None
         else:
             # Custom filter
             print("Tip: You can filter by any combination; press Enter to skip a field.")
             selected_name = input("Filter by student name: ") or None
             selected_sid = input("Filter by student ID: ") or None
             topic = input("Filter by lesson topic: ") or None
-            month = input("Filter by month (YYYY-MM, Enter to skip): ") or None
+            month, date_from, date_to = _ask_month_or_dates()
+            text = input("Search topic/homework/notes/plan (words, OR, prefix*): ") or None
     else:
         # Fallback when there is no student data
         print("Tip: You can filter by any combination; press Enter to skip a field.")
         selected_name = input("Filter by student name: ") or None
         selected_sid = input("Filter by student ID: ") or None
         topic = input("Filter by lesson topic: ") or None
-        month = input("Filter by month (YYYY-MM, Enter to skip): ") or None
+        month, date_from, date_to = _ask_month_or_dates()
+        text = input("Search topic/homework/notes/plan (words, OR, prefix*): ") or None
+
+    order_by, descending = _ask_sort_order()
 
+    filters = dict(student_name=selected_name, student_id=selected_sid, topic=topic, month=month,
+                   text=text, date_from=date_from, date_to=date_to)
     try:
-        records = db.query_records(student_name=selected_name, student_id=selected_sid, topic=topic, month=month)
-
-        if not records:
-            print("No matching records found.")
-            return
-
-        print(f"\nFound {len(records)} record(s):")
-        print("-" * 90)
-        for i, record in enumerate(records, 1):
-            # Emoji for quick visualization of performance
-            performance_emoji = get_performance_emoji(record.student_performance)
-            
-            print(f"Record #{i}")
-            print(f"  Student: {record.student_name} ({record.student_id})")
-            print(f"  Date: {record.date}, Duration: {record.duration_minutes} minutes")
-            try:
-                print(f"  Month: {getattr(record, 'month', '')}")
-            except Exception:
-                pass
-            print(f"  Rate: ${record.hourly_rate}/hour, Income: ${record.total_income}")
-            print(f"  Topic: {record.topic_covered}")
-            print(f"  Homework: {record.homework_assigned}")
-            print(f"  Performance: {record.student_performance}/10 {performance_emoji}")
-            print(f"  Notes: {record.notes}")
-            print(f"  Plan: {record.next_plan}")
-            print("-" * 90)
+        page = 0
+        while True:
+            # 多取一条，用来判断是否还有下一页
+            records = db.query_records(order_by=order_by, descending=descending,
+                                       limit=PAGE_SIZE + 1, offset=page * PAGE_SIZE, **filters)
+            if not records and page == 0:
+                print("No matching records found.")
+                return
+            has_next = len(records) > PAGE_SIZE
+            write_lines([f"\nMatching records, page {page + 1}:", RULE]
+                        + list(iter_record_blocks(records[:PAGE_SIZE], page * PAGE_SIZE + 1)))
+
+            if has_next:
+                prompt = "Enter or n for the next page, a for all the rest"
+            else:
+                print(f"{page * PAGE_SIZE + len(records)} record(s) in total.")
+                if page == 0:
+                    return
+                prompt = "Last page. Enter to stop"
+            if page > 0:
+                prompt += ", p for the previous page"
+            more = input(prompt + ", q to stop: ").strip().lower()
+            if more == 'q' or (more in ('', 'n') and not has_next):
+                break
+            if more == 'p' and page > 0:
+                page -= 1
+            elif more in ('', 'n') and has_next:
+                page += 1
+            elif more == 'a' and has_next:
+                start = (page + 1) * PAGE_SIZE
+                shown = write_lines(iter_record_blocks(_records_after(db, filters, order_by, descending, start),
+                                                       start + 1))
+                print(f"{start + shown} record(s) in total.")
+                break
     except Exception as e:
         print(f"Error during query: {e}")
         print("Please check if the data file is intact.")
 
+def _records_after(db: DatabaseManager, filters: dict, order_by, descending: bool, offset: int):
+    """Matching records after the first offset; streamed as they are read when no sort order is needed."""
+    if order_by is None:
+        return islice(db.iter_records(**filters), offset, None)
+    return db.query_records(order_by=order_by, descending=descending, offset=offset, **filters)
+
+def _ask_month_or_dates():
+    """Ask for a month or a date range; returns (month, date_from, date_to) for db.query_records."""
+    while True:
+        answer = input("Filter by month (YYYY-MM) or dates (YYYY-MM-DD..YYYY-MM-DD, either side optional), "
+                       "Enter to skip: ").strip()
+        if '..' not in answer:
+            return answer or None, None, None
+        start, _, end = answer.partition('..')
+        try:
+            return None, date_bound(start), date_bound(end)
+        except ValueError as e:
+            print(f"{e}. Please try again.")
+
+def _ask_sort_order():
+    """Ask how to sort query results; returns (order_by, descending) for db.query_records."""
+    while True:
+        answer = input("Sort by date, income, performance or student, add 'desc' to reverse "
+                       "(Enter for entry order): ").strip().lower().split()
+        if not answer:
+            return None, False
+        if answer[0] in ORDER_BY and answer[1:] in ([], ['desc']):
+            return answer[0], answer[1:] == ['desc']
+        print(f"Please enter one of: {', '.join(ORDER_BY)} (optionally followed by 'desc').")
+
 def show_all_students(db: DatabaseManager):
     """Display all students and their lesson counts."""
     students_data = db.get_all_student_names_ids()
@@ -258,12 +270,11 @@ def show_all_students(db: DatabaseManager):
         return
 
     # Count lessons per student
-    student_lesson_count = {}
-    records = db.query_records()
-    for record in records:
-        student_lesson_count[record.student_name] = student_lesson_count.get(record.student_name, 0) + 1
+    student_lesson_count = {name: stats['lessons'] for name, stats in db.get_student_summary().items()}
 
-    if RICH_AVAILABLE:
+    rich = _rich_classes()
+    if rich:
+        Console, Table = rich
         console = Console()
         table = Table(show_header=True, header_style="bold")
         table.add_column("No.", justify="right", width=4, no_wrap=True)
@@ -293,7 +304,9 @@ def show_monthly_summary(db: DatabaseManager):
     if not summary:
         print("No data available.")
         return
-    if RICH_AVAILABLE:
+    rich = _rich_classes()
+    if rich:
+        Console, Table = rich
         console = Console()
         table = Table(show_header=True, header_style="bold")
         table.add_column("Month", justify="left", no_wrap=True)
@@ -308,8 +321,44 @@ def show_monthly_summary(db: DatabaseManager):
     else:
         _print_monthly_plain_table(summary)
 
+# 开启 instrumentation 时被计时的菜单操作
+ACTION_HANDLERS = ('add_new_record', 'query_records', 'show_all_students',
+                   'show_financial_summary', 'show_monthly_summary')
+
+def show_diagnostics(db: DatabaseManager):
+    """Hidden menu option: cumulative timings and read statistics since startup."""
+    print("\n--- Diagnostics ---")
+    if not instrumentation.active:
+        # 默认不计时；第一次打开诊断时才安装计时包装
+        instrumentation.enable()
+        instrument_database(type(db))
+        instrumentation.instrument_functions(globals(), ACTION_HANDLERS)
+        print("Instrumentation is now on; statistics are collected from the next action.")
+        print(f"(Set {instrumentation.TRACE_ENV}=1 to collect from startup and print a trace after each action.)")
+        return
+    if not instrumentation.totals:
+        print("No operations recorded yet.")
+    else:
+        for line in instrumentation.format_totals():
+            print(line)
+    load_stats = db.get_load_stats()
+    defaulted = ', '.join(f"{field} {n}" for field, n in load_stats['defaulted'].items() if n) or 'none'
+    print(f"Current data: {load_stats['rows_decoded']} row(s) decoded, "
+          f"{load_stats['rows_skipped']} skipped, defaulted fields: {defaulted}")
+
+def _print_trace(action: str):
+    """Print the calls made by the last menu action (only when TUTOR_TRACE is set)."""
+    calls = instrumentation.take_trace()
+    if instrumentation.tracing and calls:
+        print(f"\n[trace] {action}")
+        for line in instrumentation.format_trace(calls):
+            print(line)
+
 def main():
-    db = DatabaseManager()
+    if instrumentation.active:
+        instrumentation.instrument_functions(globals(), ACTION_HANDLERS)
+    db = open_database()
+    _print_trace('startup')
     print("=== Tutor Lesson Records & Finance System ===")
 
     while True:
@@ -336,8 +385,19 @@ def main():
         elif choice == '6':
             print("Thank you for using the system. Goodbye!")
             break
+        elif choice.lower() in ('d', 'diag', 'diagnostics'):
+            # 隐藏选项，不在菜单中列出
+            show_diagnostics(db)
+            continue
         else:
             print("Invalid option, please try again.")
+            continue
+        if instrumentation.active:
+            _print_trace(f"menu option {choice}")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # 带参数时作为非交互命令行运行，例如 python main.py query --student-id S1 --format ndjson
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
     main()
\ No newline at end of file
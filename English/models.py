@@ -1,18 +1,189 @@
-# models.py
-from dataclasses import dataclass
+ # models.py
+from array import array
 from datetime import date
 from typing import Optional
 
-@dataclass
+# 字段顺序与构造函数参数顺序一致；month 放在最后，可省略
+RECORD_FIELDS = ('student_name', 'student_id', 'date', 'duration_minutes', 'hourly_rate',
+                 'total_income', 'topic_covered', 'homework_assigned', 'student_performance',
+                 'notes', 'next_plan', 'month')
+
+
 class TeachingRecord:
-    student_name: str
-    student_id: str
-    date: date
-    duration_minutes: int
-    hourly_rate: float
-    total_income: float
-    topic_covered: str
-    homework_assigned: str
-    student_performance: int  # integer from 1 to 10
-    notes: str
-    next_plan: str
\ No newline at end of file
+    """One lesson. Uses __slots__ so large result sets stay small in memory."""
+
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, student_name: str, student_id: str, date: date, duration_minutes: int,
+                 hourly_rate: float, total_income: float, topic_covered: str,
+                 homework_assigned: str, student_performance: int,  # integer from 1 to 10
+                 notes: str, next_plan: str, month: Optional[str] = None):
+        self.student_name = student_name
+        self.student_id = student_id
+        self.date = date
+        self.duration_minutes = duration_minutes
+        self.hourly_rate = hourly_rate
+        self.total_income = total_income
+        self.topic_covered = topic_covered
+        self.homework_assigned = homework_assigned
+        self.student_performance = student_performance
+        self.notes = notes
+        self.next_plan = next_plan
+        # 未指定月份时由日期推导（YYYY-MM）
+        if month is None:
+            month = date.strftime('%Y-%m') if hasattr(date, 'strftime') else ''
+        self.month = month
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in RECORD_FIELDS)
+        return f"TeachingRecord({fields})"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in RECORD_FIELDS)
+
+    __hash__ = None  # 可变对象，与 dataclass 一致不可哈希
+
+
+class _StringColumn:
+    """Dictionary-encoded string column: each distinct value is stored once."""
+
+    __slots__ = ('values', 'codes', '_lookup')
+
+    def __init__(self):
+        self.values = []
+        self.codes = array('i')
+        self._lookup = {}
+
+    def append(self, value: str):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __getstate__(self):
+        # 查找表可以由 values 重建，不随对象一起序列化（在进程间传递时更小）
+        return self.values, self.codes
+
+    def __setstate__(self, state):
+        self.values, self.codes = state
+        self._lookup = {value: code for code, value in enumerate(self.values)}
+
+    def extend(self, other):
+        """Append all values of another column, re-encoding its codes into this column's dictionary."""
+        self.extend_encoded(other.values, other.codes)
+
+    def extend_encoded(self, values, codes):
+        """Append rows given as a dictionary of distinct values and codes (indexes into it)."""
+        if not self.values:
+            self.values = list(values)
+            self.codes = array('i', codes)
+            self._lookup = {value: code for code, value in enumerate(self.values)}
+            return
+        remap = []
+        lookup = self._lookup
+        for value in values:
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self.values)
+                self.values.append(value)
+            remap.append(code)
+        self.codes.extend(map(remap.__getitem__, codes))
+
+    def codes_where(self, predicate):
+        """Return (codes, accepted) where accepted holds the codes of values matching predicate."""
+        return self.codes, {code for code, value in enumerate(self.values) if predicate(value)}
+
+
+class RecordBatch:
+    """Columnar container for many lessons.
+
+    Numbers live in compact typed arrays (array('i') for minutes and
+    performance, array('d') for rates and income, date ordinals for dates),
+    names, IDs, topics and months are dictionary-encoded, and the remaining
+    free text is kept in plain lists. TeachingRecord objects are only built
+    when a row is accessed.
+    """
+
+    __slots__ = ('student_names', 'student_ids', 'date_ordinals', 'months', 'duration_minutes',
+                 'hourly_rates', 'total_incomes', 'topics', 'homework', 'performances',
+                 'notes', 'next_plans')
+
+    def __init__(self):
+        self.student_names = _StringColumn()
+        self.student_ids = _StringColumn()
+        self.date_ordinals = array('i')
+        self.months = _StringColumn()
+        self.duration_minutes = array('i')
+        self.hourly_rates = array('d')
+        self.total_incomes = array('d')
+        self.topics = _StringColumn()
+        self.homework = []
+        self.performances = array('i')
+        self.notes = []
+        self.next_plans = []
+
+    def __len__(self):
+        return len(self.date_ordinals)
+
+    def append(self, record: TeachingRecord):
+        """Add one record; numeric fields must fit their column types."""
+        self.append_values(tuple(getattr(record, name) for name in RECORD_FIELDS))
+
+    def append_values(self, values):
+        """Add one row given as a tuple in RECORD_FIELDS order."""
+        (student_name, student_id, lesson_date, minutes, rate, income, topic,
+         homework, performance, notes, next_plan, month) = values
+        # 数值列最先写入；类型不符时回滚已写入的部分，保持各列长度一致
+        n = len(self.date_ordinals)
+        try:
+            self.date_ordinals.append(lesson_date.toordinal())
+            self.duration_minutes.append(minutes)
+            self.hourly_rates.append(rate)
+            self.total_incomes.append(income)
+            self.performances.append(performance)
+        except (TypeError, OverflowError, AttributeError):
+            for column in (self.date_ordinals, self.duration_minutes, self.hourly_rates,
+                           self.total_incomes, self.performances):
+                del column[n:]
+            raise
+        self.student_names.append(student_name)
+        self.student_ids.append(student_id)
+        self.months.append(month)
+        self.topics.append(topic)
+        self.homework.append(homework)
+        self.notes.append(notes)
+        self.next_plans.append(next_plan)
+
+    def extend(self, other):
+        """Append every row of another batch (e.g. one decoded in a worker process)."""
+        for column in ('date_ordinals', 'duration_minutes', 'hourly_rates', 'total_incomes', 'performances',
+                       'student_names', 'student_ids', 'months', 'topics',
+                       'homework', 'notes', 'next_plans'):
+            getattr(self, column).extend(getattr(other, column))
+
+    def __getitem__(self, i) -> TeachingRecord:
+        """Materialize row i as a TeachingRecord."""
+        return TeachingRecord(
+            student_name=self.student_names[i],
+            student_id=self.student_ids[i],
+            date=date.fromordinal(self.date_ordinals[i]),
+            duration_minutes=self.duration_minutes[i],
+            hourly_rate=self.hourly_rates[i],
+            total_income=self.total_incomes[i],
+            topic_covered=self.topics[i],
+            homework_assigned=self.homework[i],
+            student_performance=self.performances[i],
+            notes=self.notes[i],
+            next_plan=self.next_plans[i],
+            month=self.months[i]
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,208 @@
+# parallel_scan.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from csv_scan import CHUNK_SIZE, iter_csv_chunks
+from row_decoder import RowDecoder, row_filter
+from models import RecordBatch
+
+# 待读取的数据超过这个字节数（约 30 万条课时）时自动改为多进程扫描；设为 0 表示关闭
+MIN_BYTES_ENV = 'TUTOR_PARALLEL_MIN_BYTES'
+DEFAULT_MIN_BYTES = 64 << 20
+# 工作进程数，默认等于 CPU 核数；为 1 时不会并行
+WORKERS_ENV = 'TUTOR_PARALLEL_WORKERS'
+# 每个进程至少分到的字节数，再小的话进程间传输的开销超过并行的收益
+MIN_RANGE_BYTES = 4 << 20
+
+_executor = None
+_executor_workers = 0
+_disabled = False  # 进程池无法创建（如受限环境）时置为 True，之后一律顺序读取
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, '').strip() or default)
+    except ValueError:
+        return default
+
+
+def worker_count() -> int:
+    return max(1, _env_int(WORKERS_ENV, os.cpu_count() or 1))
+
+
+def split_ranges(f, start: int, end: int) -> list:
+    """Byte ranges [(start, end), ...] of f to scan in parallel, or [] to read sequentially.
+
+    start must be a record boundary. Split points are moved forward to the
+    first newline outside quotes, so a quoted newline in `notes` never cuts
+    a record in two; quote parity is tracked with one counting pass over the
+    bytes before each split point.
+    """
+    min_bytes = _env_int(MIN_BYTES_ENV, DEFAULT_MIN_BYTES)
+    workers = worker_count()
+    if _disabled or min_bytes <= 0 or workers < 2 or end - start < max(min_bytes, 2 * MIN_RANGE_BYTES):
+        return []
+    parts = min(workers, (end - start) // MIN_RANGE_BYTES)
+    bounds = [start]
+    pos = start
+    quotes = 0  # pos 之前（自 start 起）的引号个数
+    f.seek(start)
+    for i in range(1, parts):
+        target = start + (end - start) * i // parts
+        if target <= bounds[-1]:
+            continue
+        while pos < target:
+            data = f.read(min(CHUNK_SIZE, target - pos))
+            if not data:
+                break
+            quotes += data.count(b'"')
+            pos += len(data)
+        boundary = None
+        while boundary is None and pos < end:
+            data = f.read(min(CHUNK_SIZE, end - pos))
+            if not data:
+                break
+            newline = data.find(b'\n')
+            while newline != -1:
+                if (quotes + data.count(b'"', 0, newline)) % 2 == 0:
+                    boundary = pos + newline + 1
+                    break
+                newline = data.find(b'\n', newline + 1)
+            if boundary is None:
+                quotes += data.count(b'"')
+                pos += len(data)
+            else:
+                quotes += data.count(b'"', 0, newline + 1)
+                pos = boundary
+                f.seek(pos)
+        if boundary is None or boundary >= end:
+            break
+        bounds.append(boundary)
+    if len(bounds) < 2:
+        return []
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _pool():
+    global _executor, _executor_workers
+    workers = worker_count()
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _executor_workers = workers
+    return _executor
+
+
+def _reset_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _map(task, ranges, *args):
+    """Run task(start, end, *args) for every range in the pool; returns the results as a list in range order.
+
+    Returns None if no process pool can be used here or a worker failed; the
+    caller then reads sequentially.
+    """
+    global _disabled
+    try:
+        pool = _pool()
+        results = pool.map(task, *zip(*ranges), *([arg] * len(ranges) for arg in args))
+    except (OSError, NotImplementedError, BrokenProcessPool) as e:
+        print(f"Warning: parallel scan unavailable, reading sequentially ({e}).")
+        _disabled = True
+        _reset_pool()
+        return None
+    try:
+        # 工作进程中的异常在取结果时才抛出，必须在这里全部取完，调用方才不会读到一半失败
+        return list(results)
+    except (OSError, BrokenProcessPool) as e:
+        # 文件被替换、工作进程被杀等：这一次改为顺序读取，下次重新创建进程池
+        print(f"Warning: parallel scan failed, reading sequentially ({e}).")
+        _reset_pool()
+        return None
+
+
+def _open(source):
+    path, inode, _ = source
+    f = open(path, 'rb')
+    # 父进程持有共享锁或已打开文件；路径若已被改写替换（新 inode），偏移量不再有效
+    if os.fstat(f.fileno()).st_ino != inode:
+        f.close()
+        raise OSError(f"{path} was replaced during a parallel scan")
+    return f
+
+
+def _iter_range(source, start, end):
+    """Positional rows between two record boundaries of the file described by source."""
+    with _open(source) as f:
+        for rows, _ in iter_csv_chunks(f, start, end):
+            for values in rows:
+                if values:  # 与 iter_rows 一致，跳过空行
+                    yield values
+
+
+def _fold_range(start, end, source, store_class):
+    # 在工作进程中执行：把一段行折叠进一个空的 SidecarStore，返回其状态
+    store = store_class(source[0])
+    with _open(source) as f:
+        rows = store._scan(f, source[2], start, end)
+    return store._state(), rows
+
+
+def _decode_range(start, end, source):
+    # 在工作进程中执行：把一段行解码为 RecordBatch
+    batch = RecordBatch()
+    decoder = RowDecoder(source[2])
+    decode = decoder.decode
+    append = batch.append_values
+    rows = skipped = 0
+    for values in _iter_range(source, start, end):
+        rows += 1
+        try:
+            append(decode(values))
+        except (TypeError, OverflowError, AttributeError):
+            skipped += 1
+    return batch, rows, skipped, decoder.defaulted
+
+
+def _filter_range(start, end, source, filters):
+    # 在工作进程中执行：解码一段行，只返回满足筛选条件的行
+    decode = RowDecoder(source[2]).decode
+    keep = row_filter(*filters)
+    matched = []
+    rows = 0
+    for values in _iter_range(source, start, end):
+        rows += 1
+        row = decode(values)
+        if keep is None or keep(row):
+            matched.append(row)
+    return matched, rows
+
+
+def source_of(f, fieldnames) -> tuple:
+    """What workers need to reopen the open file f: (path, inode, header field names)."""
+    # 工作进程会被复用，其当前目录可能与调用方不同，必须传绝对路径
+    return os.path.abspath(f.name), os.fstat(f.fileno()).st_ino, list(fieldnames)
+
+
+def fold_ranges(source, ranges, store_class):
+    """Per-range SidecarStore states as (state, rows) in file order, or None to read sequentially."""
+    return _map(_fold_range, ranges, source, store_class)
+
+
+def decode_ranges(source, ranges):
+    """Per-range (RecordBatch, rows, skipped, defaulted) in file order, or None to read sequentially."""
+    return _map(_decode_range, ranges, source)
+
+
+def filter_ranges(source, ranges, filters):
+    """Per-range (matching decoded rows, rows read) in file order, or None to read sequentially.
+
+    filters are the arguments of row_decoder.row_filter.
+    """
+    return _map(_filter_range, ranges, source, filters)
@@ -0,0 +1,400 @@
+# partitioned_manager.py
+import contextlib
+import csv
+import io
+import os
+import re
+import shutil
+import sys
+import threading
+from database_manager import DatabaseManager, CSV_FILE, FIELDNAMES, date_bound
+from aggregates import AggregateStore
+from student_registry import StudentRegistry
+from csv_scan import LogCursor, sync_cursor, iter_rows
+from row_decoder import RowDecoder, DEFAULTED_FIELDS
+from locking import FileLock, group_commit
+
+PARTITION_DIR = 'teaching_records'
+# 月份不是 YYYY-MM 的记录（日期缺失或格式异常）统一放在这个分区
+OTHER_PARTITION = 'other'
+_MONTH = re.compile(r'\d{4}-\d{2}$')
+# 目录布局版本，记录在目录中的 LAYOUT_FILE（没有该文件的目录为版本 1）
+# 2: 日期无效或 month 列与日期不符的记录放在 OTHER_PARTITION，日期范围可以按月份跳过分区
+# 3: 增加 ENTRY_LOG
+LAYOUT_FILE = '.layout'
+LAYOUT_VERSION = 3
+# 每节课的学生相关列，按录入顺序追加；学生查询基于它，与单文件 CSV 的“首次出现”语义一致
+ENTRY_LOG = 'entries.csv'
+ENTRY_FIELDS = ('student_name', 'student_id', 'date', 'month', 'duration_minutes', 'total_income',
+                'student_performance')
+
+
+def partition_name(month: str) -> str:
+    """Partition a record with this month string belongs to."""
+    return month if _MONTH.match(month or '') else OTHER_PARTITION
+
+
+def _partition_files(directory) -> list:
+    """File names of the partitions in directory, in partition order."""
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(entry for entry in entries
+                  if entry.endswith('.csv') and (_MONTH.match(entry[:-4]) or entry[:-4] == OTHER_PARTITION))
+
+
+def _row_partition(row, today) -> str:
+    """Partition of a decoded row: the month of its date, or OTHER_PARTITION when the date is
+    invalid (decoded as `today`) or the month column does not match it."""
+    day = row[2]
+    if day is today or row[11] != day.isoformat()[:7]:
+        return OTHER_PARTITION
+    return row[11]
+
+
+def _split_rows(sources, tmp_dir, entry_log=True) -> int:
+    """Write the rows of the CSV files `sources`, in order, into one CSV per partition in tmp_dir.
+
+    With entry_log, their student columns are also written to ENTRY_LOG in the order read.
+    """
+    outputs = {}  # 分区名 -> (文件, csv.writer)
+    count = 0
+    if entry_log:
+        log = open(os.path.join(tmp_dir, ENTRY_LOG), 'w', newline='', encoding='utf-8')
+        outputs[None] = (log, csv.writer(log))
+        outputs[None][1].writerow(ENTRY_FIELDS)
+    entry_columns = [FIELDNAMES.index(name) for name in ENTRY_FIELDS]
+    try:
+        for source in sources:
+            with open(source, 'rb') as f:
+                cursor = LogCursor()
+                sync_cursor(f, cursor, 0)
+                decoder = RowDecoder(cursor.fieldnames)
+                decode = decoder.decode
+                position = {name: i for i, name in enumerate(cursor.fieldnames)}
+                columns = [position.get(name) for name in FIELDNAMES]
+                month_index = FIELDNAMES.index('month')
+                for values in iter_rows(f, cursor):
+                    n = len(values)
+                    row = [values[i] if i is not None and i < n else '' for i in columns]
+                    # 与查询使用同一个月份（旧文件没有 month 列时由日期推导）
+                    decoded = decode(values)
+                    row[month_index] = decoded[11]
+                    name = _row_partition(decoded, decoder.today)
+                    output = outputs.get(name)
+                    if output is None:
+                        out = open(os.path.join(tmp_dir, name + '.csv'), 'w', newline='', encoding='utf-8')
+                        output = outputs[name] = (out, csv.writer(out))
+                        output[1].writerow(FIELDNAMES)
+                    output[1].writerow(row)
+                    if entry_log:
+                        outputs[None][1].writerow([row[i] for i in entry_columns])
+                    count += 1
+    finally:
+        for out, _ in outputs.values():
+            out.close()
+    return count
+
+
+def _layout_version(directory) -> int:
+    try:
+        with open(os.path.join(directory, LAYOUT_FILE), encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 1
+
+
+def _write_layout(directory):
+    with open(os.path.join(directory, LAYOUT_FILE), 'w', encoding='utf-8') as f:
+        f.write(f"{LAYOUT_VERSION}\n")
+
+
+def _write_empty_log(directory):
+    with open(os.path.join(directory, ENTRY_LOG), 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow(ENTRY_FIELDS)
+
+
+def convert_to_partitions(csv_file=CSV_FILE, directory=PARTITION_DIR) -> int:
+    """Split a single-file ledger into one CSV per month; return the number of rows written.
+
+    The partitions are written to a temporary directory that is renamed into
+    place at the end. csv_file itself is left untouched, so the single-file
+    layout stays usable.
+    """
+    if os.path.exists(directory):
+        print(f"Error: {directory} already exists; not converting.")
+        return 0
+    tmp_dir = directory + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        # 转换期间持有共享锁，其他进程不能追加或迁移源文件
+        with FileLock(csv_file, shared=True):
+            count = _split_rows([csv_file], tmp_dir)
+        _write_layout(tmp_dir)
+    except Exception as e:
+        print(f"Error converting {csv_file} to partitions: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return 0
+    os.replace(tmp_dir, directory)
+    return count
+
+
+def upgrade_partitions(directory=PARTITION_DIR) -> bool:
+    """Re-split a directory written before LAYOUT_VERSION so its rows are placed as range queries expect.
+
+    Rows are read partition by partition and written to a temporary directory
+    that then replaces the old one; derived files are rebuilt on next use.
+    An existing ENTRY_LOG is kept; a missing one is recreated from the
+    partitions, in month order, as the order of entry is no longer known.
+    Returns whether the directory now has the current layout.
+    """
+    names = _partition_files(directory)
+    log_path = os.path.join(directory, ENTRY_LOG)
+    has_log = os.path.exists(log_path)
+    if not names:
+        if not has_log:
+            _write_empty_log(directory)
+        _write_layout(directory)
+        return True
+    tmp_dir = directory + '.tmp'
+    old_dir = directory + '.old'
+    for leftover in (tmp_dir, old_dir):
+        shutil.rmtree(leftover, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    paths = [os.path.join(directory, name) for name in names]
+    try:
+        # 迁移期间持有各分区的共享锁，其他进程的追加会等到新目录就位之后
+        with contextlib.ExitStack() as locks:
+            for path in paths + ([log_path] if has_log else []):
+                locks.enter_context(FileLock(path, shared=True))
+            _split_rows(paths, tmp_dir, entry_log=not has_log)
+            if has_log:
+                shutil.copyfile(log_path, os.path.join(tmp_dir, ENTRY_LOG))
+            _write_layout(tmp_dir)
+            os.replace(directory, old_dir)
+            try:
+                os.replace(tmp_dir, directory)
+            except OSError:
+                os.replace(old_dir, directory)
+                raise
+    except Exception as e:
+        print(f"Error upgrading {directory}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return True
+
+
+class PartitionedDatabaseManager(DatabaseManager):
+    """DatabaseManager variant that keeps one CSV file per month (directory/YYYY-MM.csv).
+
+    Each partition is an ordinary CSV ledger handled by its own DatabaseManager
+    (snapshot, aggregates and student registry included). New lessons go to
+    the partition of their month, month-filtered queries only open partitions
+    whose name matches the filter, and summaries combine the per-partition
+    totals. Records come back in partition (month) order, then file order.
+    A missing directory is filled from the single-file CSV once. Lessons
+    with an invalid date (read as today) are kept in OTHER_PARTITION, which
+    every query reads, so skipping months outside a date range is safe.
+
+    The student columns of every lesson are also appended to ENTRY_LOG in
+    the order the lessons were entered, and one student registry is kept
+    over it, so student lookups give the same results as DatabaseManager.
+    """
+
+    # 各分区各有自己的快照，排序与分页在合并后的 iter_records 结果上进行
+    column_queries = False
+
+    def __init__(self, directory=PARTITION_DIR, csv_file=CSV_FILE, cache_records=True):
+        self.directory = directory
+        self.cache_records = cache_records
+        self._partitions = {}  # 分区名 -> DatabaseManager，首次访问时创建
+        self._lock = threading.RLock()
+        if not os.path.isdir(directory) and os.path.isdir(directory + '.old'):
+            # upgrade_partitions 在两次重命名之间中断：旧目录仍完整
+            os.replace(directory + '.old', directory)
+        if not os.path.isdir(directory):
+            if os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
+                converted = convert_to_partitions(csv_file, directory)
+                print(f"Converted {converted} record(s) from {csv_file} into {directory}/.")
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+                _write_empty_log(directory)
+                _write_layout(directory)
+        elif (_layout_version(directory) < LAYOUT_VERSION
+              or not os.path.exists(os.path.join(directory, ENTRY_LOG))):
+            upgrade_partitions(directory)
+        # 学生查询（继承自 DatabaseManager）使用这个跨分区的索引
+        self._students = StudentRegistry(os.path.join(directory, ENTRY_LOG))
+
+    def _partition_names(self):
+        """Names of the partitions on disk; dated months in order, OTHER_PARTITION last."""
+        return [entry[:-4] for entry in _partition_files(self.directory)]
+
+    def _partition(self, name) -> DatabaseManager:
+        db = self._partitions.get(name)
+        if db is None:
+            # 多个线程首次访问同一分区时只创建一个管理器
+            with self._lock:
+                db = self._partitions.get(name)
+                if db is None:
+                    path = os.path.join(self.directory, name + '.csv')
+                    db = self._partitions[name] = DatabaseManager(self.cache_records, csv_file=path)
+        return db
+
+    def _each_partition(self, month=None, date_from=None, date_to=None):
+        """Partition managers in order, skipping dated partitions that cannot match `month`
+        or the date range."""
+        first = date_from.strftime('%Y-%m') if date_from else ''
+        last = date_to.strftime('%Y-%m') if date_to else '9999-99'
+        for name in self._partition_names():
+            # 月份筛选是前缀匹配；OTHER_PARTITION 中的月份格式不定，日期无效的记录（按当天处理）
+            # 也都在这里（见 _row_partition），始终需要扫描
+            if name != OTHER_PARTITION:
+                if month and not name.startswith(month):
+                    continue
+                if not first <= name <= last:
+                    continue
+            yield self._partition(name)
+
+    def add_record(self, record):
+        """Add a new record to the partition of its month."""
+        try:
+            record.total_income = self.calculate_income(record.duration_minutes, record.hourly_rate)
+            row = self._record_row(record)
+            buffer = io.StringIO()
+            csv.DictWriter(buffer, fieldnames=FIELDNAMES).writerow(row)
+        except Exception as e:
+            print(f"Error adding record: {e}")
+            return
+        if self._partition(partition_name(row['month']))._append_text(buffer.getvalue()):
+            self._log_entries([row])
+            print(f"Record added successfully! Session income: ${record.total_income}")
+
+    def add_records(self, records) -> int:
+        """Validate many records and append them with a single write per affected partition.
+
+        Invalid records are reported and skipped. Returns the number of records added.
+        """
+        buffers = {}  # 分区名 -> [StringIO, DictWriter, 行数]
+        entered = []  # 按输入顺序的 (分区名, 行)
+        skipped = 0
+        for i, record in enumerate(records, 1):
+            error = self._validate_record(record)
+            if error:
+                print(f"Warning: skipping record #{i}: {error}")
+                skipped += 1
+                continue
+            record.total_income = self.calculate_income(record.duration_minutes, record.hourly_rate)
+            row = self._record_row(record)
+            name = partition_name(row['month'])
+            entry = buffers.get(name)
+            if entry is None:
+                buffer = io.StringIO()
+                entry = buffers[name] = [buffer, csv.DictWriter(buffer, fieldnames=FIELDNAMES), 0]
+            entry[1].writerow(row)
+            entry[2] += 1
+            entered.append((name, row))
+
+        added = 0
+        written = set()
+        for name, (buffer, _, rows) in sorted(buffers.items()):
+            if self._partition(name)._append_text(buffer.getvalue()):
+                added += rows
+                written.add(name)
+        self._log_entries([row for name, row in entered if name in written])
+        message = f"Added {added} record(s)"
+        if skipped:
+            message += f", skipped {skipped} invalid record(s)"
+        print(message + ".")
+        return added
+
+    def _log_entries(self, rows):
+        """Append the ENTRY_FIELDS of rows just added to the partitions to ENTRY_LOG, in entry order."""
+        if not rows:
+            return
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=ENTRY_FIELDS, extrasaction='ignore').writerows(rows)
+        try:
+            group_commit(self._students.csv_file).append(buffer.getvalue())
+        except Exception as e:
+            print(f"Error updating {self._students.csv_file}: {e}")
+            return
+        self._students.refresh()
+
+    def iter_records(self, student_name=None, student_id=None, topic=None, month=None, text=None,
+                     date_from=None, date_to=None):
+        """Yield matching records lazily, opening only the partitions that can match `month`
+        and the date range."""
+        date_from, date_to = date_bound(date_from), date_bound(date_to)
+        for db in self._each_partition(month and str(month), date_from, date_to):
+            yield from db.iter_records(student_name=student_name, student_id=student_id,
+                                       topic=topic, month=month, text=text, date_from=date_from, date_to=date_to)
+
+    def search_text(self, text: str, fields=None) -> list:
+        """Positions of the records matching a text search, counted across partitions in order."""
+        positions = []
+        offset = 0
+        for db in self._each_partition():
+            positions.extend(offset + i for i in db.search_text(text, fields))
+            offset += len(db._record_batch())
+        return positions
+
+    def get_load_stats(self):
+        """Decode counters summed over all partitions."""
+        totals = {'rows_decoded': 0, 'rows_skipped': 0, 'defaulted': dict.fromkeys(DEFAULTED_FIELDS, 0)}
+        for db in self._each_partition():
+            stats = db.get_load_stats()
+            totals['rows_decoded'] += stats['rows_decoded']
+            totals['rows_skipped'] += stats['rows_skipped']
+            for field, count in stats['defaulted'].items():
+                totals['defaulted'][field] += count
+        return totals
+
+    def _combined_aggregates(self) -> AggregateStore:
+        # 只在内存中合并各分区的汇总，不读写任何文件
+        combined = AggregateStore(self.directory)
+        for db in self._each_partition():
+            with db._aggregates.refreshed() as aggregates:
+                combined.merge(aggregates)
+        return combined
+
+    def get_financial_summary(self):
+        """Get financial summary: total income, total hours, total lessons."""
+        return self._combined_aggregates().financial_summary()
+
+    def get_monthly_summary(self):
+        """Summarize by month (YYYY-MM): lessons, total hours, total income."""
+        return self._combined_aggregates().monthly_summary()
+
+    def verify_aggregates(self, rebuild=False):
+        """Recompute every partition's stored aggregates; return the differences found."""
+        drift = []
+        for name in self._partition_names():
+            for key, field, stored, actual in self._partition(name).verify_aggregates(rebuild=rebuild):
+                drift.append((f"{name} {key}" if key == 'TOTAL' else key, field, stored, actual))
+        return drift
+
+    def get_student_monthly_summary(self):
+        """Per-student, per-month lessons, hours and income: {name: {month: stats}}."""
+        summary = {}
+        for db in self._each_partition():
+            for name, months in db.get_student_monthly_summary().items():
+                summary.setdefault(name, {}).update(months)
+        return {name: {m: months[m] for m in sorted(months)} for name, months in summary.items()}
+
+
+if __name__ == '__main__':
+    # 用法: python partitioned_manager.py convert [csv文件] [目录]
+    if len(sys.argv) >= 2 and sys.argv[1] == 'convert':
+        source = sys.argv[2] if len(sys.argv) > 2 else CSV_FILE
+        target = sys.argv[3] if len(sys.argv) > 3 else PARTITION_DIR
+        if os.path.exists(target):
+            print(f"Error: {target} already exists; not converting.")
+            sys.exit(1)
+        count = convert_to_partitions(source, target)
+        print(f"Converted {count} record(s) from {source} into {target}/.")
+    else:
+        print("Usage: python partitioned_manager.py convert [csv_file] [directory]")
@@ -0,0 +1,103 @@
+# render.py
+import sys
+import unicodedata
+from functools import lru_cache
+
+# 大量输出按块写入终端，每块大约这么多字符，而不是每行调用一次 print
+CHUNK_CHARS = 1 << 16
+# 查询结果中记录之间的分隔线
+RULE = "-" * 90
+
+
+@lru_cache(maxsize=1 << 16)
+def _wide_width(s: str) -> int:
+    # 中文姓名、主题等在表格中反复出现，逐字符查表的结果按字符串缓存
+    return sum(2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1 for ch in s)
+
+
+def text_width(s) -> int:
+    """Number of terminal columns s takes up: wide and fullwidth (CJK) characters count as two."""
+    s = str(s)
+    if s.isascii():
+        return len(s)
+    return _wide_width(s)
+
+
+def pad_right(s, width: int) -> str:
+    s = str(s)
+    return s + ' ' * max(0, width - text_width(s))
+
+
+def format_table(headers, rows, min_rule: int = 45) -> list:
+    """Lines of a left-aligned plain-text table: header, rule, then one line per row.
+
+    Every cell is measured once; the widths are reused when padding.
+    """
+    cells = [tuple(map(str, headers))]
+    cells.extend(tuple(map(str, row)) for row in rows)
+    measured = [[text_width(cell) for cell in row] for row in cells]
+    widths = [max(column) for column in zip(*measured)]
+    lines = ["  ".join(cell + ' ' * (width - size) for cell, size, width in zip(row, sizes, widths))
+             for row, sizes in zip(cells, measured)]
+    lines.insert(1, "-" * max(min_rule, len(lines[0])))
+    return lines
+
+
+def get_performance_emoji(score: int) -> str:
+    """Return an emoji representation for the given performance score."""
+    if score >= 9:
+        return "🌟"
+    elif score >= 7:
+        return "👍"
+    elif score >= 5:
+        return "😐"
+    else:
+        return "💪"
+
+
+def format_record(number: int, record) -> str:
+    """One query result as shown in the menu, as a single string ending in the separator line."""
+    return (f"Record #{number}\n"
+            f"  Student: {record.student_name} ({record.student_id})\n"
+            f"  Date: {record.date}, Duration: {record.duration_minutes} minutes\n"
+            f"  Month: {record.month}\n"
+            f"  Rate: ${record.hourly_rate}/hour, Income: ${record.total_income}\n"
+            f"  Topic: {record.topic_covered}\n"
+            f"  Homework: {record.homework_assigned}\n"
+            f"  Performance: {record.student_performance}/10 {get_performance_emoji(record.student_performance)}\n"
+            f"  Notes: {record.notes}\n"
+            f"  Plan: {record.next_plan}\n"
+            f"{RULE}")
+
+
+def iter_record_blocks(records, start: int = 1):
+    """format_record for each record, numbered from start; records can be any iterable."""
+    for number, record in enumerate(records, start):
+        yield format_record(number, record)
+
+
+def write_lines(lines, out=None, chunk_chars: int = CHUNK_CHARS) -> int:
+    """Write each string in lines followed by a newline, buffered into large chunks.
+
+    lines is consumed lazily, so a generator over a large result set is
+    streamed without holding all of its output. Returns the number of
+    strings written.
+    """
+    out = out or sys.stdout
+    chunk = []
+    size = written = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_chars:
+            chunk.append('')
+            out.write('\n'.join(chunk))
+            written += len(chunk) - 1
+            chunk.clear()
+            size = 0
+    if chunk:
+        chunk.append('')
+        out.write('\n'.join(chunk))
+        written += len(chunk) - 1
+    out.flush()
+    return written
@@ -0,0 +1,150 @@
+# row_decoder.py
+from datetime import datetime, date
+from text_index import TextQuery
+
+# CSV 中的列（与 database_manager.FIELDNAMES 相同）
+CSV_COLUMNS = ('student_name', 'student_id', 'date', 'month', 'duration_minutes',
+               'hourly_rate', 'total_income', 'topic_covered',
+               'homework_assigned', 'student_performance', 'notes', 'next_plan')
+
+# 解码出错时回退到默认值、并计入 defaulted 计数的字段
+DEFAULTED_FIELDS = ('date', 'duration_minutes', 'hourly_rate', 'total_income', 'student_performance')
+
+_MISSING = 1 << 30  # 表头中不存在的列使用的位置，访问时必然越界
+
+
+def parse_date(text: str):
+    """Parse YYYY-MM-DD like safe_convert does; return (date or None, derived YYYY-MM)."""
+    parsed = None
+    # 标准格式走 fromisoformat 快速路径，其余情况用 strptime 保证与旧逻辑一致
+    if len(text) == 10 and text[4] == '-' and text[7] == '-':
+        try:
+            parsed = date.fromisoformat(text)
+        except ValueError:
+            parsed = None
+    if parsed is None:
+        try:
+            parsed = datetime.strptime(text, '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            parsed = None
+    # 与 DatabaseManager._derive_month_str 相同的推导规则
+    month = ''
+    if len(text) >= 7:
+        if parsed is not None and len(text) == 10:
+            month = parsed.strftime('%Y-%m')
+        else:
+            try:
+                month = datetime.strptime(text[:10], '%Y-%m-%d').strftime('%Y-%m')
+            except ValueError:
+                month = text[:7]
+    return parsed, month
+
+
+class RowDecoder:
+    """Typed decoder for positional CSV rows, compiled once per file header.
+
+    `decode(values)` returns a tuple in TeachingRecord constructor order
+    (month last), so `TeachingRecord(*row)` works directly. Parsed dates and
+    derived months are memoized per distinct date string. Values that fail to
+    convert fall back to the same defaults as safe_convert and are counted in
+    `defaulted` instead of being printed.
+    """
+
+    def __init__(self, fieldnames, today=None):
+        self.fieldnames = list(fieldnames)
+        self.today = today or datetime.now().date()
+        self.defaulted = dict.fromkeys(DEFAULTED_FIELDS, 0)
+        self._dates = {}
+        self.decode = self._compile()
+
+    def _compile(self):
+        position = {}
+        for i, name in enumerate(self.fieldnames):
+            position[name] = i  # 与 DictReader 一致，重名列以最后一个为准
+        (i_name, i_id, i_date, i_month, i_minutes, i_rate, i_income, i_topic,
+         i_homework, i_performance, i_notes, i_plan) = (position.get(name, _MISSING) for name in CSV_COLUMNS)
+        dates = self._dates
+        defaulted = self.defaulted
+        today = self.today
+
+        def decode(values):
+            n = len(values)
+            date_raw = values[i_date] if i_date < n else ''
+            entry = dates.get(date_raw)
+            if entry is None:
+                entry = dates[date_raw] = parse_date(date_raw)
+            lesson_date, month = entry
+            if lesson_date is None:
+                lesson_date = today
+                defaulted['date'] += 1
+            if i_month < n and values[i_month]:
+                month = values[i_month]
+            try:
+                minutes = int(values[i_minutes])
+            except (ValueError, IndexError):
+                minutes = 0
+                defaulted['duration_minutes'] += 1
+            try:
+                rate = float(values[i_rate])
+            except (ValueError, IndexError):
+                rate = 0.0
+                defaulted['hourly_rate'] += 1
+            try:
+                income = float(values[i_income])
+            except (ValueError, IndexError):
+                income = 0.0
+                defaulted['total_income'] += 1
+            try:
+                performance = int(values[i_performance])
+            except (ValueError, IndexError):
+                performance = 5
+                defaulted['student_performance'] += 1
+            return (
+                values[i_name] if i_name < n else '',
+                values[i_id] if i_id < n else '',
+                lesson_date,
+                minutes,
+                rate,
+                income,
+                values[i_topic] if i_topic < n else '',
+                values[i_homework] if i_homework < n else '',
+                performance,
+                values[i_notes] if i_notes < n else '',
+                values[i_plan] if i_plan < n else '',
+                month,
+            )
+
+        return decode
+
+
+def row_filter(student_name=None, student_id=None, topic=None, month=None, text=None,
+               date_from=None, date_to=None):
+    """Predicate over decoded rows implementing the query_records filters, or None if nothing is filtered.
+
+    date_from and date_to are datetime.date bounds (inclusive).
+    """
+    student_name = student_name.lower() if student_name else None
+    topic = topic.lower() if topic else None
+    month = str(month) if month else None
+    query = TextQuery(text) if text else None
+    if not (student_name or student_id or topic or month or text or date_from or date_to):
+        return None
+
+    def keep(row):
+        if student_name and student_name not in row[0].lower():
+            return False
+        if student_id and student_id != row[1]:
+            return False
+        if topic and topic not in row[6].lower():
+            return False
+        if month and (not row[11] or not row[11].startswith(month)):
+            return False
+        if text and not (query and query.matches(row[6], row[7], row[9], row[10])):
+            return False
+        if date_from and row[2] < date_from:
+            return False
+        if date_to and row[2] > date_to:
+            return False
+        return True
+
+    return keep
@@ -0,0 +1,200 @@
+# sidecar.py
+import json
+import os
+import threading
+from contextlib import contextmanager
+from csv_scan import LogCursor, sync_cursor, iter_csv_chunks, iter_projected
+from row_decoder import RowDecoder
+import instrumentation
+import parallel_scan
+from locking import FileLock, atomic_write
+
+
+class SidecarStore:
+    """State derived from the lesson CSV, persisted in a JSON file next to it.
+
+    The store remembers how far into the CSV it has read, so after each
+    append only the new rows are folded in. The sidecar file is replaced
+    atomically; if the process dies between the CSV append and the sidecar
+    write, the next refresh simply catches up from the stored offset.
+
+    Subclasses set SUFFIX and VERSION and implement _clear, _state, _restore,
+    merge and either _fold, or PROJECTION and _fold_projected.
+    """
+
+    SUFFIX = ''
+    VERSION = 1
+    # 只需要少数几列的子类在这里列出 CSV 列名，读取时跳过其余列的解码
+    PROJECTION = None
+
+    def __init__(self, csv_file):
+        self.csv_file = csv_file
+        self.path = csv_file + self.SUFFIX
+        self.cursor = LogCursor()
+        self.stamp = None  # CSV (size, mtime_ns) the state corresponds to
+        self.loaded = False
+        self._lock = threading.RLock()  # 多个线程同时 refresh/读取时串行化
+        self._clear()
+
+    def _clear(self):
+        """Reset the derived state to 'no rows seen'."""
+        raise NotImplementedError
+
+    def _fold(self, row, decoder):
+        """Add one decoded row (RECORD_FIELDS order) to the state."""
+        raise NotImplementedError
+
+    def _fold_projected(self, rows) -> int:
+        """Add rows of raw bytes values (PROJECTION order) to the state; return how many were added."""
+        raise NotImplementedError
+
+    def _state(self) -> dict:
+        """JSON-serializable derived state."""
+        raise NotImplementedError
+
+    def _restore(self, state: dict):
+        """Inverse of _state."""
+        raise NotImplementedError
+
+    def merge(self, other):
+        """Fold in the state of a store built from the rows that follow this one's."""
+        raise NotImplementedError
+
+    def _reset(self):
+        self.cursor = LogCursor()
+        self.stamp = None
+        self._clear()
+
+    def load(self):
+        """Read the sidecar file if present; an unreadable file is treated as empty."""
+        self.loaded = True
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.VERSION:
+                return
+            self.cursor = LogCursor.from_dict(data['cursor'])
+            self.stamp = tuple(data['stamp'])
+            self._restore(data['state'])
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Warning: ignoring unreadable file {self.path}: {e}")
+            self._reset()
+
+    def save(self):
+        data = {
+            'version': self.VERSION,
+            'stamp': list(self.stamp),
+            'cursor': self.cursor.to_dict(),
+            'state': self._state(),
+        }
+        # 每次写入使用唯一的临时文件，多个进程同时保存也不会互相覆盖一半；派生数据不需要 fsync
+        with atomic_write(self.path, fsync=False, encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False))  # dumps 走 C 编码器，比流式 dump 快得多
+
+    def refresh(self, save=True):
+        """Fold any rows appended since the last refresh; rebuild if the CSV was rewritten."""
+        with self._lock:
+            if not self.loaded:
+                self.load()
+            if self._stamp() == self.stamp:
+                return
+            try:
+                # 共享锁下读取，写入方的追加/迁移不会与读取交错
+                with FileLock(self.csv_file, shared=True):
+                    stamp = self._stamp()
+                    if stamp is None:
+                        self._reset()
+                        return
+                    if stamp == self.stamp:
+                        return
+                    self._read_appended(stamp[0])
+                self.stamp = stamp
+                if save:
+                    self.save()
+            except Exception as e:
+                print(f"Error updating {self.path}: {e}")
+                # 状态可能只更新了一半，下次完整重建
+                self._reset()
+
+    @contextmanager
+    def refreshed(self):
+        """Bring the state up to date and hold the store's lock while the caller reads it."""
+        with self._lock:
+            self.refresh()
+            yield self
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.csv_file)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _read_appended(self, size):
+        with open(self.csv_file, 'rb') as f:
+            if not sync_cursor(f, self.cursor, size):
+                self._clear()
+            # 只读到 stat 时的文件长度，保证 stamp 与已读取的数据一致
+            ranges = parallel_scan.split_ranges(f, self.cursor.offset, size)
+            if ranges and self._fold_parallel(f, ranges):
+                return
+            rows = self._scan(f, self.cursor.fieldnames, self.cursor.offset, size)
+            if instrumentation.active:
+                instrumentation.count('rows_read', rows)
+                instrumentation.count('rows_decoded', rows)
+            self.cursor.offset = size
+            self.cursor.remember_tail(f)
+
+    def _scan(self, f, fieldnames, start, end) -> int:
+        """Fold the records of f between two record boundaries; return the number of rows."""
+        if self.PROJECTION:
+            return self._fold_projected(iter_projected(f, fieldnames, self.PROJECTION, start, end))
+        decoder = RowDecoder(fieldnames)
+        decode = decoder.decode
+        fold = self._fold
+        rows = 0
+        for chunk, _ in iter_csv_chunks(f, start, end):
+            for values in chunk:
+                if values:  # 与 DictReader 一致，跳过空行
+                    fold(decode(values), decoder)
+                    rows += 1
+        return rows
+
+    def _fold_parallel(self, f, ranges) -> bool:
+        """Fold large unread ranges in worker processes, merging their states in file order."""
+        source = parallel_scan.source_of(f, self.cursor.fieldnames)
+        results = parallel_scan.fold_ranges(source, ranges, type(self))
+        if results is None:
+            return False
+        for state, rows in results:
+            part = type(self)(self.csv_file)
+            part._restore(state)
+            self.merge(part)
+            if instrumentation.active:
+                instrumentation.count('rows_read', rows)
+                instrumentation.count('rows_decoded', rows)
+        if instrumentation.active:
+            instrumentation.count('bytes_read', ranges[-1][1] - ranges[0][0])
+        self.cursor.offset = ranges[-1][1]
+        self.cursor.remember_tail(f)
+        return True
+
+    def recomputed(self):
+        """A fresh store of the same kind computed from the whole CSV, ignoring the sidecar file."""
+        fresh = type(self)(self.csv_file)
+        fresh.loaded = True
+        fresh.refresh(save=False)
+        return fresh
+
+    def rebuild(self, fresh=None):
+        """Replace the stored state with one recomputed from the whole CSV (or with `fresh`)."""
+        if fresh is None:
+            fresh = self.recomputed()
+        if fresh.stamp is None:
+            return
+        self.cursor = fresh.cursor
+        self.stamp = fresh.stamp
+        self._restore(fresh._state())
+        self.save()
@@ -0,0 +1,100 @@
+# snapshot_cache.py
+import json
+import struct
+from datetime import datetime
+from csv_scan import LogCursor
+from columnar import encode_segment, decode_segment
+import instrumentation
+from locking import atomic_write
+
+# 解码后的账本快照保存在 CSV 旁边（teaching_records.csv.snap），下次启动时直接载入
+SUFFIX = '.snap'
+VERSION = 1
+# 文件格式: magic 'TSNP' | u16 版本 | u16 保留 | u32 元数据字节数 | 元数据(JSON) | 一个 columnar 段
+MAGIC = b'TSNP'
+_HEADER = struct.Struct('<4sHHI')
+# 小于此大小的 CSV 解析本身就很快，不写缓存文件
+MIN_BYTES = 1 << 20
+# 从 CSV 新解析的行数达到缓存行数的这一比例时才重写缓存；追加少量行后启动时只解析尾部
+RESAVE_FRACTION = 0.1
+
+
+def cache_path(csv_file) -> str:
+    return csv_file + SUFFIX
+
+
+def load(csv_file, snapshot) -> bool:
+    """Fill an empty _LedgerSnapshot from the cache file of csv_file.
+
+    On success snapshot.key is the CSV version (inode, mtime_ns, size) the
+    cache was built from and snapshot.cursor points just past its last row,
+    so the caller can use it as is, parse only rows appended since, or
+    discard it. Returns False if there is no usable cache.
+    """
+    path = cache_path(csv_file)
+    try:
+        with open(path, 'rb') as f:
+            data = memoryview(f.read())
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        print(f"Warning: ignoring unreadable file {path}: {e}")
+        return False
+    if instrumentation.active:
+        instrumentation.count('bytes_read', len(data))
+    try:
+        if len(data) < _HEADER.size:
+            raise ValueError("file is too short")
+        magic, version, _, meta_size = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return False
+        pos = _HEADER.size
+        meta = json.loads(str(data[pos:pos + meta_size], 'utf-8'))
+        pos += meta_size
+        # 有行的日期无效时解码为当天，缓存只在写入它的那一天有效
+        if meta['today'] is not None and meta['today'] != datetime.now().date().toordinal():
+            return False
+        records, end = decode_segment(data, pos)
+        if end != len(data):
+            raise ValueError("file size does not match its header")
+    except Exception as e:
+        print(f"Warning: ignoring unreadable file {path}: {e}")
+        return False
+    snapshot.key = tuple(meta['key'])
+    snapshot.cursor = LogCursor.from_dict(meta['cursor'])
+    snapshot.records = records
+    snapshot.rows_decoded = meta['rows_decoded']
+    snapshot.rows_skipped = meta['rows_skipped']
+    snapshot.defaulted.update(meta['defaulted'])
+    snapshot.saved_rows = len(records)
+    return True
+
+
+def needs_save(snapshot) -> bool:
+    """Whether the cache file is missing or far enough behind the snapshot to be rewritten."""
+    if snapshot.key is None or snapshot.key[2] < MIN_BYTES:
+        return False
+    return len(snapshot.records) - snapshot.saved_rows > snapshot.saved_rows * RESAVE_FRACTION
+
+
+def save(csv_file, snapshot):
+    """Write snapshot to the cache file of csv_file, replacing it atomically."""
+    meta = {
+        'key': list(snapshot.key),
+        'cursor': snapshot.cursor.to_dict(),
+        'rows_decoded': snapshot.rows_decoded,
+        'rows_skipped': snapshot.rows_skipped,
+        'defaulted': snapshot.defaulted,
+        'today': datetime.now().date().toordinal() if snapshot.defaulted.get('date') else None,
+    }
+    meta = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    path = cache_path(csv_file)
+    try:
+        # 与辅助文件一样，派生数据不需要 fsync
+        with atomic_write(path, 'wb', fsync=False) as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, len(meta)))
+            f.write(meta)
+            f.write(encode_segment(snapshot.records))
+        snapshot.saved_rows = len(snapshot.records)
+    except Exception as e:
+        print(f"Error updating {path}: {e}")
@@ -0,0 +1,373 @@
+# sqlite_manager.py
+import csv
+import os
+import sqlite3
+import sys
+from datetime import datetime, date
+from database_manager import DatabaseManager, CSV_FILE, FIELDNAMES, date_bound
+from models import TeachingRecord
+from text_index import TEXT_FIELDS, TextQuery
+
+DB_FILE = 'teaching_records.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lessons (
+    id INTEGER PRIMARY KEY,
+    student_name TEXT NOT NULL DEFAULT '',
+    student_id TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL DEFAULT '',
+    month TEXT NOT NULL DEFAULT '',
+    duration_minutes INTEGER NOT NULL DEFAULT 0,
+    hourly_rate REAL NOT NULL DEFAULT 0,
+    total_income REAL NOT NULL DEFAULT 0,
+    topic_covered TEXT NOT NULL DEFAULT '',
+    homework_assigned TEXT NOT NULL DEFAULT '',
+    student_performance INTEGER NOT NULL DEFAULT 5,
+    notes TEXT NOT NULL DEFAULT '',
+    next_plan TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_lessons_student_id ON lessons(student_id);
+CREATE INDEX IF NOT EXISTS idx_lessons_month ON lessons(month);
+CREATE INDEX IF NOT EXISTS idx_lessons_date ON lessons(date);
+"""
+
+# 列顺序与 FIELDNAMES 一致，便于插入与导出
+_COLUMNS = ', '.join(FIELDNAMES)
+_INSERT_SQL = f"INSERT INTO lessons ({_COLUMNS}) VALUES ({', '.join('?' * len(FIELDNAMES))})"
+_ISO_DATE_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+# 库内数据格式版本，记录在 PRAGMA user_version；1: 能解析的日期统一存为 YYYY-MM-DD
+_DATA_VERSION = 1
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """DatabaseManager variant that stores lessons in a local SQLite file.
+
+    Exposes the same methods as the CSV manager. A new database is filled
+    from CSV_FILE once, so switching backends keeps existing history.
+    """
+
+    # 单个连接上的游标不能交错使用，只允许一个线程同时访问（但不限定是哪个线程）
+    thread_safe = False
+    # 没有解码快照，排序与分页在 iter_records 的结果上进行
+    column_queries = False
+
+    def __init__(self, db_file=DB_FILE, csv_file=CSV_FILE):
+        self.db_file = db_file
+        is_new = not os.path.exists(db_file) or os.path.getsize(db_file) == 0
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        # Python 的 str.lower 能正确处理非 ASCII 姓名，SQLite 内置 lower 不行
+        self.conn.create_function('py_lower', 1, lambda s: (s or '').lower(), deterministic=True)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] < _DATA_VERSION:
+            self._canonicalize_dates()
+        if is_new and os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
+            imported = self.import_csv(csv_file)
+            print(f"Imported {imported} record(s) from {csv_file} into {db_file}.")
+
+    def close(self):
+        self.conn.close()
+
+    def _canonicalize_dates(self):
+        """Rewrite dates imported before they were normalized (e.g. '2024-3-12') as YYYY-MM-DD; runs once per database."""
+        with self.conn:
+            rows = self.conn.execute(f"SELECT id, date FROM lessons WHERE date NOT GLOB '{_ISO_DATE_GLOB}'").fetchall()
+            updates = []
+            for rowid, date_raw in rows:
+                day = self.safe_convert(date_raw, date, None)
+                if day is not None:
+                    updates.append((day.isoformat(), rowid))
+            self.conn.executemany('UPDATE lessons SET date = ? WHERE id = ?', updates)
+            self.conn.execute(f'PRAGMA user_version = {_DATA_VERSION}')
+
+    def _row_values(self, row, today):
+        """Convert a CSV dict row into a tuple in FIELDNAMES order."""
+        date_raw = str(row.get('date') or '')
+        # 日期范围按文本比较 date 列，能解析但未补零的日期（如 '2024-3-12'）要先规范化
+        day = self.safe_convert(date_raw, date, None)
+        return (
+            str(row.get('student_name') or ''),
+            str(row.get('student_id') or ''),
+            day.isoformat() if day is not None else date_raw,
+            str(row.get('month') or self._derive_month_str(date_raw)),
+            self.safe_convert(row.get('duration_minutes', 0), int, 0),
+            self.safe_convert(row.get('hourly_rate', 0), float, 0.0),
+            self.safe_convert(row.get('total_income', 0), float, 0.0),
+            str(row.get('topic_covered') or ''),
+            str(row.get('homework_assigned') or ''),
+            self.safe_convert(row.get('student_performance', 5), int, 5),
+            str(row.get('notes') or ''),
+            str(row.get('next_plan') or ''),
+        )
+
+    def import_csv(self, csv_file=CSV_FILE) -> int:
+        """Stream rows from a FIELDNAMES-style CSV into the database in one transaction."""
+        today = datetime.now().date()
+        before = self.conn.total_changes
+        try:
+            with open(csv_file, 'r', newline='', encoding='utf-8') as f, self.conn:
+                reader = csv.DictReader(f)
+                self.conn.executemany(_INSERT_SQL, (self._row_values(row, today) for row in reader))
+        except Exception as e:
+            print(f"Error importing CSV into SQLite: {e}")
+            return 0
+        return self.conn.total_changes - before
+
+    def add_record(self, record: TeachingRecord):
+        """Add a new record to the database."""
+        try:
+            record.total_income = self.calculate_income(record.duration_minutes, record.hourly_rate)
+            row = self._record_row(record)
+            with self.conn:
+                self.conn.execute(_INSERT_SQL, tuple(row[name] for name in FIELDNAMES))
+            print(f"Record added successfully! Session income: ${record.total_income}")
+        except Exception as e:
+            print(f"Error adding record: {e}")
+
+    def add_records(self, records) -> int:
+        """Validate many records and insert them in a single transaction. Returns the number added."""
+        rows = []
+        skipped = 0
+        for i, record in enumerate(records, 1):
+            error = self._validate_record(record)
+            if error:
+                print(f"Warning: skipping record #{i}: {error}")
+                skipped += 1
+                continue
+            record.total_income = self.calculate_income(record.duration_minutes, record.hourly_rate)
+            rows.append(tuple(self._record_row(record)[name] for name in FIELDNAMES))
+        try:
+            with self.conn:
+                self.conn.executemany(_INSERT_SQL, rows)
+        except Exception as e:
+            print(f"Error adding records: {e}")
+            return 0
+        message = f"Added {len(rows)} record(s)"
+        if skipped:
+            message += f", skipped {skipped} invalid record(s)"
+        print(message + ".")
+        return len(rows)
+
+    def iter_records(self, student_name=None, student_id=None, topic=None, month=None, text=None,
+                     date_from=None, date_to=None):
+        """Yield matching records lazily in insertion order. Same filters as query_records.
+
+        The text search is evaluated in Python on the rows left by the SQL filters.
+        """
+        query = TextQuery(text) if text else None
+        if text and not query:
+            return
+        date_from, date_to = date_bound(date_from), date_bound(date_to)
+        today = datetime.now().date()
+        clauses = []
+        params = []
+        # 日期以 YYYY-MM-DD 文本存储，范围条件可以使用 date 索引；
+        # 无效日期按当天处理，范围包含当天时改为只在 Python 中判断
+        if (date_from or date_to) and not ((date_from or today) <= today <= (date_to or today)):
+            if date_from:
+                clauses.append('date >= ?')
+                params.append(date_from.isoformat())
+            if date_to:
+                clauses.append('date <= ?')
+                params.append(date_to.isoformat())
+        if student_id:
+            clauses.append('student_id = ?')
+            params.append(student_id)
+        if month:
+            # 前缀匹配改写为范围条件，可以使用 month 索引
+            clauses.append('month >= ? AND month < ?')
+            params.extend([str(month), str(month) + '\U0010ffff'])
+        if student_name:
+            clauses.append('instr(py_lower(student_name), ?) > 0')
+            params.append(student_name.lower())
+        if topic:
+            clauses.append('instr(py_lower(topic_covered), ?) > 0')
+            params.append(topic.lower())
+        sql = f"SELECT {_COLUMNS} FROM lessons"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY id'
+
+        try:
+            for row in self.conn.execute(sql, params):
+                values = dict(zip(FIELDNAMES, row))
+                values['date'] = self.safe_convert(values['date'], date, today)
+                if query and not query.matches(*(values[field] for field in TEXT_FIELDS)):
+                    continue
+                if (date_from and values['date'] < date_from) or (date_to and values['date'] > date_to):
+                    continue
+                yield TeachingRecord(**values)
+        except Exception as e:
+            print(f"Error reading database: {e}")
+
+    def search_text(self, text: str, fields=None) -> list:
+        """Positions (insertion order) of the records matching a text search."""
+        query = TextQuery(text)
+        if not query:
+            return []
+        fields = fields or TEXT_FIELDS
+        return [i for i, record in enumerate(self.iter_records())
+                if query.matches(*(getattr(record, field) for field in fields))]
+
+    def get_all_students(self):
+        """Get all unique students (name and ID)."""
+        try:
+            rows = self.conn.execute(
+                "SELECT DISTINCT trim(student_name), trim(student_id) FROM lessons "
+                "WHERE trim(student_name) != '' AND trim(student_id) != ''"
+            ).fetchall()
+        except Exception as e:
+            print(f"Error retrieving student list: {e}")
+            return []
+        return sorted(rows)
+
+    def get_financial_summary(self):
+        """Get financial summary: total income, total hours, total lessons."""
+        try:
+            lessons, income, minutes = self.conn.execute(
+                "SELECT COUNT(*), TOTAL(total_income), TOTAL(duration_minutes) FROM lessons"
+            ).fetchone()
+        except Exception as e:
+            print(f"Error computing financial summary: {e}")
+            lessons, income, minutes = 0, 0.0, 0.0
+        return {
+            'total_income': round(income, 2),
+            'total_hours': round(minutes / 60, 2),
+            'total_lessons': lessons
+        }
+
+    def get_monthly_summary(self):
+        """Summarize by month (YYYY-MM): lessons, total hours, total income."""
+        summary = {}
+        try:
+            rows = self.conn.execute(
+                "SELECT month, COUNT(*), TOTAL(duration_minutes), TOTAL(total_income) FROM lessons "
+                "WHERE month != '' GROUP BY month ORDER BY month"
+            )
+            for month_str, lessons, minutes, income in rows:
+                summary[month_str] = {
+                    'lessons': lessons,
+                    'hours': round(minutes / 60, 2),
+                    'income': round(income, 2)
+                }
+        except Exception as e:
+            print(f"Error computing monthly summary: {e}")
+        return summary
+
+    def get_student_summary(self):
+        """Per-student totals keyed by name: lessons, hours, income, average performance, first/last lesson."""
+        summary = {}
+        try:
+            # 与CSV版本一致，格式不正确的日期不计入首末上课日期
+            valid_date = f"CASE WHEN date GLOB '{_ISO_DATE_GLOB}' THEN date END"
+            rows = self.conn.execute(
+                "SELECT trim(student_name) AS n, COUNT(*), TOTAL(duration_minutes), TOTAL(total_income), "
+                f"TOTAL(student_performance), MIN({valid_date}), MAX({valid_date}) "
+                "FROM lessons WHERE n != '' GROUP BY n ORDER BY MIN(id)"
+            )
+            for name, lessons, minutes, income, performance, first, last in rows:
+                summary[name] = {
+                    'lessons': lessons,
+                    'hours': round(minutes / 60, 2),
+                    'income': round(income, 2),
+                    'avg_performance': round(performance / lessons, 1),
+                    'first_lesson': first or '',
+                    'last_lesson': last or ''
+                }
+        except Exception as e:
+            print(f"Error computing student summary: {e}")
+        return summary
+
+    def get_student_monthly_summary(self):
+        """Per-student, per-month lessons, hours and income: {name: {month: stats}}."""
+        summary = {}
+        try:
+            rows = self.conn.execute(
+                "SELECT trim(student_name) AS n, month, COUNT(*), TOTAL(duration_minutes), TOTAL(total_income), "
+                "MIN(id) FROM lessons WHERE n != '' GROUP BY n, month"
+            ).fetchall()
+        except Exception as e:
+            print(f"Error computing student summary: {e}")
+            return summary
+        # 学生按首次出现的顺序，月份按时间顺序
+        first_seen = {}
+        for name, _, _, _, _, first_id in rows:
+            first_seen[name] = min(first_seen.get(name, first_id), first_id)
+        for name in sorted(first_seen, key=first_seen.get):
+            summary[name] = {}
+        for name, month_str, lessons, minutes, income, _ in sorted(rows, key=lambda r: (r[0], r[1])):
+            if month_str:
+                summary[name][month_str] = {
+                    'lessons': lessons,
+                    'hours': round(minutes / 60, 2),
+                    'income': round(income, 2)
+                }
+        return summary
+
+    def verify_aggregates(self, rebuild=False):
+        """Summaries are computed by SQL on every call, so there is nothing to drift."""
+        return []
+
+    def get_student_id_by_name(self, student_name: str) -> str:
+        """Find an existing student ID by student name."""
+        try:
+            row = self.conn.execute(
+                "SELECT trim(student_id) FROM lessons WHERE py_lower(trim(student_name)) = ? ORDER BY id LIMIT 1",
+                (student_name.lower(),)
+            ).fetchone()
+        except Exception as e:
+            print(f"Error finding student ID: {e}")
+            return None
+        return row[0] if row else None
+
+    def get_student_name_by_id(self, student_id: str) -> str:
+        """Find the name a student ID was first recorded with."""
+        try:
+            row = self.conn.execute(
+                "SELECT trim(student_name) FROM lessons WHERE trim(student_id) = ? AND trim(student_name) != '' "
+                "ORDER BY id LIMIT 1",
+                (student_id.strip(),)
+            ).fetchone()
+        except Exception as e:
+            print(f"Error finding student name: {e}")
+            return None
+        return row[0] if row else None
+
+    def rebuild_student_registry(self):
+        """Student queries run directly against the lessons table; there is no registry to rebuild."""
+
+    def get_all_student_names_ids(self):
+        """Get a mapping of all student names to IDs."""
+        name_id_map = {}
+        try:
+            # 与CSV版本一致：按姓名首次出现的顺序排列，ID取该姓名最后一次出现的记录
+            rows = self.conn.execute(
+                "SELECT trim(student_name) AS n, trim(student_id) AS s, MIN(id), MAX(id) FROM lessons "
+                "WHERE n != '' AND s != '' GROUP BY n, s"
+            ).fetchall()
+        except Exception as e:
+            print(f"Error retrieving student list: {e}")
+            return name_id_map
+        first_seen = {}
+        latest = {}
+        for name, sid, first_id, last_id in rows:
+            first_seen[name] = min(first_seen.get(name, first_id), first_id)
+            if name not in latest or last_id > latest[name][0]:
+                latest[name] = (last_id, sid)
+        for name in sorted(first_seen, key=first_seen.get):
+            name_id_map[name] = latest[name][1]
+        return name_id_map
+
+
+if __name__ == '__main__':
+    # 用法: python sqlite_manager.py import [csv文件] [db文件]
+    if len(sys.argv) >= 2 and sys.argv[1] == 'import':
+        source = sys.argv[2] if len(sys.argv) > 2 else CSV_FILE
+        target = sys.argv[3] if len(sys.argv) > 3 else DB_FILE
+        manager = SQLiteDatabaseManager(target, csv_file=os.devnull)
+        count = manager.import_csv(source)
+        manager.close()
+        print(f"Imported {count} record(s) from {source} into {target}.")
+    else:
+        print("Usage: python sqlite_manager.py import [csv_file] [db_file]")
@@ -0,0 +1,124 @@
+# student_registry.py
+import sys
+from sidecar import SidecarStore
+
+
+class StudentRegistry(SidecarStore):
+    """Index of every student in the ledger, persisted next to the CSV file.
+
+    Keeps, per student name (stripped), the latest student ID, first and
+    last lesson dates, and lesson/minute/income/performance totals, plus the
+    lookup tables behind get_student_id_by_name and the student lists. All
+    student queries are answered without touching lesson history.
+    """
+
+    SUFFIX = '.students.json'
+    VERSION = 1
+
+    def _clear(self):
+        # 姓名 -> {'id', 'first', 'last', 'lessons', 'minutes', 'income', 'performance'}，按首次出现排序
+        self.students = {}
+        # 小写姓名 -> 首次出现时的学生ID（与逐行查找第一条匹配记录的结果一致）
+        self.first_id_by_name = {}
+        # 学生ID -> 首次出现时的姓名
+        self.names_by_id = {}
+        # 出现过的所有 (姓名, ID) 组合
+        self.pairs = set()
+
+    def _fold(self, row, decoder):
+        name = row[0].strip()
+        sid = row[1].strip()
+        self.first_id_by_name.setdefault(name.lower(), sid)
+        if not name:
+            return
+        entry = self.students.get(name)
+        if entry is None:
+            entry = self.students[name] = {
+                'id': '', 'first': '', 'last': '',
+                'lessons': 0, 'minutes': 0, 'income': 0.0, 'performance': 0
+            }
+        if sid:
+            entry['id'] = sid
+            self.pairs.add((name, sid))
+            self.names_by_id.setdefault(sid, name)
+        # 日期无效的行被解码为“今天”（即 decoder.today 对象本身），不计入首末上课日期
+        if row[2] is not decoder.today:
+            day = row[2].isoformat()
+            if not entry['first'] or day < entry['first']:
+                entry['first'] = day
+            if day > entry['last']:
+                entry['last'] = day
+        entry['lessons'] += 1
+        entry['minutes'] += row[3]
+        entry['income'] += row[5]
+        entry['performance'] += row[8]
+
+    def _state(self) -> dict:
+        return {
+            'students': self.students,
+            'first_id_by_name': self.first_id_by_name,
+            'names_by_id': self.names_by_id,
+            'pairs': sorted(self.pairs),
+        }
+
+    def _restore(self, state: dict):
+        self.students = {name: dict(entry) for name, entry in state['students'].items()}
+        self.first_id_by_name = dict(state['first_id_by_name'])
+        self.names_by_id = dict(state['names_by_id'])
+        self.pairs = {tuple(pair) for pair in state['pairs']}
+
+    def merge(self, other):
+        """Fold in the registry of rows that come after this one's (e.g. a later month partition)."""
+        for name, theirs in other.students.items():
+            entry = self.students.get(name)
+            if entry is None:
+                self.students[name] = dict(theirs)
+                continue
+            if theirs['id']:
+                entry['id'] = theirs['id']
+            if theirs['first'] and (not entry['first'] or theirs['first'] < entry['first']):
+                entry['first'] = theirs['first']
+            if theirs['last'] > entry['last']:
+                entry['last'] = theirs['last']
+            for field in ('lessons', 'minutes', 'income', 'performance'):
+                entry[field] += theirs[field]
+        for name, sid in other.first_id_by_name.items():
+            self.first_id_by_name.setdefault(name, sid)
+        for sid, name in other.names_by_id.items():
+            self.names_by_id.setdefault(sid, name)
+        self.pairs |= other.pairs
+
+    def id_by_name(self, student_name: str):
+        return self.first_id_by_name.get(student_name.lower())
+
+    def name_by_id(self, student_id: str):
+        return self.names_by_id.get(student_id.strip())
+
+    def name_id_map(self) -> dict:
+        return {name: entry['id'] for name, entry in self.students.items() if entry['id']}
+
+    def summary(self) -> dict:
+        """Per-student totals keyed by name: lessons, hours, income, average performance, first/last lesson dates."""
+        summary = {}
+        for name, entry in self.students.items():
+            lessons = entry['lessons']
+            summary[name] = {
+                'lessons': lessons,
+                'hours': round(entry['minutes'] / 60, 2),
+                'income': round(entry['income'], 2),
+                'avg_performance': round(entry['performance'] / lessons, 1) if lessons else 0.0,
+                'first_lesson': entry['first'],
+                'last_lesson': entry['last'],
+            }
+        return summary
+
+
+if __name__ == '__main__':
+    # 用法: python student_registry.py rebuild
+    from database_manager import DatabaseManager
+
+    if len(sys.argv) >= 2 and sys.argv[1] == 'rebuild':
+        DatabaseManager().rebuild_student_registry()
+        print("Student registry rebuilt from the CSV file.")
+    else:
+        print("Usage: python student_registry.py rebuild")
@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# 模块位于 English/ 目录下，以顶层模块导入（与 python main.py 运行时相同）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,38 @@
+# test_cli.py
+import io
+import json
+
+import pytest
+
+import cli
+from database_manager import BACKEND_ENV, CSV_FILE, DatabaseManager
+
+
+@pytest.fixture
+def ledger_dir(tmp_path, monkeypatch):
+    """Run commands against a CSV ledger in an empty temporary directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv(BACKEND_ENV, raising=False)
+    return tmp_path
+
+
+def _add(rate, *options):
+    # --rate=值 的写法让 '-inf' 不被当作选项
+    return ['add', '--student', 'Bob', '--student-id', 'S2', '--minutes', '60', f'--rate={rate}', *options]
+
+
+@pytest.mark.parametrize('rate', ['nan', 'NaN', 'inf', '-inf', '0', '-5', 'abc'])
+def test_add_rejects_invalid_rates(ledger_dir, capsys, rate):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(_add(rate))
+    assert exit_info.value.code == 2
+    assert 'invalid rate' in capsys.readouterr().err
+    assert not (ledger_dir / CSV_FILE).exists()
+
+
+def test_add_writes_a_valid_rate(ledger_dir, monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr('sys.stdout', out)
+    assert cli.main(_add('45.5', '--format', 'json')) == 0
+    assert json.loads(out.getvalue())['total_income'] == 45.5
+    assert DatabaseManager().get_financial_summary()['total_income'] == 45.5
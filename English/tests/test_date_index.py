@@ -0,0 +1,74 @@
+# test_date_index.py
+import random
+from datetime import date, timedelta
+
+from database_manager import DatabaseManager
+from date_index import DateIndex
+from models import TeachingRecord
+
+START = date(2024, 1, 1)
+
+
+def _record(i, day):
+    return TeachingRecord(f"Student {i % 5}", f"S{i % 5}", day, 60, 40.0, 0.0, f"Topic {i}", '', 7, '', '')
+
+
+def _dated(db, date_from, date_to):
+    return [r.topic_covered for r in db.iter_records(date_from=date_from, date_to=date_to)]
+
+
+def _expected(added, date_from, date_to):
+    return [f"Topic {i}" for i, day in added if date_from <= day <= date_to]
+
+
+def test_queries_after_appends_only_extend_the_index_file(tmp_path):
+    path = str(tmp_path / 'teaching_records.csv')
+    db = DatabaseManager(cache_records=False, csv_file=path)
+    rng = random.Random(3)
+    added = []
+    for i in range(40):
+        added.append((i, START + timedelta(days=rng.randrange(60))))
+        db.add_record(_record(*added[-1]))
+    date_from, date_to = START + timedelta(days=10), START + timedelta(days=30)
+    assert _dated(db, date_from, date_to) == _expected(added, date_from, date_to)
+
+    with open(path + DateIndex.SUFFIX, 'rb') as f:
+        previous = f.read()
+    for i in range(40, 60):
+        # 交替写入与查询，其中一部分课程早于已有的最大日期
+        added.append((i, START + timedelta(days=rng.randrange(70))))
+        db.add_record(_record(*added[-1]))
+        assert _dated(db, date_from, date_to) == _expected(added, date_from, date_to)
+        with open(path + DateIndex.SUFFIX, 'rb') as f:
+            data = f.read()
+        assert data.startswith(previous) and len(data) > len(previous)
+        previous = data
+
+    # 另一个实例从追加了多块的文件中读出同样的索引
+    fresh = DatabaseManager(cache_records=False, csv_file=path)
+    for date_from, date_to in ((START, START + timedelta(days=5)), (START + timedelta(days=20), START + timedelta(days=69))):
+        assert _dated(fresh, date_from, date_to) == _expected(added, date_from, date_to)
+    loaded = DateIndex(path)
+    loaded.load()
+    recomputed = loaded.recomputed()
+    assert (loaded.ordinals, loaded.offsets) == (recomputed.ordinals, recomputed.offsets)
+
+
+def test_interrupted_append_is_ignored_and_rewritten(tmp_path):
+    path = str(tmp_path / 'teaching_records.csv')
+    db = DatabaseManager(cache_records=False, csv_file=path)
+    added = [(i, START + timedelta(days=i)) for i in range(10)]
+    for item in added:
+        db.add_record(_record(*item))
+    assert _dated(db, START, START + timedelta(days=9)) == _expected(added, START, START + timedelta(days=9))
+    with open(path + DateIndex.SUFFIX, 'ab') as f:
+        f.write(b'\x10\x00\x00\x00\x05')  # 中断的追加留下的半个块
+
+    added.append((10, START))
+    db = DatabaseManager(cache_records=False, csv_file=path)
+    db.add_record(_record(*added[-1]))
+    assert _dated(db, START, START + timedelta(days=3)) == _expected(added, START, START + timedelta(days=3))
+    loaded = DateIndex(path)
+    loaded.load()
+    assert loaded._saved is not None
+    assert len(loaded.ordinals) == 11
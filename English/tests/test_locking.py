@@ -0,0 +1,170 @@
+# test_locking.py
+import os
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from database_manager import DatabaseManager
+from locking import FileLock, GroupCommit
+from models import TeachingRecord
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+TIMEOUT = 10
+
+
+def _record(name='Alice', sid='S1', day=date(2025, 1, 15)):
+    return TeachingRecord(name, sid, day, 60, 40.0, 0.0, 'Fractions', '', 8, '', '')
+
+
+def _wait_until(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
+
+
+def _run_appends(committer, texts):
+    """Start one thread per text calling committer.append; returns (threads, {index: exception or None})."""
+    results = {}
+
+    def append(i, text):
+        try:
+            committer.append(text)
+        except Exception as e:
+            results[i] = e
+        else:
+            results[i] = None
+
+    threads = [threading.Thread(target=append, args=(i, text), daemon=True) for i, text in enumerate(texts)]
+    return threads, results
+
+
+def _pending(committer):
+    with committer._cond:
+        return len(committer._pending)
+
+
+@pytest.mark.parametrize('error', [OSError(28, 'No space left on device'), UnicodeEncodeError('utf-8', '', 0, 1, 'x')])
+def test_failed_write_is_raised_by_every_waiting_append(tmp_path, error):
+    committer = GroupCommit(str(tmp_path / 'log.csv'))
+    first_write = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def failing_write(text):
+        written.append(text)
+        first_write.set()
+        release.wait(TIMEOUT)
+        raise error
+
+    committer._write = failing_write
+    threads, results = _run_appends(committer, [f"row {i}\n" for i in range(6)])
+    # 第一个线程成为 leader 并卡在写入中，其余线程在它写入期间排队
+    threads[0].start()
+    assert first_write.wait(TIMEOUT)
+    for thread in threads[1:]:
+        thread.start()
+    _wait_until(lambda: _pending(committer) == 5)
+    release.set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+        assert not thread.is_alive()
+
+    assert all(results[i] is error for i in range(6)), results
+    assert written == ["row 0\n", "".join(f"row {i}\n" for i in range(1, 6))]
+    assert committer.appends == 6
+    with committer._cond:
+        assert not committer._writing
+        assert committer._pending == []
+
+
+def test_appends_work_again_after_a_failed_write(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    committer = GroupCommit(path)
+
+    def failing_write(text):
+        raise OSError(5, 'I/O error')
+
+    committer._write = failing_write
+    with pytest.raises(OSError):
+        committer.append("lost\n")
+    del committer._write  # 恢复类上的 _write
+
+    threads, results = _run_appends(committer, [f"row {i}\n" for i in range(4)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+        assert not thread.is_alive()
+    assert results == dict.fromkeys(range(4))
+    with open(path, encoding='utf-8') as f:
+        assert sorted(f.read().splitlines()) == [f"row {i}" for i in range(4)]
+    assert not committer._writing
+
+
+def _lock_is_free(path) -> bool:
+    """Whether an exclusive lock on path's FileLock could be taken right now (without waiting)."""
+    fd = os.open(path + FileLock.SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return True
+    finally:
+        os.close(fd)
+
+
+@pytest.mark.skipif(fcntl is None, reason="uses flock to probe the lock")
+@pytest.mark.parametrize('bulk', [False, True])
+def test_append_releases_lock_before_refreshing_sidecars(tmp_path, monkeypatch, bulk):
+    path = str(tmp_path / 'teaching_records.csv')
+    db = DatabaseManager(csv_file=path)
+    db.get_financial_summary()
+    free_during_refresh = []
+    refresh = DatabaseManager._refresh_sidecars
+
+    def checked_refresh(self):
+        # FileLock 不可重入：追加时持有的排他锁必须在刷新辅助文件（取共享锁）之前释放
+        free_during_refresh.append(_lock_is_free(path))
+        refresh(self)
+
+    monkeypatch.setattr(DatabaseManager, '_refresh_sidecars', checked_refresh)
+    done = threading.Event()
+
+    def add():
+        if bulk:
+            db.add_records([_record(), _record('Bob', 'S2')])
+        else:
+            db.add_record(_record())
+        done.set()
+
+    threading.Thread(target=add, daemon=True).start()
+    assert done.wait(TIMEOUT), "append deadlocked"
+    assert free_during_refresh == [True]
+    assert _lock_is_free(path)
+    lessons = 2 if bulk else 1
+    assert db.get_financial_summary()['total_lessons'] == lessons
+    assert db._aggregates.lessons == lessons and len(db.get_all_student_names_ids()) == lessons
+
+
+def test_concurrent_add_record_keeps_every_row(tmp_path):
+    path = str(tmp_path / 'teaching_records.csv')
+    db = DatabaseManager(csv_file=path)
+    threads = [threading.Thread(target=db.add_record, args=(_record(f"Student {i}", f"S{i}"),), daemon=True)
+               for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+        assert not thread.is_alive()
+    assert db.get_financial_summary()['total_lessons'] == 16
+    assert sorted(r.student_id for r in db.query_records()) == sorted(f"S{i}" for i in range(16))
@@ -0,0 +1,150 @@
+# test_parallel_scan.py
+import csv
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import parallel_scan
+from csv_scan import LogCursor, iter_rows, record_boundary, sync_cursor
+from database_manager import DatabaseManager, FIELDNAMES
+
+LESSONS = 3000
+
+
+def _notes(rng, i):
+    # 多行、带转义引号与逗号的笔记，让大部分字节位于引号之内
+    lines = [f'Lesson {i}: "word problems", fractions, 分数' + ' x' * rng.randint(0, 40)
+             for _ in range(rng.randint(1, 6))]
+    if i % 7 == 0:
+        lines.append('""quoted"" at the end\n')
+    return '\n'.join(lines)
+
+
+def _write_ledger(path, lessons=LESSONS, seed=7):
+    rng = random.Random(seed)
+    start = date(2023, 1, 1)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        for i in range(lessons):
+            day = start + timedelta(days=rng.randrange(700))
+            minutes = rng.choice((45, 60, 90))
+            rate = rng.choice((30.0, 40.0, 55.5))
+            student = rng.randrange(12)
+            writer.writerow([f"Student {student}", f"S{student}", day.isoformat(), day.strftime('%Y-%m'),
+                             minutes, rate, round(minutes / 60 * rate, 2), f"Topic {i % 9}",
+                             'Page 3,\n"odd" ones' if i % 3 else '', rng.randint(1, 10),
+                             _notes(rng, i), 'Next: review\nand test'])
+
+
+def _sequential_rows(path):
+    with open(path, 'rb') as f:
+        cursor = LogCursor()
+        sync_cursor(f, cursor, 0)
+        return list(iter_rows(f, cursor))
+
+
+@pytest.fixture
+def small_ranges(monkeypatch):
+    """Let files of a few hundred KB be split across worker processes."""
+    monkeypatch.setenv(parallel_scan.MIN_BYTES_ENV, '1')
+    monkeypatch.setenv(parallel_scan.WORKERS_ENV, '4')
+    monkeypatch.setattr(parallel_scan, 'MIN_RANGE_BYTES', 4096)
+    monkeypatch.setattr(parallel_scan, '_disabled', False)
+    yield
+    if parallel_scan._executor is not None:
+        parallel_scan._executor.shutdown()
+        parallel_scan._executor = None
+
+
+def test_record_boundary_ignores_quoted_newlines():
+    assert record_boundary(b'a,b\r\nc,"x\ny') == 5
+    assert record_boundary(b'a,"1\n2"\r\nb,"""q"""\n') == 19
+    assert record_boundary(b'a,"1\n2"\r\nb,"""q""\n') == 9  # 最后一个字段的引号未闭合
+    assert record_boundary(b'"open\nquote') == 0
+    assert record_boundary(b'no newline') == 0
+
+
+@pytest.mark.parametrize('workers', [2, 3, 4, 7])
+def test_split_ranges_only_cut_between_records(tmp_path, small_ranges, monkeypatch, workers):
+    path = str(tmp_path / 'teaching_records.csv')
+    _write_ledger(path)
+    monkeypatch.setenv(parallel_scan.WORKERS_ENV, str(workers))
+    expected = _sequential_rows(path)
+    with open(path, 'rb') as f:
+        cursor = LogCursor()
+        sync_cursor(f, cursor, 0)
+        f.seek(0)
+        data = f.read()
+        ranges = parallel_scan.split_ranges(f, cursor.offset, len(data))
+        source = parallel_scan.source_of(f, cursor.fieldnames)
+    assert len(ranges) == workers
+    # 等分点大多落在多行笔记的引号之内，切分点必须向后移到引号之外
+    starts = [start for start, _ in ranges]
+    targets = [cursor.offset + (len(data) - cursor.offset) * i // workers for i in range(1, workers)]
+    assert any(data.count(b'"', 0, target) % 2 for target in targets)
+    for start in starts:
+        assert data[start - 1:start] == b'\n' and data.count(b'"', 0, start) % 2 == 0
+    rows = [values for start, end in ranges for values in parallel_scan._iter_range(source, start, end)]
+    assert rows == expected
+
+
+def test_parallel_reads_match_sequential(tmp_path, small_ranges, monkeypatch):
+    parallel_dir = tmp_path / 'parallel'
+    sequential_dir = tmp_path / 'sequential'
+    for directory in (parallel_dir, sequential_dir):
+        directory.mkdir()
+        _write_ledger(str(directory / 'teaching_records.csv'))
+
+    used = []
+    for name in ('decode_ranges', 'filter_ranges', 'fold_ranges'):
+        def spy(*args, _original=getattr(parallel_scan, name), _name=name):
+            used.append(_name)
+            return _original(*args)
+        monkeypatch.setattr(parallel_scan, name, spy)
+
+    def results(directory):
+        csv_file = str(directory / 'teaching_records.csv')
+        cached = DatabaseManager(csv_file=csv_file, persist_snapshot=False)
+        streaming = DatabaseManager(cache_records=False, csv_file=csv_file, persist_snapshot=False)
+        return (cached.query_records(),
+                list(streaming.iter_records(student_id='S3')),
+                list(streaming.iter_records(topic='topic 4', month='2024-02')),
+                cached.get_financial_summary(),
+                cached.get_monthly_summary(),
+                cached.get_student_summary())
+
+    parallel = results(parallel_dir)
+    assert set(used) == {'decode_ranges', 'filter_ranges', 'fold_ranges'}
+    monkeypatch.setenv(parallel_scan.MIN_BYTES_ENV, '0')  # 关闭并行，顺序读取
+    used.clear()
+    sequential = results(sequential_dir)
+    assert not used
+    assert len(sequential[0]) == LESSONS
+    assert parallel == sequential
+
+
+def test_worker_failures_fall_back_to_sequential_reads(tmp_path, small_ranges, monkeypatch, capsys):
+    path = str(tmp_path / 'teaching_records.csv')
+    _write_ledger(path)
+    expected_rows = len(_sequential_rows(path))
+    source_of = parallel_scan.source_of
+
+    def stale_source(f, fieldnames):
+        # inode 与打开的文件不符：工作进程中的 _open 报告文件已被替换（OSError）
+        path, _, fieldnames = source_of(f, fieldnames)
+        return path, -1, fieldnames
+
+    monkeypatch.setattr(parallel_scan, 'source_of', stale_source)
+    cached = DatabaseManager(csv_file=path, persist_snapshot=False)
+    streaming = DatabaseManager(cache_records=False, csv_file=path, persist_snapshot=False)
+    records = cached.query_records()
+    matched = list(streaming.iter_records(student_id='S3'))
+    summary = cached.get_financial_summary()
+
+    assert capsys.readouterr().out.count('parallel scan failed, reading sequentially') == 3
+    assert not parallel_scan._disabled
+    assert parallel_scan._executor is None
+    assert len(records) == summary['total_lessons'] == expected_rows == LESSONS
+    assert matched == [r for r in records if r.student_id == 'S3']
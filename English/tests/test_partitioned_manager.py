@@ -0,0 +1,118 @@
+# test_partitioned_manager.py
+import csv
+import os
+import shutil
+from datetime import date, timedelta
+
+import pytest
+
+from database_manager import DatabaseManager, FIELDNAMES
+from models import TeachingRecord
+from partitioned_manager import ENTRY_LOG, LAYOUT_FILE, OTHER_PARTITION, PartitionedDatabaseManager
+
+LESSONS = [
+    # (姓名, ID, 日期)，按录入顺序
+    ('Alice', 'S1', date(2024, 3, 5)),
+    ('Bob', 'S3', date(2024, 3, 6)),
+    ('Carol', 'S9', date(2024, 4, 1)),
+    ('Alice', 'S2', date(2024, 4, 2)),
+    ('Bob', 'S4', date(2024, 4, 3)),
+    # 补录的早期课程：录入在后，日期在前
+    ('alice', 'A0', date(2024, 1, 10)),
+    ('Caroline', 'S9', date(2024, 2, 1)),
+]
+
+
+def _record(name, sid, day):
+    return TeachingRecord(name, sid, day, 60, 40.0, 0.0, 'Fractions', '', 8, '', '')
+
+
+def _student_lookups(db):
+    return ([db.get_student_id_by_name(name) for name in ('Alice', 'alice', 'Bob', 'Carol', 'Caroline')],
+            [db.get_student_name_by_id(sid) for sid in ('S1', 'S2', 'S9', 'A0')],
+            list(db.get_all_student_names_ids().items()),
+            list(db.get_student_summary().items()),
+            db.get_all_students())
+
+
+@pytest.mark.parametrize('converted', [True, False])
+def test_student_lookups_follow_entry_order_like_the_csv_backend(tmp_path, converted):
+    path = str(tmp_path / 'teaching_records.csv')
+    directory = str(tmp_path / 'teaching_records')
+    single = DatabaseManager(csv_file=path)
+    assert single.add_records([_record(*lesson) for lesson in LESSONS]) == len(LESSONS)
+    if converted:
+        partitioned = PartitionedDatabaseManager(directory=directory, csv_file=path)
+    else:
+        partitioned = PartitionedDatabaseManager(directory=directory, csv_file=str(tmp_path / 'missing.csv'))
+        assert partitioned.add_records([_record(*lesson) for lesson in LESSONS[:4]]) == 4
+        for lesson in LESSONS[4:]:
+            partitioned.add_record(_record(*lesson))
+
+    # 跨月份补录的课程：两种布局都按录入顺序，而不是按月份顺序
+    assert single.get_student_id_by_name('Alice') == 'S1'
+    assert single.get_student_name_by_id('S9') == 'Carol'
+    assert _student_lookups(partitioned) == _student_lookups(single)
+    # 另一个实例从持久化的文件读出同样的结果
+    reopened = PartitionedDatabaseManager(directory=directory, csv_file=path)
+    assert _student_lookups(reopened) == _student_lookups(single)
+
+
+def test_missing_entry_log_is_recreated_in_month_order(tmp_path):
+    path = str(tmp_path / 'teaching_records.csv')
+    directory = str(tmp_path / 'teaching_records')
+    DatabaseManager(csv_file=path).add_records([_record(*lesson) for lesson in LESSONS])
+    PartitionedDatabaseManager(directory=directory, csv_file=path)
+    os.remove(os.path.join(directory, ENTRY_LOG))
+    partitioned = PartitionedDatabaseManager(directory=directory, csv_file=path)
+    # 录入顺序已无从得知，按月份顺序重建
+    assert partitioned.get_student_id_by_name('Alice') == 'A0'
+    assert partitioned.get_financial_summary()['total_lessons'] == len(LESSONS)
+    assert sum(s['lessons'] for s in partitioned.get_student_summary().values()) == len(LESSONS)
+
+
+# (日期, month 列)：日期无效的行按当天处理，month 与日期不符的行按日期筛选
+ODD_ROWS = [('2024-02-30', ''), ('not a date', ''), ('', '2023-05'), ('2023-13-01', ''),
+            ('2023-05-07', '2023-05'), ('2023-5-8', ''), ('2023-05-09', '2024-01'), ('2025-12-01', '')]
+
+
+def _write_odd_ledger(path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for i, (day, month) in enumerate(ODD_ROWS):
+            writer.writerow({'student_name': f"Student {i}", 'student_id': f"S{i}", 'date': day, 'month': month,
+                             'duration_minutes': 60, 'hourly_rate': 40.0, 'total_income': 40.0,
+                             'student_performance': 7})
+
+
+def _assert_same_results(single, partitioned):
+    today = date.today()
+    ranges = [(today - timedelta(days=30), None), (None, today), (date(2023, 5, 1), date(2023, 5, 31)),
+              (None, date(2023, 12, 31)), (date(2024, 1, 1), date(2024, 2, 29))]
+    for date_from, date_to in ranges:
+        expected = sorted(r.student_id for r in single.iter_records(date_from=date_from, date_to=date_to))
+        assert sorted(r.student_id for r in partitioned.iter_records(date_from=date_from, date_to=date_to)) \
+            == expected, (date_from, date_to)
+    for month in ('2023-05', '2024', '2023-13'):
+        expected = sorted(r.student_id for r in single.iter_records(month=month))
+        assert sorted(r.student_id for r in partitioned.iter_records(month=month)) == expected, month
+
+
+@pytest.mark.parametrize('old_layout', [False, True])
+def test_rows_with_invalid_dates_match_date_ranges_like_the_csv_backend(tmp_path, old_layout):
+    path = str(tmp_path / 'teaching_records.csv')
+    directory = str(tmp_path / 'teaching_records')
+    _write_odd_ledger(path)
+    single = DatabaseManager(csv_file=path, persist_snapshot=False)
+    partitioned = PartitionedDatabaseManager(directory=directory, csv_file=path)
+    assert sorted(os.listdir(directory)) == [LAYOUT_FILE, '2023-05.csv', '2025-12.csv', ENTRY_LOG,
+                                             OTHER_PARTITION + '.csv']
+    if old_layout:
+        # 旧版本按 month 字符串分区：日期无效的行可能位于某个月份的分区中
+        os.remove(os.path.join(directory, LAYOUT_FILE))
+        shutil.move(os.path.join(directory, OTHER_PARTITION + '.csv'), os.path.join(directory, '2024-02.csv'))
+        partitioned = PartitionedDatabaseManager(directory=directory, csv_file=path)
+        assert not os.path.exists(os.path.join(directory, '2024-02.csv'))
+        assert os.path.exists(os.path.join(directory, LAYOUT_FILE))
+    _assert_same_results(single, partitioned)
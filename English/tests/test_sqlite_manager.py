@@ -0,0 +1,69 @@
+# test_sqlite_manager.py
+import csv
+import sqlite3
+from datetime import date
+
+import pytest
+
+from database_manager import DatabaseManager, FIELDNAMES
+from sqlite_manager import SQLiteDatabaseManager
+
+# 未补零的日期 CSV 后端可以解析，SQLite 中也必须按日期而不是按原文比较
+DATES = ['2024-03-01', '2024-3-12', '2024-03-31', '2024-4-2', '2023-1-5', '2023-06-30', '2023-7-1',
+         '2024-02-29', 'not a date']
+RANGES = [
+    (date(2024, 3, 1), date(2024, 3, 31)),
+    (date(2023, 1, 1), date(2023, 6, 30)),
+    (date(2024, 3, 10), None),
+    (None, date(2023, 12, 31)),
+]
+
+
+def _write_ledger(path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for i, day in enumerate(DATES):
+            writer.writerow({'student_name': f"Student {i}", 'student_id': f"S{i}", 'date': day,
+                             'duration_minutes': 60, 'hourly_rate': 40.0, 'total_income': 40.0,
+                             'topic_covered': f"Topic {i}", 'student_performance': 7})
+
+
+def _topics(db, date_from, date_to):
+    return [r.topic_covered for r in db.iter_records(date_from=date_from, date_to=date_to)]
+
+
+@pytest.mark.parametrize('date_from, date_to', RANGES)
+def test_date_ranges_match_the_csv_backend(tmp_path, date_from, date_to):
+    csv_file = str(tmp_path / 'teaching_records.csv')
+    _write_ledger(csv_file)
+    single = DatabaseManager(csv_file=csv_file, persist_snapshot=False)
+    sqlite = SQLiteDatabaseManager(db_file=str(tmp_path / 'teaching_records.db'), csv_file=csv_file)
+    try:
+        expected = _topics(single, date_from, date_to)
+        assert expected
+        assert _topics(sqlite, date_from, date_to) == expected
+    finally:
+        sqlite.close()
+
+
+def test_dates_of_an_older_database_are_normalized_once(tmp_path):
+    csv_file = str(tmp_path / 'teaching_records.csv')
+    db_file = str(tmp_path / 'teaching_records.db')
+    _write_ledger(csv_file)
+    SQLiteDatabaseManager(db_file=db_file, csv_file=csv_file).close()
+    # 模拟规范化之前导入的数据库
+    conn = sqlite3.connect(db_file)
+    with conn:
+        conn.execute("UPDATE lessons SET date = '2024-3-12' WHERE student_id = 'S1'")
+        conn.execute('PRAGMA user_version = 0')
+    conn.close()
+
+    sqlite = SQLiteDatabaseManager(db_file=db_file, csv_file=csv_file)
+    try:
+        stored = [row[0] for row in sqlite.conn.execute('SELECT date FROM lessons ORDER BY id')]
+        assert stored[1] == '2024-03-12' and stored[-1] == 'not a date'
+        assert sqlite.conn.execute('PRAGMA user_version').fetchone()[0] == 1
+        assert _topics(sqlite, date(2024, 3, 1), date(2024, 3, 31)) == ['Topic 0', 'Topic 1', 'Topic 2']
+    finally:
+        sqlite.close()
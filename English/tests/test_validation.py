@@ -0,0 +1,47 @@
+# test_validation.py
+import csv
+from datetime import date, datetime
+
+import pytest
+
+from database_manager import DatabaseManager, FIELDNAMES
+from importer import import_lessons
+from models import TeachingRecord
+
+
+def _record(**changes):
+    values = dict(student_name='Bob', student_id='S2', date=date(2025, 1, 15), duration_minutes=60,
+                  hourly_rate=40.0, total_income=0.0, topic_covered='Fractions', homework_assigned='',
+                  student_performance=8, notes='', next_plan='')
+    values.update(changes)
+    return TeachingRecord(**values)
+
+
+@pytest.mark.parametrize('changes', [
+    dict(hourly_rate=float('nan')),
+    dict(hourly_rate=float('inf')),
+    dict(hourly_rate=-float('inf')),
+    dict(hourly_rate=True),
+    dict(duration_minutes=True),
+    dict(student_performance=True),
+    dict(date=datetime(2025, 1, 15, 9, 30)),
+])
+def test_invalid_values_are_not_written(tmp_path, changes):
+    path = str(tmp_path / 'teaching_records.csv')
+    db = DatabaseManager(csv_file=path)
+    assert db.add_records([_record(**changes)]) == 0
+    assert db.add_records([_record()]) == 1
+    assert db.get_financial_summary() == {'total_income': 40.0, 'total_hours': 1.0, 'total_lessons': 1}
+
+
+def test_import_skips_non_finite_rates(tmp_path):
+    source = tmp_path / 'lessons.csv'
+    with open(source, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for rate in ('nan', 'inf', '-inf', '45'):
+            writer.writerow({'student_name': 'Bob', 'student_id': 'S2', 'date': '2025-01-15',
+                             'duration_minutes': '60', 'hourly_rate': rate})
+    db = DatabaseManager(csv_file=str(tmp_path / 'teaching_records.csv'))
+    assert import_lessons(db, str(source)) == 1
+    assert [r.hourly_rate for r in db.query_records()] == [45.0]
@@ -0,0 +1,173 @@
+# text_index.py
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+# 建立全文索引的自由文本列
+TEXT_FIELDS = ('topic_covered', 'homework_assigned', 'notes', 'next_plan')
+
+_WORD = re.compile(r'\w+')
+# 中日韩文字没有空格分词，按相邻两字（bigram）建立索引
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+')
+
+
+def tokenize(text: str) -> list:
+    """Split text into lowercase search tokens, in order; CJK runs become character bigrams."""
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        pos = 0
+        for match in _CJK.finditer(word):
+            if match.start() > pos:
+                tokens.append(word[pos:match.start()])
+            run = match.group()
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            pos = match.end()
+        if pos < len(word):
+            tokens.append(word[pos:])
+    return tokens
+
+
+class TextQuery:
+    """Parsed search expression.
+
+    Words are ANDed together, `OR` (or `|`) separates alternatives, and a
+    trailing `*` makes the word a prefix match: `quadratic equation*`,
+    `fractions OR decimals`. Multi-token words (e.g. CJK phrases) require all
+    of their tokens.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # 析取范式：groups 之间为 OR，组内每个 (token, is_prefix) 为 AND
+        self.groups = []
+        current = []
+        for part in text.split():
+            if part in ('OR', '|'):
+                if current:
+                    self.groups.append(current)
+                current = []
+                continue
+            prefix = part.endswith('*')
+            tokens = tokenize(part.rstrip('*'))
+            for i, token in enumerate(tokens):
+                current.append((token, prefix and i == len(tokens) - 1))
+        if current:
+            self.groups.append(current)
+
+    def __bool__(self):
+        return bool(self.groups)
+
+    def matches(self, *texts) -> bool:
+        """Check the query against raw field values, without an index."""
+        tokens = set()
+        for text in texts:
+            tokens.update(tokenize(text))
+        for group in self.groups:
+            for token, prefix in group:
+                if prefix:
+                    if not any(t.startswith(token) for t in tokens):
+                        break
+                elif token not in tokens:
+                    break
+            else:
+                return True
+        return False
+
+
+def _intersect(small, large):
+    """Sorted intersection of two sorted position sequences."""
+    if len(small) > len(large):
+        small, large = large, small
+    if len(small) * 32 > len(large):
+        # 长度相近时用集合求交；差距很大时对长列表二分查找，代价 O(len(small) * log(len(large)))
+        return array('i', sorted(set(small).intersection(large)))
+    result = array('i')
+    lo = 0
+    n = len(large)
+    for pos in small:
+        lo = bisect_left(large, pos, lo)
+        if lo == n:
+            break
+        if large[lo] == pos:
+            result.append(pos)
+    return result
+
+
+class TextIndex:
+    """In-memory inverted index over TEXT_FIELDS of a RecordBatch.
+
+    Postings are sorted array('i') lists of row positions, kept per field and
+    for all fields combined. Rows are indexed in position order, so the index
+    can be extended as the batch grows.
+    """
+
+    def __init__(self):
+        # None 键保存所有字段合并后的倒排表
+        self.postings = {field: {} for field in TEXT_FIELDS + (None,)}
+        self._vocabulary = {}  # field -> 排好序的词表（前缀查询时按需生成）
+        self.size = 0
+
+    def add(self, position: int, texts):
+        """Index one row; texts are the TEXT_FIELDS values. Positions must increase."""
+        combined = self.postings[None]
+        for field, text in zip(TEXT_FIELDS, texts):
+            if not text:
+                continue
+            postings = self.postings[field]
+            for token in tokenize(text):
+                for table in (postings, combined):
+                    positions = table.get(token)
+                    if positions is None:
+                        table[token] = array('i', [position])
+                        self._vocabulary.pop(field if table is postings else None, None)
+                    elif positions[-1] != position:
+                        positions.append(position)
+        self.size = position + 1
+
+    def extend_from(self, batch):
+        """Index the rows of batch that were appended since the last call."""
+        topics, homework, notes, plans = batch.topics, batch.homework, batch.notes, batch.next_plans
+        for i in range(self.size, len(batch)):
+            self.add(i, (topics[i], homework[i], notes[i], plans[i]))
+
+    def _lookup(self, field, token, prefix):
+        table = self.postings[field]
+        if not prefix:
+            return table.get(token, array('i'))
+        vocabulary = self._vocabulary.get(field)
+        if vocabulary is None:
+            vocabulary = self._vocabulary[field] = sorted(table)
+        start = bisect_left(vocabulary, token)
+        end = bisect_right(vocabulary, token + '\U0010ffff')
+        if end - start == 1:
+            return table[vocabulary[start]]
+        merged = set()
+        for word in vocabulary[start:end]:
+            merged.update(table[word])
+        return array('i', sorted(merged))
+
+    def search(self, query: TextQuery, fields=None) -> list:
+        """Sorted row positions matching query in any of `fields` (default: all text fields)."""
+        fields = [None] if not fields else list(fields)
+        matched = set()
+        for group in query.groups:
+            result = None
+            for token, prefix in group:
+                if len(fields) == 1:
+                    positions = self._lookup(fields[0], token, prefix)
+                else:
+                    union = set()
+                    for field in fields:
+                        union.update(self._lookup(field, token, prefix))
+                    positions = array('i', sorted(union))
+                result = positions if result is None else _intersect(result, positions)
+                if not result:
+                    break
+            if result:
+                if len(query.groups) == 1:
+                    return list(result)
+                matched.update(result)
+        return sorted(matched)
@@ -3,6 +3,7 @@ from datetime import datetime
 from database_manager import DatabaseManager
 from models import TeachingRecord
 import unicodedata
+from functools import lru_cache
 
 try:
     from rich.console import Console
@@ -11,16 +12,24 @@ try:
 except Exception:
     RICH_AVAILABLE = False
 
-def _visual_len(s: str) -> int:
-    l = 0
-    for ch in str(s):
-        l += 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
-    return l
+@lru_cache(maxsize=1 << 16)
+def _wide_len(s: str) -> int:
+    # 中文字符串逐字符查表较慢，结果按字符串缓存
+    return sum(2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1 for ch in s)
 
-def _pad_right(s: str, width: int) -> str:
+def _visual_len(s: str) -> int:
     s = str(s)
-    vlen = _visual_len(s)
-    return s + ' ' * max(0, width - vlen)
+    # 纯 ASCII 字符串的显示宽度就是长度
+    return len(s) if s.isascii() else _wide_len(s)
+
+def _table_lines(headers, rows) -> list:
+    """纯文本表格的各行：表头、分隔线、数据行；每个单元格只计算一次宽度。"""
+    cells = [tuple(map(str, headers))] + [tuple(map(str, r)) for r in rows]
+    measured = [[_visual_len(c) for c in r] for r in cells]
+    widths = [max(col) for col in zip(*measured)]
+    lines = ["  ".join(c + ' ' * (w - n) for c, n, w in zip(r, sizes, widths)) for r, sizes in zip(cells, measured)]
+    lines.insert(1, "-" * max(45, len(lines[0])))
+    return lines
 
 def _print_students_plain_table(students_data: dict, student_lesson_count: dict):
     rows = []
@@ -28,19 +37,7 @@ def _print_students_plain_table(students_data: dict, student_lesson_count: dict)
         rows.append((str(i), name, sid, f"{student_lesson_count.get(name, 0)}节"))
 
     headers = ("序号", "学生姓名", "学生ID", "课程数量")
-    widths = [0, 0, 0, 0]
-    for idx, h in enumerate(headers):
-        widths[idx] = max(widths[idx], _visual_len(h))
-    for r in rows:
-        for idx, cell in enumerate(r):
-            widths[idx] = max(widths[idx], _visual_len(cell))
-
-    header_line = "  ".join(_pad_right(h, widths[i]) for i, h in enumerate(headers))
-    print("\n--- 所有学生列表 ---")
-    print(header_line)
-    print("-" * max(45, len(header_line)))
-    for r in rows:
-        print("  ".join(_pad_right(r[i], widths[i]) for i in range(4)))
+    print("\n".join(["\n--- 所有学生列表 ---"] + _table_lines(headers, rows)))
 
 def _print_monthly_plain_table(summary: dict):
     headers = ("月份", "课程数", "总时长(小时)", "总收入(¥)")
@@ -48,19 +45,7 @@ def _print_monthly_plain_table(summary: dict):
     for m, stats in summary.items():
         rows.append((str(m), str(stats.get('lessons', 0)), f"{stats.get('hours', 0.0):.2f}", f"{stats.get('income', 0.0):.2f}"))
 
-    widths = [0, 0, 0, 0]
-    for idx, h in enumerate(headers):
-        widths[idx] = max(widths[idx], _visual_len(h))
-    for r in rows:
-        for idx, cell in enumerate(r):
-            widths[idx] = max(widths[idx], _visual_len(cell))
-
-    header_line = "  ".join(_pad_right(h, widths[i]) for i, h in enumerate(headers))
-    print("\n--- 月度汇总 ---")
-    print(header_line)
-    print("-" * max(45, len(header_line)))
-    for r in rows:
-        print("  ".join(_pad_right(r[i], widths[i]) for i in range(4)))
+    print("\n".join(["\n--- 月度汇总 ---"] + _table_lines(headers, rows)))
 
 def get_performance_emoji(score: int) -> str:
     """根据评分返回对应的表情符号"""
@@ -226,26 +211,28 @@ def query_records(db: DatabaseManager):
             print("未找到匹配的记录。")
             return
 
-        print(f"\n找到了 {len(records)} 条记录:")
-        print("-" * 90)
+        # 每条记录拼成一个字符串，所有记录按块一次写出，而不是每行调用一次 print
+        blocks = [f"\n找到了 {len(records)} 条记录:", "-" * 90]
         for i, record in enumerate(records, 1):
             # 添加表情符号让评分更直观
             performance_emoji = get_performance_emoji(record.student_performance)
-            
-            print(f"记录 #{i}")
-            print(f"  学生: {record.student_name} ({record.student_id})")
-            print(f"  日期: {record.date}， 时长: {record.duration_minutes} 分钟")
-            try:
-                print(f"  月份: {getattr(record, 'month', '')}")
-            except Exception:
-                pass
-            print(f"  费率: ¥{record.hourly_rate}/小时， 收入: ¥{record.total_income}")
-            print(f"  主题: {record.topic_covered}")
-            print(f"  作业: {record.homework_assigned}")
-            print(f"  表现: {record.student_performance}/10 {performance_emoji}")
-            print(f"  笔记: {record.notes}")
-            print(f"  计划: {record.next_plan}")
-            print("-" * 90)
+            blocks.append(
+                f"记录 #{i}\n"
+                f"  学生: {record.student_name} ({record.student_id})\n"
+                f"  日期: {record.date}， 时长: {record.duration_minutes} 分钟\n"
+                f"  月份: {getattr(record, 'month', '')}\n"
+                f"  费率: ¥{record.hourly_rate}/小时， 收入: ¥{record.total_income}\n"
+                f"  主题: {record.topic_covered}\n"
+                f"  作业: {record.homework_assigned}\n"
+                f"  表现: {record.student_performance}/10 {performance_emoji}\n"
+                f"  笔记: {record.notes}\n"
+                f"  计划: {record.next_plan}\n"
+                + "-" * 90)
+            if len(blocks) >= 1000:
+                print("\n".join(blocks))
+                blocks.clear()
+        if blocks:
+            print("\n".join(blocks))
     except Exception as e:
         print(f"查询过程中出错: {e}")
         print("请检查数据文件是否完整。")